@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+编码参数档位：所有重编码路径（剪辑、智能剪切、拼接回退、字幕烧录）统一从这里取编码参数，
+按用途在速度和画质之间取舍。
+
+内置档位:
+    draft   预览剪辑方案：缩到 540p、ultrafast、CRF 30，编码耗时只有 final 的一小部分
+    review  审片：原分辨率、veryfast、CRF 23
+    edit    剪辑中间产物（edited.mp4 之后还会烧录字幕再编码一次）：fast、CRF 18，cut_video.py 默认
+    final   成片：medium、CRF 18，burn_subtitle.py 默认
+
+自定义档位写在 ~/.config/vlog_workflow/encoder_profiles.json（或环境变量 VLOG_ENCODER_PROFILES 指定的文件），
+可覆盖内置档位或新增档位，"base" 表示在哪个档位基础上修改，例如使用硬件编码器:
+
+    {
+        "final-vt": {"base": "final", "codec": "h264_videotoolbox", "extra": ["-q:v", "65"]},
+        "review": {"crf": 26}
+    }
+
+字段:
+    codec          视频编码器（libx264 / libx265 使用 preset、crf、tune；其它编码器只使用 extra）
+    preset / crf / tune
+    threads        编码线程数，0 表示由 ffmpeg 决定（命令行 --encoder-threads 优先）
+    height         输出画面最大高度（只缩小不放大），null 表示保持原分辨率
+    audio_codec / audio_bitrate
+    extra          追加的视频编码参数
+
+用法:
+    python3 encoder_profiles.py              # 列出所有档位
+    python3 encoder_profiles.py draft        # 打印该档位对应的 ffmpeg 参数
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+PROFILES = {
+    "draft": {
+        "codec": "libx264", "preset": "ultrafast", "crf": 30, "tune": "fastdecode", "threads": 0,
+        "height": 540, "audio_codec": "aac", "audio_bitrate": "96k",
+        "description": "预览剪辑方案：540p、ultrafast",
+    },
+    "review": {
+        "codec": "libx264", "preset": "veryfast", "crf": 23, "tune": None, "threads": 0,
+        "height": None, "audio_codec": "aac", "audio_bitrate": "128k",
+        "description": "审片：原分辨率、veryfast",
+    },
+    "edit": {
+        "codec": "libx264", "preset": "fast", "crf": 18, "tune": None, "threads": 0,
+        "height": None, "audio_codec": "aac", "audio_bitrate": "192k",
+        "description": "剪辑中间产物（默认）",
+    },
+    "final": {
+        "codec": "libx264", "preset": "medium", "crf": 18, "tune": None, "threads": 0,
+        "height": None, "audio_codec": "aac", "audio_bitrate": "192k",
+        "description": "成片烧录（默认）",
+    },
+}
+CUT_PROFILE = "edit"
+BURN_PROFILE = "final"
+
+USER_PROFILES = Path.home() / ".config" / "vlog_workflow" / "encoder_profiles.json"
+
+# 支持 preset / crf / tune 的软件编码器
+_X26X = ("libx264", "libx265")
+
+
+def load_profiles() -> dict[str, dict]:
+    """内置档位 + 用户自定义档位。"""
+    profiles = {name: {**p, "name": name} for name, p in PROFILES.items()}
+    path = Path(os.environ.get("VLOG_ENCODER_PROFILES", USER_PROFILES)).expanduser()
+    if not path.exists():
+        return profiles
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            custom = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"警告: 无法读取自定义编码档位 {path}: {e}")
+        return profiles
+    for name, fields in custom.items():
+        base = profiles.get(fields.get("base", name), profiles[BURN_PROFILE])
+        profiles[name] = {**base, **{k: v for k, v in fields.items() if k != "base"}, "name": name}
+    return profiles
+
+
+def get_profile(name: str) -> dict:
+    profiles = load_profiles()
+    if name not in profiles:
+        raise ValueError(f"未知编码档位: {name}（可选: {', '.join(profiles)}）")
+    return profiles[name]
+
+
+def video_args(profile: dict, threads: int = 0, codec: str | None = None) -> list[str]:
+    """视频编码参数。codec 指定时覆盖档位中的编码器（智能剪切需与源视频编码一致）。"""
+    codec = codec or profile["codec"]
+    args = ["-c:v", codec]
+    if codec in _X26X:
+        args += ["-preset", profile["preset"], "-crf", str(profile["crf"])]
+        if profile.get("tune"):
+            args += ["-tune", profile["tune"]]
+    threads = threads or profile.get("threads") or 0
+    if threads:
+        args += ["-threads", str(threads)]
+        if codec == "libx265":
+            args += ["-x265-params", f"pools={threads}"]
+    return args + list(profile.get("extra") or [])
+
+
+def audio_args(profile: dict) -> list[str]:
+    return ["-c:a", profile.get("audio_codec", "aac"), "-b:a", profile.get("audio_bitrate", "192k")]
+
+
+def scale_filter(profile: dict) -> str | None:
+    """缩小画面的滤镜（宽度按比例取偶数，不放大），不缩放时返回 None。"""
+    height = profile.get("height")
+    return f"scale=-2:'min({height},ih)'" if height else None
+
+
+def profile_key(profile: dict) -> str:
+    """影响编码结果的字段（用于缓存键）。"""
+    fields = {k: v for k, v in profile.items() if k not in ("name", "description")}
+    return json.dumps(fields, sort_keys=True, ensure_ascii=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列出编码档位及对应的 ffmpeg 参数")
+    parser.add_argument("profile", nargs="?", help="只显示该档位")
+    args = parser.parse_args()
+
+    profiles = load_profiles()
+    if args.profile:
+        try:
+            profile = get_profile(args.profile)
+        except ValueError as e:
+            print(f"错误: {e}")
+            sys.exit(1)
+        vf = scale_filter(profile)
+        print(" ".join([*video_args(profile), *audio_args(profile), *(["-vf", vf] if vf else [])]))
+        return
+
+    for name, p in profiles.items():
+        size = f"≤{p['height']}p" if p.get("height") else "原分辨率"
+        quality = f"{p.get('preset')} CRF {p.get('crf')}" if p["codec"] in _X26X else " ".join(p.get("extra") or [])
+        print(f"  {name:<10}{p['codec']:<20}{quality:<22}{size:<10}音频 {p.get('audio_bitrate', '-'):<6}"
+              f"{p.get('description', '')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+流水线性能埋点：记录每个阶段及其中每次 ffmpeg / HTTP 调用的墙钟时间、CPU 时间、读写字节数、
+ffmpeg 编码速度（解析 -progress 输出）和峰值内存，每次运行输出一份机器可读的 JSON trace，
+可选导出 Chrome trace-event 格式（chrome://tracing 或 https://ui.perfetto.dev 打开）。
+
+未启用时所有埋点都是空操作，ffmpeg 命令行也不做任何改动。
+
+启用方式（任选其一）:
+    python3 cut_video.py ... --trace trace.json
+    VLOG_TRACE=~/vlog_traces python3 cut_video.py ...   # 目录：每次运行写一个 {脚本名}-{时间}-{pid}.json
+
+    目录模式下环境变量会传给子进程（watch_projects.py 调起的各阶段脚本各写一份 trace）。
+
+查看 / 转换:
+    python3 instrument.py trace.json                        # 按名称汇总
+    python3 instrument.py ~/vlog_traces/*.json --chrome chrome.json
+
+在脚本中使用:
+    from instrument import run_ffmpeg, traced, tracer
+
+    @traced("cut_segment")
+    def cut_segment(...):
+        run_ffmpeg(cmd, name="ffmpeg:copy", capture_output=True, text=True, check=True)
+
+    with tracer.span("upload", cat="http", bytes_out=size) as sp:
+        response = session.post(...)
+        sp.add(bytes_in=len(response.content))
+"""
+
+import argparse
+import atexit
+import functools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TRACE_VERSION = 1
+TRACE_ENV = "VLOG_TRACE"
+
+# 累加型字段（同一 span 内多次 add 时求和）
+_COUNTERS = ("bytes_in", "bytes_out")
+
+
+def _rss_mb(maxrss: int) -> float:
+    """ru_maxrss 在 macOS 上以字节为单位，Linux 上以 KB 为单位。"""
+    return round(maxrss / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+
+def _usage(who) -> tuple[float, int]:
+    """(用户态 + 内核态 CPU 秒数, ru_maxrss)。"""
+    if resource is None:
+        return 0.0, 0
+    ru = resource.getrusage(who)
+    return ru.ru_utime + ru.ru_stime, ru.ru_maxrss
+
+
+def _file_size(path) -> int:
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return 0
+
+
+class Span:
+    """一次计时区间。cpu 为区间内本进程（所有线程）与已退出子进程的 CPU 时间之和。"""
+
+    def __init__(self, tracer: "Tracer", name: str, cat: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = dict(args)
+
+    def add(self, **fields) -> None:
+        """补充字段：bytes_in / bytes_out 累加，其它字段覆盖。"""
+        for key, value in fields.items():
+            if key in _COUNTERS:
+                self.args[key] = self.args.get(key, 0) + (value or 0)
+            else:
+                self.args[key] = value
+
+    def __enter__(self) -> "Span":
+        self.t0 = time.perf_counter()
+        self.cpu0 = time.process_time()
+        self.children0 = _usage(resource.RUSAGE_CHILDREN)[0] if resource else 0.0
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        wall = time.perf_counter() - self.t0
+        cpu = time.process_time() - self.cpu0
+        if resource:
+            cpu += _usage(resource.RUSAGE_CHILDREN)[0] - self.children0
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        record = {
+            "name": self.name,
+            "cat": self.cat,
+            "start": round(self.t0 - self.tracer.t0, 6),
+            "wall": round(wall, 6),
+            "cpu": round(cpu, 6),
+            "tid": self.tracer.thread_id(),
+        }
+        # 显式给出的 cpu（如 ffmpeg 子进程的精确值）覆盖区间统计
+        record.update(self.args)
+        self.tracer.record(record)
+        return False
+
+
+class _NullSpan:
+    """未启用埋点时的空 span。"""
+
+    args: dict = {}
+
+    def add(self, **fields) -> None:
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """进程内共享的埋点记录器（线程安全）。"""
+
+    def __init__(self):
+        self.enabled = False
+        self.path: Path | None = None
+        self.spans: list[dict] = []
+        self.lock = threading.Lock()
+        self.t0 = time.perf_counter()
+        self.started = time.time()
+        self._threads: dict[int, int] = {}
+        self._registered = False
+
+    def enable(self, path: str | os.PathLike) -> Path:
+        """开始记录，进程退出时（包括 sys.exit）写出 trace。path 为目录时自动生成文件名。"""
+        path = Path(path).expanduser()
+        if path.is_dir() or path.suffix.lower() != ".json":
+            script = Path(sys.argv[0]).stem or "python"
+            stamp = datetime.fromtimestamp(self.started).strftime("%Y%m%d-%H%M%S")
+            path = path / f"{script}-{stamp}-{os.getpid()}.json"
+        self.path = path
+        self.enabled = True
+        if not self._registered:
+            atexit.register(self.save)
+            self._registered = True
+        return path
+
+    def thread_id(self) -> int:
+        ident = threading.get_ident()
+        with self.lock:
+            return self._threads.setdefault(ident, len(self._threads))
+
+    def span(self, name: str, cat: str = "stage", **args) -> Span | _NullSpan:
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, cat, args)
+
+    def record(self, span: dict) -> None:
+        with self.lock:
+            self.spans.append(span)
+
+    def to_dict(self) -> dict:
+        self_cpu, self_rss = _usage(resource.RUSAGE_SELF) if resource else (time.process_time(), 0)
+        child_cpu, child_rss = _usage(resource.RUSAGE_CHILDREN) if resource else (0.0, 0)
+        with self.lock:
+            spans = sorted(self.spans, key=lambda s: s["start"])
+        return {
+            "version": TRACE_VERSION,
+            "argv": sys.argv,
+            "pid": os.getpid(),
+            "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "wall": round(time.perf_counter() - self.t0, 6),
+            "cpu": round(self_cpu, 6),
+            "children_cpu": round(child_cpu, 6),
+            "peak_rss_mb": _rss_mb(self_rss),
+            "children_peak_rss_mb": _rss_mb(child_rss),
+            "cpu_count": os.cpu_count(),
+            "summary": summarize(spans),
+            "spans": spans,
+        }
+
+    def save(self, path: str | os.PathLike | None = None) -> Path | None:
+        """写出 trace JSON（原子替换）。"""
+        path = Path(path) if path else self.path
+        if not self.enabled or path is None:
+            return None
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+        print(f"   性能记录: {path}")
+        return path
+
+
+tracer = Tracer()
+
+
+def add_trace_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--trace", metavar="PATH",
+                        help=f"记录性能 trace JSON（文件或目录；也可用环境变量 {TRACE_ENV} 指定）")
+
+
+def setup_tracing(path: str | None = None) -> Path | None:
+    """按 --trace 或环境变量 VLOG_TRACE 启用埋点。目录模式下把目录导出给子进程。"""
+    path = path or os.environ.get(TRACE_ENV)
+    if not path:
+        return None
+    trace_path = tracer.enable(path)
+    if trace_path != Path(path).expanduser():
+        os.environ[TRACE_ENV] = str(Path(path).expanduser())
+    return trace_path
+
+
+def traced(name: str | None = None, cat: str = "stage"):
+    """函数装饰器：每次调用记录一个 span。"""
+    def decorator(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(label, cat):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ── ffmpeg 调用 ────────────────────────────────────────────────────────────────
+
+def _io_sizes(cmd: list[str]) -> tuple[int, int]:
+    """命令行中 -i 输入文件的总大小，以及最后一个参数（输出文件）的大小。"""
+    inputs = sum(_file_size(cmd[i + 1]) for i, arg in enumerate(cmd[:-1]) if arg == "-i")
+    return inputs, _file_size(cmd[-1])
+
+
+def _parse_progress(line: str, progress: dict) -> None:
+    key, sep, value = line.strip().partition("=")
+    if sep:
+        progress[key] = value
+
+
+def _progress_fields(progress: dict) -> dict:
+    fields = {}
+    speed = progress.get("speed", "").strip().rstrip("x")
+    try:
+        fields["speed"] = float(speed)
+    except ValueError:
+        pass
+    for key, out_key, scale in (("out_time_us", "media_seconds", 1e-6), ("fps", "fps", 1),
+                                ("frame", "frames", 1)):
+        try:
+            fields[out_key] = round(float(progress[key]) * scale, 3)
+        except (KeyError, ValueError):
+            pass
+    return fields
+
+
+def run_ffmpeg(cmd: list[str], name: str = "ffmpeg", **kwargs) -> subprocess.CompletedProcess:
+    """与 subprocess.run 用法相同；启用埋点时记录该次调用的耗时、CPU、峰值内存、读写字节数和编码速度。
+
+    只有 capture_output=True 且输出不是 stdout 时才加上 -progress pipe:1 解析编码速度，
+    子进程的 CPU 时间和峰值内存通过 os.wait4 精确获取（并行调用之间互不干扰）。
+    """
+    if not tracer.enabled:
+        return subprocess.run(cmd, **kwargs)
+
+    bytes_in, _ = _io_sizes(cmd)
+    simple = set(kwargs) <= {"capture_output", "text", "check"} and kwargs.get("capture_output")
+    to_stdout = cmd[-1] in ("-", "pipe:1", "pipe:")
+    with tracer.span(name, "ffmpeg", bytes_in=bytes_in) as sp:
+        if not simple or to_stdout or not hasattr(os, "wait4"):
+            result = subprocess.run(cmd, **kwargs)
+            sp.add(bytes_out=_io_sizes(cmd)[1], returncode=result.returncode)
+            return result
+
+        text = kwargs.get("text", False)
+        proc = subprocess.Popen([cmd[0], "-progress", "pipe:1", "-nostats", *cmd[1:]],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        stderr_chunks: list[str] = []
+        reader = threading.Thread(target=lambda: stderr_chunks.append(proc.stderr.read()), daemon=True)
+        reader.start()
+        progress: dict = {}
+        for line in proc.stdout:
+            _parse_progress(line, progress)
+        reader.join()
+        _, status, ru = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        proc.stdout.close()
+        proc.stderr.close()
+
+        stderr = "".join(stderr_chunks)
+        sp.add(cpu=round(ru.ru_utime + ru.ru_stime, 6), peak_rss_mb=_rss_mb(ru.ru_maxrss),
+               bytes_out=_io_sizes(cmd)[1], returncode=proc.returncode, **_progress_fields(progress))
+        result = subprocess.CompletedProcess(cmd, proc.returncode, "" if text else b"",
+                                             stderr if text else stderr.encode())
+        if kwargs.get("check") and proc.returncode:
+            raise subprocess.CalledProcessError(proc.returncode, cmd, result.stdout, result.stderr)
+        return result
+
+
+# ── 汇总与导出 ────────────────────────────────────────────────────────────────
+
+def summarize(spans: list[dict]) -> dict:
+    """按名称汇总：次数、墙钟 / CPU 总时长、读写字节数、ffmpeg 平均编码速度（按媒体时长加权）、峰值内存。"""
+    summary: dict[str, dict] = {}
+    for s in spans:
+        item = summary.setdefault(s["name"], {"cat": s["cat"], "count": 0, "wall": 0.0, "cpu": 0.0,
+                                              "bytes_in": 0, "bytes_out": 0})
+        item["count"] += 1
+        item["wall"] = round(item["wall"] + s["wall"], 6)
+        item["cpu"] = round(item["cpu"] + s.get("cpu", 0.0), 6)
+        item["bytes_in"] += s.get("bytes_in", 0)
+        item["bytes_out"] += s.get("bytes_out", 0)
+        if "media_seconds" in s:
+            item["media_seconds"] = round(item.get("media_seconds", 0.0) + s["media_seconds"], 3)
+        if "peak_rss_mb" in s:
+            item["peak_rss_mb"] = max(item.get("peak_rss_mb", 0.0), s["peak_rss_mb"])
+        if s.get("error") or s.get("returncode"):
+            item["errors"] = item.get("errors", 0) + 1
+    for item in summary.values():
+        if item.get("media_seconds") and item["wall"] > 0:
+            item["speed"] = round(item["media_seconds"] / item["wall"], 3)
+    return summary
+
+
+def to_chrome_trace(traces: list[dict]) -> dict:
+    """转换为 Chrome trace-event 格式（每个 trace 一个 pid，线程对应 tid）。"""
+    events = []
+    origin = min((t.get("started", "") for t in traces), default="")
+    for trace in traces:
+        pid = trace.get("pid", 0)
+        # 多份 trace（如 watch_projects 的各阶段子进程）按启动时间对齐
+        offset = 0.0
+        if origin and trace.get("started"):
+            offset = (datetime.fromisoformat(trace["started"]) - datetime.fromisoformat(origin)).total_seconds()
+        name = Path(trace.get("argv", ["python"])[0]).name
+        events.append({"ph": "M", "name": "process_name", "pid": pid, "tid": 0, "args": {"name": name}})
+        for s in trace.get("spans", []):
+            args = {k: v for k, v in s.items() if k not in ("name", "cat", "start", "wall", "tid")}
+            events.append({
+                "ph": "X", "name": s["name"], "cat": s["cat"], "pid": pid, "tid": s.get("tid", 0),
+                "ts": round((offset + s["start"]) * 1e6), "dur": round(s["wall"] * 1e6), "args": args,
+            })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def _format_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.1f}GB"
+
+
+def print_summary(trace: dict) -> None:
+    print(f"{' '.join(trace.get('argv', []))}")
+    print(f"  墙钟 {trace['wall']:.2f}s  CPU {trace['cpu']:.2f}s（子进程 {trace['children_cpu']:.2f}s）  "
+          f"峰值内存 {trace['peak_rss_mb']:.0f}MB（子进程 {trace['children_peak_rss_mb']:.0f}MB）")
+    print(f"  {'名称':<24}{'次数':>6}{'墙钟(s)':>10}{'CPU(s)':>10}{'读':>10}{'写':>10}{'速度':>10}{'内存MB':>8}")
+    rows = sorted(trace.get("summary", {}).items(), key=lambda kv: -kv[1]["wall"])
+    for name, item in rows:
+        speed = f"{item['speed']:.2f}x" if "speed" in item else "-"
+        rss = f"{item['peak_rss_mb']:.0f}" if "peak_rss_mb" in item else "-"
+        errors = f"  失败 {item['errors']}" if item.get("errors") else ""
+        print(f"  {name:<24}{item['count']:>6}{item['wall']:>10.2f}{item['cpu']:>10.2f}"
+              f"{_format_bytes(item['bytes_in']):>10}{_format_bytes(item['bytes_out']):>10}{speed:>10}{rss:>8}"
+              f"{errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="汇总性能 trace，或导出为 Chrome trace-event 格式")
+    parser.add_argument("traces", nargs="+", help="trace JSON 文件")
+    parser.add_argument("--chrome", metavar="PATH", help="合并导出 Chrome trace-event JSON")
+    args = parser.parse_args()
+
+    traces = []
+    for path in args.traces:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                traces.append(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"错误: 无法读取 trace: {path}: {e}")
+            sys.exit(1)
+
+    for trace in traces:
+        print_summary(trace)
+        print()
+
+    if args.chrome:
+        with open(args.chrome, "w", encoding="utf-8") as f:
+            json.dump(to_chrome_trace(traces), f, ensure_ascii=False)
+        print(f"✅ Chrome trace 已导出: {args.chrome}（chrome://tracing 或 https://ui.perfetto.dev 打开）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+源视频索引：一次 ffprobe 扫描得到时长、编码参数、关键帧时间戳和音频包布局，
+保存为与源文件同目录的 sidecar 文件（.{文件名}.index.json），后续剪辑/烧录直接查表。
+
+索引有效性依次按 文件大小 + mtime、内容抽样哈希 校验；源文件被替换后自动重建。
+源文件所在目录不可写时，索引改存到 ~/.cache/vlog_workflow/index/。
+
+用法:
+    python3 media_index.py raw.mp4            # 构建（或读取已有）索引并打印摘要
+    python3 media_index.py raw.mp4 --rebuild  # 强制重建
+
+依赖:
+    ffprobe (随 ffmpeg 安装)
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from collections import Counter
+from pathlib import Path
+
+INDEX_VERSION = 1
+FALLBACK_DIR = Path.home() / ".cache" / "vlog_workflow" / "index"
+
+_STREAM_FIELDS = (
+    "index,codec_type,codec_name,profile,pix_fmt,width,height,"
+    "r_frame_rate,time_base,sample_rate,channels,channel_layout"
+)
+
+
+def quick_hash(path: str, block: int = 1 << 20) -> str:
+    """抽样内容哈希：文件大小 + 开头、中间、结尾各 1MB，多 GB 文件也只需毫秒级。"""
+    size = os.path.getsize(path)
+    h = hashlib.sha256(str(size).encode())
+    with open(path, "rb") as f:
+        for offset in (0, max(size // 2 - block // 2, 0), max(size - block, 0)):
+            f.seek(offset)
+            h.update(f.read(block))
+    return h.hexdigest()
+
+
+def _sidecar_path(video_path: str) -> Path:
+    p = Path(video_path).resolve()
+    return p.with_name(f".{p.name}.index.json")
+
+
+def _fallback_path(video_path: str) -> Path:
+    digest = hashlib.sha256(str(Path(video_path).resolve()).encode()).hexdigest()[:16]
+    return FALLBACK_DIR / f"{digest}.json"
+
+
+def _parse_compact(line: str) -> tuple[str, dict]:
+    section, *fields = line.rstrip("\n").split("|")
+    return section, dict(f.split("=", 1) for f in fields if "=" in f)
+
+
+def _to_float(value: str | None) -> float | None:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def probe(video_path: str) -> dict:
+    """单次 ffprobe 扫描（只读包头，不解码），流式解析输出构建索引内容。"""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_entries",
+        f"format=duration,size,bit_rate,format_name:stream={_STREAM_FIELDS}"
+        ":packet=stream_index,pts_time,duration_time,flags",
+        "-of", "compact=p=1:nk=0",
+        video_path,
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+
+    fmt = {}
+    streams = {}
+    # ffprobe 先输出 packet 再输出 stream，因此先按 stream_index 汇总，最后再归类
+    packets = {}
+
+    for line in proc.stdout:
+        section, fields = _parse_compact(line)
+        if section == "packet":
+            stats = packets.setdefault(fields.get("stream_index"),
+                                       {"count": 0, "first_pts": None, "keyframes": [], "durations": Counter()})
+            stats["count"] += 1
+            pts = _to_float(fields.get("pts_time"))
+            if pts is not None:
+                if stats["first_pts"] is None or pts < stats["first_pts"]:
+                    stats["first_pts"] = pts
+                if "K" in fields.get("flags", ""):
+                    stats["keyframes"].append(pts)
+            dur = _to_float(fields.get("duration_time"))
+            if dur:
+                stats["durations"][round(dur, 6)] += 1
+        elif section == "stream":
+            streams[fields.get("index")] = fields
+        elif section == "format":
+            fmt = fields
+    proc.wait()
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffprobe 扫描失败: {video_path}")
+
+    def first_of(kind: str) -> str | None:
+        return next((i for i, st in streams.items() if st.get("codec_type") == kind), None)
+
+    video_index, audio_index = first_of("video"), first_of("audio")
+    empty = {"count": 0, "first_pts": None, "keyframes": [], "durations": Counter()}
+    video_packets = packets.get(video_index, empty)
+    audio_packets = packets.get(audio_index, empty)
+
+    def clean(stream: dict | None) -> dict | None:
+        if stream is None:
+            return None
+        return {k: v for k, v in stream.items() if v not in ("", "N/A", "unknown")}
+
+    return {
+        "duration": _to_float(fmt.get("duration")) or 0.0,
+        "format": clean(fmt),
+        "video": clean(streams.get(video_index)),
+        "audio": clean(streams.get(audio_index)),
+        "keyframes": sorted(video_packets["keyframes"]),
+        "audio_packets": {
+            "count": audio_packets["count"],
+            "first_pts": audio_packets["first_pts"],
+            "packet_duration": (audio_packets["durations"].most_common(1)[0][0]
+                                if audio_packets["durations"] else None),
+        } if audio_index is not None else None,
+    }
+
+
+def _read(path: Path) -> dict | None:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write(path: Path, index: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def load_index(video_path: str, rebuild: bool = False) -> dict:
+    """读取源视频索引，不存在或已失效时重新扫描并保存。"""
+    st = os.stat(video_path)
+    candidates = [_sidecar_path(video_path), _fallback_path(video_path)]
+
+    if not rebuild:
+        for path in candidates:
+            index = _read(path)
+            if not index or index.get("version") != INDEX_VERSION:
+                continue
+            source = index.get("source", {})
+            if source.get("size") != st.st_size:
+                continue
+            if source.get("mtime_ns") == st.st_mtime_ns:
+                return index
+            # mtime 变化（例如被复制/touch），用内容哈希确认是否同一文件
+            if source.get("quick_hash") == quick_hash(video_path):
+                source["mtime_ns"] = st.st_mtime_ns
+                _save(candidates, index)
+                return index
+
+    index = {
+        "version": INDEX_VERSION,
+        "source": {
+            "path": str(Path(video_path).resolve()),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "quick_hash": quick_hash(video_path),
+        },
+        **probe(video_path),
+    }
+    _save(candidates, index)
+    return index
+
+
+def _save(candidates: list[Path], index: dict) -> None:
+    for path in candidates:
+        try:
+            _write(path, index)
+            return
+        except OSError:
+            continue
+
+
+# ── 查询 ─────────────────────────────────────────────────────────────────────
+
+def has_audio(index: dict) -> bool:
+    return index.get("audio") is not None
+
+
+def keyframes_between(index: dict, start: float, end: float, eps: float = 1e-3) -> list[float]:
+    """返回 [start, end] 区间内的关键帧时间戳。"""
+    kf = index.get("keyframes", [])
+    lo = bisect.bisect_left(kf, start - eps)
+    hi = bisect.bisect_right(kf, end + eps)
+    return kf[lo:hi]
+
+
+def frame_rate(index: dict) -> float:
+    """视频帧率（r_frame_rate），未知时返回 0。"""
+    num, _, den = ((index.get("video") or {}).get("r_frame_rate") or "0/1").partition("/")
+    try:
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def seek_point(index: dict, t: float) -> float:
+    """返回 t 之前（含）最近的关键帧，用于快速 seek。"""
+    kf = index.get("keyframes", [])
+    i = bisect.bisect_right(kf, t + 1e-3)
+    return kf[i - 1] if i else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="构建/查看源视频关键帧与流参数索引")
+    parser.add_argument("input", help="视频文件路径")
+    parser.add_argument("--rebuild", action="store_true", help="忽略已有索引，强制重新扫描")
+    args = parser.parse_args()
+
+    if not Path(args.input).exists():
+        print(f"错误: 输入视频不存在: {args.input}")
+        sys.exit(1)
+
+    try:
+        index = load_index(args.input, rebuild=args.rebuild)
+    except (RuntimeError, FileNotFoundError) as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+
+    video = index.get("video") or {}
+    audio = index.get("audio") or {}
+    kf = index["keyframes"]
+    print(f"✅ 索引: {args.input}")
+    print(f"   时长: {index['duration']:.1f} 秒")
+    print(f"   视频: {video.get('codec_name')} {video.get('width')}x{video.get('height')} "
+          f"{video.get('pix_fmt')} {video.get('r_frame_rate')}")
+    print(f"   音频: {audio.get('codec_name')} {audio.get('sample_rate')}Hz {audio.get('channels')}ch"
+          if audio else "   音频: 无")
+    if len(kf) > 1:
+        print(f"   关键帧: {len(kf)} 个，平均间隔 {(kf[-1] - kf[0]) / (len(kf) - 1):.2f} 秒")
+    else:
+        print(f"   关键帧: {len(kf)} 个")
+
+
+if __name__ == "__main__":
+    main()
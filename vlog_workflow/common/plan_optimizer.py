@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+剪辑方案优化：剪辑前规范化 keep_segments，减少片段数（逐段剪切时每段一个 ffmpeg 进程），让剪辑点落在合适的位置。
+
+    - 排序，丢弃无效区间（end <= start），合并重叠、相接或间隙不超过 --min-gap 秒的区间（默认一帧）
+    - 丢弃短于 --min-length 秒的碎片（默认一帧）
+    - 源视频帧率已知时，剪辑点对齐到帧边界
+    - 可选吸附（--snap，距离不超过 --snap-tolerance 秒）:
+        keyframe  剪辑点移到附近的关键帧上：segment 引擎流复制不再偏移，smart 引擎省去首尾 GOP 的重编码
+        silence   落在语音中间的剪辑点移入附近的停顿；片段首尾附近的拍桌子尖峰一并剪掉
+                  （停顿和尖峰来自 audio_events.py 的 markers.json，也可用 vad.py --speech 的语音区间）
+    - 报告片段数变化、保留时长变化、剪辑点移动幅度，以及落在关键帧 / 停顿上的剪辑点比例
+
+cut_video.py 剪辑前会自动做规范化，也可直接加 --snap。吸附会移动剪辑点，字幕映射（generate_srt.py --plan）
+必须使用同一份方案，因此吸附时建议先用本脚本改写 cut_plan.json，再交给剪辑和字幕。
+
+用法:
+    python3 plan_optimizer.py --plan cut_plan.json --output cut_plan.json --input raw.mp4
+    python3 plan_optimizer.py --plan cut_plan.json --output cut_plan.json --input raw.mp4 --snap keyframe
+    python3 plan_optimizer.py --plan cut_plan.json --output cut_plan.json --input raw.mp4 \\
+        --snap silence --markers markers.json
+"""
+
+import argparse
+import bisect
+import json
+import sys
+from pathlib import Path
+
+from media_index import frame_rate, load_index
+
+DEFAULT_TOLERANCE = 0.3
+# 移入停顿时与语音之间保留的距离（秒）
+SILENCE_PAD = 0.1
+# 剪掉尖峰时在尖峰前、后留出的余量（秒），尖峰约 100ms 内衰减
+TRANSIENT_MARGIN = (0.05, 0.15)
+_EPS = 1e-6
+
+
+def load_markers(path: str) -> tuple[list[tuple[float, float]], list[float]]:
+    """读取停顿区间和尖峰时刻：支持 audio_events.py 的标记和 vad.py --speech 的语音区间。"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if "markers" in data:
+        silences = [(m["start"], m["end"]) for m in data["markers"] if m["type"] == "silence"]
+        transients = [m["time"] for m in data["markers"] if m["type"] == "transient"]
+        return silences, transients
+    if "speech" in data:
+        silences = []
+        cursor = 0.0
+        for s in data["speech"]:
+            if s["start"] > cursor:
+                silences.append((cursor, s["start"]))
+            cursor = max(cursor, s["end"])
+        if data.get("duration", 0.0) > cursor:
+            silences.append((cursor, data["duration"]))
+        return silences, []
+    raise ValueError(f"无法识别的标记文件: {path}（需要 audio_events.py 或 vad.py --speech 的输出）")
+
+
+def _nearest(points: list[float], t: float, tolerance: float) -> float | None:
+    """有序时间点中离 t 最近且不超过 tolerance 的一个。"""
+    i = bisect.bisect_left(points, t)
+    near = [p for p in points[max(i - 1, 0):i + 1] if abs(p - t) <= tolerance]
+    return min(near, key=lambda p: abs(p - t)) if near else None
+
+
+def _in_silence(silences: list[tuple[float, float]], starts: list[float], t: float, slack: float = 0.01) -> bool:
+    i = bisect.bisect_right(starts, t + slack) - 1
+    return i >= 0 and t <= silences[i][1] + slack
+
+
+def _silence_target(silences: list[tuple[float, float]], starts: list[float], t: float,
+                    tolerance: float, is_start: bool) -> float:
+    """剪辑点已在停顿中时不动；否则移到 tolerance 内最近的停顿里，与后（前）面的语音留出 SILENCE_PAD。"""
+    if _in_silence(silences, starts, t):
+        return t
+    i = bisect.bisect_right(starts, t)
+    best = t
+    for s, e in silences[max(i - 1, 0):i + 1]:
+        lo, hi = (s, max(s, e - SILENCE_PAD)) if is_start else (min(e, s + SILENCE_PAD), e)
+        target = min(max(t, lo), hi)
+        if abs(target - t) <= tolerance and (best == t or abs(target - t) < abs(best - t)):
+            best = target
+    return best
+
+
+def _snap_transients(seg: dict, transients: list[float], tolerance: float) -> None:
+    """片段开头 / 结尾 tolerance 秒内的尖峰（拍桌子）剪掉：起点移到尖峰之后，终点移到尖峰之前。"""
+    lo = bisect.bisect_right(transients, seg["start"])
+    hi = bisect.bisect_left(transients, seg["end"])
+    inside = transients[lo:hi]
+    head = [t for t in inside if t - seg["start"] <= tolerance]
+    tail = [t for t in inside if seg["end"] - t <= tolerance]
+    if head:
+        seg["start"] = max(head) + TRANSIENT_MARGIN[1]
+    if tail and min(tail) - TRANSIENT_MARGIN[0] > seg["start"]:
+        seg["end"] = min(tail) - TRANSIENT_MARGIN[0]
+
+
+def _boundaries(segments: list[dict]) -> list[float]:
+    return [t for s in segments for t in (s["start"], s["end"])]
+
+
+def _share(points: list[float], hit) -> float:
+    return sum(1 for t in points if hit(t)) / len(points) if points else 0.0
+
+
+def optimize_plan(
+    segments: list[dict],
+    index: dict | None = None,
+    snap: str | None = None,
+    markers: tuple[list[tuple[float, float]], list[float]] | None = None,
+    min_gap: float | None = None,
+    min_length: float | None = None,
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> tuple[list[dict], dict]:
+    """规范化（+ 可选吸附）保留区间，返回 (新的 keep_segments, 报告)。
+
+    min_gap / min_length 为 None 时取一帧时长（帧率未知时为 0）。
+    """
+    fps = frame_rate(index) if index else 0.0
+    frame = 1 / fps if fps else 0.0
+    min_gap = frame if min_gap is None else min_gap
+    min_length = frame if min_length is None else min_length
+    duration = (index or {}).get("duration") or None
+    keyframes = (index or {}).get("keyframes", [])
+    silences, transients = markers or ([], [])
+    silence_starts = [s for s, _ in silences]
+
+    original = sorted((s for s in segments if s["end"] > s["start"]), key=lambda s: s["start"])
+    work = [dict(s) for s in original]
+
+    if snap == "keyframe":
+        for s in work:
+            for key in ("start", "end"):
+                t = _nearest(keyframes, s[key], tolerance)
+                if t is not None:
+                    s[key] = t
+    elif snap == "silence":
+        for s in work:
+            _snap_transients(s, transients, tolerance)
+            s["start"] = _silence_target(silences, silence_starts, s["start"], tolerance, is_start=True)
+            s["end"] = _silence_target(silences, silence_starts, s["end"], tolerance, is_start=False)
+
+    # 帧网格以第一个关键帧（视频起始 pts）为原点，吸附到关键帧的剪辑点不会被挪开
+    origin = keyframes[0] if keyframes else 0.0
+    for s in work:
+        if fps:
+            s["start"] = round(origin + round((s["start"] - origin) * fps) / fps, 6)
+            s["end"] = round(origin + round((s["end"] - origin) * fps) / fps, 6)
+    shifts = [abs(a[k] - b[k]) for a, b in zip(original, work) for k in ("start", "end") if abs(a[k] - b[k]) > _EPS]
+    if duration:
+        for s in work:
+            s["end"] = min(s["end"], duration)
+
+    merged: list[dict] = []
+    merges = 0
+    for s in sorted(work, key=lambda s: s["start"]):
+        if merged and s["start"] - merged[-1]["end"] <= min_gap + _EPS:
+            last = merged[-1]
+            last["end"] = max(last["end"], s["end"])
+            notes = [n for n in (last.get("note"), s.get("note")) if n]
+            if notes:
+                last["note"] = "；".join(dict.fromkeys("；".join(notes).split("；")))
+            merges += 1
+        else:
+            merged.append(s)
+    result, dropped = [], []
+    for s in merged:
+        length = s["end"] - s["start"]
+        (result if length > _EPS and length >= min_length - _EPS else dropped).append(s)
+
+    before, after = _boundaries(original), _boundaries(result)
+    report = {
+        "segments_before": len(segments),
+        "segments_after": len(result),
+        "invalid": len(segments) - len(original),
+        "merged": merges,
+        "dropped": len(dropped),
+        "kept_before": round(sum(s["end"] - s["start"] for s in original), 3),
+        "kept_after": round(sum(s["end"] - s["start"] for s in result), 3),
+        "moved": len(shifts),
+        "mean_shift": round(sum(shifts) / len(shifts), 4) if shifts else 0.0,
+        "max_shift": round(max(shifts), 4) if shifts else 0.0,
+    }
+    if fps:
+        report["frame"] = round(frame, 6)
+    if keyframes:
+        def on_keyframe(t: float) -> bool:
+            return _nearest(keyframes, t, max(frame / 2, 1e-3)) is not None
+        report["on_keyframe"] = [round(_share(before, on_keyframe), 3), round(_share(after, on_keyframe), 3)]
+    if silences:
+        def in_silence(t: float) -> bool:
+            return _in_silence(silences, silence_starts, t)
+        report["in_silence"] = [round(_share(before, in_silence), 3), round(_share(after, in_silence), 3)]
+    if transients:
+        def inside(segs: list[dict]) -> int:
+            return sum(1 for t in transients for s in segs if s["start"] < t < s["end"])
+        report["transients_kept"] = [inside(original), inside(result)]
+    return result, report
+
+
+def format_report(report: dict) -> list[str]:
+    """报告的可读摘要（每行一项）。"""
+    detail = f"合并 {report['merged']}，去除碎片 {report['dropped']}"
+    if report["invalid"]:
+        detail += f"，无效 {report['invalid']}"
+    lines = [f"片段: {report['segments_before']} → {report['segments_after']}（{detail}）"]
+    lines.append(f"保留时长: {report['kept_before']:.2f} → {report['kept_after']:.2f} 秒")
+    if report["moved"]:
+        lines.append(f"剪辑点移动: {report['moved']} 个，平均 {report['mean_shift'] * 1000:.0f}ms，"
+                     f"最大 {report['max_shift'] * 1000:.0f}ms")
+    if "on_keyframe" in report:
+        b, a = report["on_keyframe"]
+        lines.append(f"落在关键帧上的剪辑点: {b * 100:.0f}% → {a * 100:.0f}%")
+    if "in_silence" in report:
+        b, a = report["in_silence"]
+        lines.append(f"落在停顿中的剪辑点: {b * 100:.0f}% → {a * 100:.0f}%")
+    if "transients_kept" in report:
+        b, a = report["transients_kept"]
+        lines.append(f"保留片段中的尖峰: {b} → {a} 个")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="规范化剪辑方案：合并片段、去除碎片、对齐帧，可选吸附到关键帧或停顿")
+    parser.add_argument("--plan", "-p", required=True, help="剪辑方案 JSON 文件路径")
+    parser.add_argument("--output", "-o", required=True, help="输出剪辑方案路径（可与 --plan 相同）")
+    parser.add_argument("--input", "-i", help="源视频（提供帧率、关键帧和时长；--snap keyframe 时必需）")
+    parser.add_argument("--snap", choices=["none", "keyframe", "silence"], default="none",
+                        help="剪辑点吸附目标 (默认: none)")
+    parser.add_argument("--markers", help="停顿/尖峰标记（audio_events.py 或 vad.py --speech 的输出），"
+                        "默认使用方案同目录的 markers.json")
+    parser.add_argument("--snap-tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"剪辑点最多移动的秒数 (默认: {DEFAULT_TOLERANCE})")
+    parser.add_argument("--min-gap", type=float, default=None, help="间隙不超过该秒数的相邻片段合并 (默认: 一帧)")
+    parser.add_argument("--min-length", type=float, default=None, help="短于该秒数的片段丢弃 (默认: 一帧)")
+    args = parser.parse_args()
+
+    with open(args.plan, "r", encoding="utf-8") as f:
+        plan = json.load(f)
+    segments = plan.get("keep_segments", [])
+    if not segments:
+        print("错误: 剪辑方案中没有保留片段")
+        sys.exit(1)
+
+    index = None
+    if args.input:
+        try:
+            index = load_index(args.input)
+        except (RuntimeError, FileNotFoundError) as e:
+            print(f"错误: {e}")
+            sys.exit(1)
+    elif args.snap == "keyframe":
+        parser.error("--snap keyframe 需要 --input 提供关键帧")
+
+    markers = None
+    if args.snap == "silence":
+        markers_path = Path(args.markers) if args.markers else Path(args.plan).parent / "markers.json"
+        if not markers_path.exists():
+            print(f"错误: 标记文件不存在: {markers_path}（先运行 audio_events.py 或用 --markers 指定）")
+            sys.exit(1)
+        try:
+            markers = load_markers(str(markers_path))
+        except (ValueError, KeyError) as e:
+            print(f"错误: {e}")
+            sys.exit(1)
+
+    result, report = optimize_plan(segments, index, None if args.snap == "none" else args.snap, markers,
+                                   args.min_gap, args.min_length, args.snap_tolerance)
+    if not result:
+        print("错误: 优化后没有剩余的保留片段")
+        sys.exit(1)
+
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output_path.with_suffix(output_path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({**plan, "keep_segments": result}, f, ensure_ascii=False, indent=2)
+    tmp.replace(output_path)
+
+    print(f"✅ 剪辑方案已优化: {output_path}")
+    for line in format_report(report):
+        print(f"   {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+渲染片段缓存：逐段剪切 / 分段烧录时，每段输出以「源视频内容哈希、大小与 mtime + 起止时间 + 编码参数」为键保存，
+中断、个别片段失败或只改动了剪辑方案中的一个片段后重新运行，只需重做变化（或未完成）的片段再拼接。
+
+缓存目录结构（默认在源视频旁的 .render/，目录不可写时改用 ~/.cache/vlog_workflow/render/）:
+    {key}.ts / {key}.mp4      片段输出，编码完成后才从临时文件原子替换为正式文件名
+    {key}.*.partial.*         正在编码（或被中断）的临时文件
+    manifest.json             已完成片段的清单：键 → 文件名、大小、起止时间、类型、耗时
+
+只有清单中登记且文件大小一致的片段才会被复用，被中断时留下的半成品不会被误用。
+淘汰策略：每次渲染结束（无论成功与否）后，总大小超过上限（默认 20GB，--cache-max-mb）时按最近使用时间
+（文件 mtime，命中时刷新）从旧到新删除。不在写入时淘汰，以免删掉本次渲染中稍后拼接要用的片段。
+
+用法（通常由 cut_video.py / burn_subtitle.py 调用，也可单独查看/清理）:
+    python3 render_cache.py raw.mp4 --stats
+    python3 render_cache.py raw.mp4 --prune --max-mb 10000
+    python3 render_cache.py raw.mp4 --clear
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+CACHE_VERSION = 1
+FALLBACK_DIR = Path.home() / ".cache" / "vlog_workflow" / "render"
+DEFAULT_MAX_MB = 20000
+STALE_SECONDS = 24 * 3600  # 超过该时间仍未登记的临时文件 / 孤立文件视为中断残留
+
+
+def segment_key(index: dict, kind: str, start: float, end: float | None, params: dict) -> str:
+    """由源视频索引中的文件标识、片段类型、起止时间和编码参数生成缓存键。
+
+    quick_hash 只抽样部分内容，大小不变的局部修改可能抽样不到，因此同时计入文件大小和 mtime；
+    编码器线程数只影响速度、不影响画质，不计入键，改变 --jobs 后仍可复用已完成的片段。
+    """
+    source = index["source"]
+    payload = json.dumps({
+        "version": CACHE_VERSION,
+        "source": [source["quick_hash"], source["size"], source["mtime_ns"]],
+        "kind": kind,
+        "start": round(start, 6),
+        "end": None if end is None else round(end, 6),
+        "params": params,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+class RenderCache:
+    """基于文件系统的渲染片段缓存，可在多个线程中同时使用。"""
+
+    def __init__(self, cache_dir: Path, max_mb: float = DEFAULT_MAX_MB):
+        self.cache_dir = Path(cache_dir)
+        self.manifest_path = self.cache_dir / "manifest.json"
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_source(cls, source: str, max_mb: float = DEFAULT_MAX_MB) -> "RenderCache":
+        """源视频旁的 .render/ 目录，不可写时退到缓存目录。"""
+        p = Path(source).resolve()
+        digest = hashlib.sha256(str(p.parent).encode()).hexdigest()[:16]
+        for cache_dir in (p.parent / ".render", FALLBACK_DIR / digest):
+            try:
+                cache_dir.mkdir(parents=True, exist_ok=True)
+            except OSError:
+                continue
+            if os.access(cache_dir, os.W_OK):
+                return cls(cache_dir, max_mb)
+        raise RuntimeError(f"没有可写的渲染缓存目录: {p.parent / '.render'}")
+
+    # ── 清单 ─────────────────────────────────────────────────────────────────
+
+    def _load_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        return manifest.get("entries", {}) if manifest.get("version") == CACHE_VERSION else {}
+
+    def _save_manifest(self, entries: dict) -> None:
+        tmp = self.manifest_path.with_name(f"manifest.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "entries": entries}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    # ── 缓存条目 ─────────────────────────────────────────────────────────────
+
+    def get(self, key: str) -> Path | None:
+        """返回已完成的片段文件，没有或已损坏时返回 None。"""
+        entry = self._load_manifest().get(key)
+        path = self.cache_dir / entry["file"] if entry else None
+        try:
+            if path is None or path.stat().st_size != entry["bytes"]:
+                raise FileNotFoundError
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        os.utime(path)  # 刷新最近使用时间
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def partial_path(self, key: str, ext: str) -> Path:
+        """编码中使用的临时文件（扩展名保持 .ts/.mp4，ffmpeg 据此选择封装格式）。"""
+        fd, name = tempfile.mkstemp(dir=self.cache_dir, prefix=f"{key}.", suffix=f".partial.{ext}")
+        os.close(fd)
+        return Path(name)
+
+    def put(self, key: str, partial: Path, info: dict) -> Path:
+        """把编码完成的临时文件登记为正式条目，返回正式路径。"""
+        path = self.cache_dir / f"{key}{partial.suffix}"
+        os.replace(partial, path)
+        entry = {"file": path.name, "bytes": path.stat().st_size, "created": time.time(), **info}
+        with self._lock:
+            # 每次都重新读取清单再合并，其它进程同时写入时最多丢失对方的一条登记（之后按未命中重做）
+            entries = self._load_manifest()
+            entries[key] = entry
+            self._save_manifest(entries)
+        return path
+
+    def _files(self) -> list[tuple[Path, os.stat_result]]:
+        if not self.cache_dir.exists():
+            return []
+        return [(p, p.stat()) for p in self.cache_dir.iterdir()
+                if p.is_file() and p.name != self.manifest_path.name and not p.name.endswith(".tmp")]
+
+    def stats(self) -> dict:
+        entries = self._load_manifest()
+        files = self._files()
+        total = sum(st.st_size for _, st in files)
+        oldest = min((st.st_mtime for _, st in files), default=None)
+        return {
+            "cache_dir": str(self.cache_dir),
+            "entries": len(entries),
+            "files": len(files),
+            "total_bytes": total,
+            "max_bytes": self.max_bytes,
+            "oldest_used": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(oldest)) if oldest else None,
+        }
+
+    def prune(self, max_bytes: int | None = None) -> int:
+        """删除中断残留，并按最近使用时间淘汰条目直到总大小不超过上限，返回删除的文件数。"""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        with self._lock:
+            entries = self._load_manifest()
+            registered = {e["file"]: k for k, e in entries.items()}
+            now = time.time()
+            kept, removed = [], 0
+            for path, st in self._files():
+                if path.name not in registered and (limit == 0 or now - st.st_mtime > STALE_SECONDS):
+                    path.unlink(missing_ok=True)
+                    removed += 1
+                elif path.name in registered:
+                    kept.append((path, st))
+            kept.sort(key=lambda e: e[1].st_mtime)
+            total = sum(st.st_size for _, st in kept)
+            for path, st in kept:
+                if total <= limit:
+                    break
+                path.unlink(missing_ok=True)
+                entries.pop(registered[path.name], None)
+                total -= st.st_size
+                removed += 1
+            # 清单中登记但文件已不存在的条目一并去掉
+            entries = {k: e for k, e in entries.items() if (self.cache_dir / e["file"]).exists()}
+            if self.cache_dir.exists():
+                self._save_manifest(entries)
+        return removed
+
+    def summary(self) -> str:
+        return f"命中 {self.hits} 段，未命中 {self.misses} 段（{self.cache_dir}）"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查看或清理渲染片段缓存")
+    parser.add_argument("source", help="源视频路径（缓存位于其旁边的 .render/ 目录）")
+    parser.add_argument("--max-mb", type=float, default=DEFAULT_MAX_MB, help=f"缓存大小上限 MB (默认: {DEFAULT_MAX_MB})")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--stats", action="store_true", help="显示缓存统计")
+    group.add_argument("--prune", action="store_true", help="删除中断残留，并按 --max-mb 淘汰最久未使用的片段")
+    group.add_argument("--clear", action="store_true", help="清空所有缓存片段")
+    args = parser.parse_args()
+
+    try:
+        cache = RenderCache.for_source(args.source, args.max_mb)
+    except RuntimeError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+    if args.stats:
+        print(json.dumps(cache.stats(), ensure_ascii=False, indent=2))
+    elif args.prune:
+        removed = cache.prune()
+        print(f"✅ 已删除 {removed} 个缓存文件")
+    elif args.clear:
+        removed = cache.prune(max_bytes=0)
+        print(f"✅ 已清空 {removed} 个缓存文件")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+剪辑时间轴映射：把原始视频（raw.mp4）时间轴上的转录段落映射到剪辑后（edited.mp4）的时间轴，
+剪辑后无需再做一次完整的语音识别。
+
+规则:
+    - 完全落在被剪除区间内的段落被丢弃
+    - 部分被剪除的段落裁剪到保留部分；跨越剪辑点的段落在新时间轴上首尾相接，合并为一条
+    - 保留比例低于 min_keep_ratio 的段落视为被剪掉（避免只剩零点几秒的残句字幕）
+    - 段落带词级时间戳（words）时逐词映射，被剪掉的词同时从文本中去除
+
+每个段落用二分查找定位保留区间，数千段落的转录也只需毫秒级。
+
+cut_video.py 剪辑前会规范化剪辑方案（plan_optimizer.py：剪辑点对齐到帧、合并间隙不超过一帧的片段、去碎片）。
+指定 --source 原始视频时，映射前按同样的规则规范化，字幕与剪辑结果逐帧一致。
+
+用法:
+    python3 timeline.py --transcript transcript.json --plan cut_plan.json --source raw.mp4 --output edited_transcript.json
+"""
+
+import argparse
+import bisect
+import json
+import sys
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from media_index import load_index
+from plan_optimizer import optimize_plan
+
+
+class CutTimeline:
+    """由 keep_segments 构建的原始时间轴 → 剪辑后时间轴映射。"""
+
+    def __init__(self, keep_segments: list[dict]):
+        # 排序并合并重叠/相接的保留区间，与 cut_video.py 的剪辑结果保持一致
+        merged: list[list[float]] = []
+        for k in sorted(keep_segments, key=lambda k: k["start"]):
+            if k["end"] <= k["start"]:
+                continue
+            if merged and k["start"] <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], k["end"])
+            else:
+                merged.append([k["start"], k["end"]])
+
+        self.starts = [k[0] for k in merged]
+        self.ends = [k[1] for k in merged]
+        self.offsets = []
+        t = 0.0
+        for start, end in merged:
+            self.offsets.append(t)
+            t += end - start
+        self.duration = t
+
+    def map_time(self, t: float) -> float | None:
+        """映射单个时间点，落在被剪除区间内时返回 None。"""
+        i = bisect.bisect_right(self.starts, t) - 1
+        if i < 0 or t > self.ends[i]:
+            return None
+        return self.offsets[i] + t - self.starts[i]
+
+    def to_source(self, t: float) -> float:
+        """反向映射：剪辑后时间轴上的时间点 → 原始时间轴（超出范围时吸附到首尾）。"""
+        if not self.starts:
+            return t
+        i = max(bisect.bisect_right(self.offsets, t) - 1, 0)
+        return self.starts[i] + min(max(t - self.offsets[i], 0.0), self.ends[i] - self.starts[i])
+
+    def map_range(self, start: float, end: float) -> tuple[float, float, float] | None:
+        """映射区间 [start, end]，返回 (新起点, 新终点, 保留时长)，与保留区间无交集时返回 None。"""
+        # 第一个 end > start 的保留区间 … 最后一个 start < end 的保留区间
+        first = bisect.bisect_right(self.ends, start)
+        last = bisect.bisect_left(self.starts, end) - 1
+        if first > last:
+            return None
+        new_start = self.offsets[first] + max(start, self.starts[first]) - self.starts[first]
+        new_end = self.offsets[last] + min(end, self.ends[last]) - self.starts[last]
+        if new_end <= new_start:
+            return None
+        return new_start, new_end, new_end - new_start
+
+
+def iter_remap_segments(
+    segments: Iterable[dict],
+    keep_segments: list[dict],
+    min_keep_ratio: float = 0.0,
+) -> Iterator[dict]:
+    """逐段映射转录段落到剪辑后的时间轴（生成器，适合流式处理长转录）。"""
+    timeline = CutTimeline(keep_segments)
+    for seg in segments:
+        start, end = seg.get("start", 0), seg.get("end", 0)
+        mapped = timeline.map_range(start, end)
+        if mapped is None:
+            continue
+        new_start, new_end, kept = mapped
+        if end > start and kept / (end - start) < min_keep_ratio:
+            continue
+        item = {**seg, "start": round(new_start, 3), "end": round(new_end, 3)}
+        if "words" in seg:
+            # 有词级时间戳时逐词映射，被剪掉的词同时从文本中去除
+            words = []
+            for w in seg["words"]:
+                mapped_word = timeline.map_range(w.get("start", 0), w.get("end", 0))
+                if mapped_word is not None:
+                    words.append({**w, "start": round(mapped_word[0], 3), "end": round(mapped_word[1], 3)})
+            if not words:
+                continue
+            item["words"] = words
+            item["text"] = "".join(w.get("word", "") for w in words).strip()
+        yield item
+
+
+def remap_segments(
+    segments: list[dict],
+    keep_segments: list[dict],
+    min_keep_ratio: float = 0.0,
+) -> list[dict]:
+    """将转录段落映射到剪辑后的时间轴。"""
+    return list(iter_remap_segments(segments, keep_segments, min_keep_ratio))
+
+
+def remap_transcript(transcript: dict, keep_segments: list[dict], min_keep_ratio: float = 0.0) -> dict:
+    """映射整个 transcript.json 结构（segments、duration、text）。"""
+    segments = remap_segments(transcript.get("segments", []), keep_segments, min_keep_ratio)
+    return {
+        **transcript,
+        "duration": round(CutTimeline(keep_segments).duration, 3),
+        "text": "".join(s.get("text", "") for s in segments),
+        "segments": segments,
+    }
+
+
+def load_keep_segments(plan_path: str, source: str | None = None) -> list[dict]:
+    """读取剪辑方案的 keep_segments；指定原始视频时按 cut_video.py 的默认规则规范化。
+
+    吸附（--snap）不在此重做：吸附过的方案应先用 plan_optimizer.py 或 cut_video.py --save-plan 写回文件。
+    """
+    with open(plan_path, "r", encoding="utf-8") as f:
+        keep_segments = json.load(f).get("keep_segments", [])
+    if source and keep_segments:
+        keep_segments, _ = optimize_plan(keep_segments, load_index(source))
+    return keep_segments
+
+
+def main():
+    parser = argparse.ArgumentParser(description="将原始视频的转录映射到剪辑后的时间轴")
+    parser.add_argument("--transcript", "-t", required=True, help="原始视频的转录 JSON")
+    parser.add_argument("--plan", "-p", required=True, help="剪辑方案 JSON（keep_segments）")
+    parser.add_argument("--output", "-o", required=True, help="输出剪辑后时间轴的转录 JSON")
+    parser.add_argument("--source", help="原始视频（raw.mp4）：映射前按 cut_video.py 的规则规范化剪辑方案")
+    parser.add_argument("--min-keep-ratio", type=float, default=0.3,
+                        help="段落保留比例低于该值时丢弃 (默认: 0.3)")
+    args = parser.parse_args()
+
+    for path in (args.transcript, args.plan):
+        if not Path(path).exists():
+            print(f"错误: 输入文件不存在: {path}")
+            sys.exit(1)
+
+    with open(args.transcript, "r", encoding="utf-8") as f:
+        transcript = json.load(f)
+    try:
+        keep_segments = load_keep_segments(args.plan, args.source)
+    except RuntimeError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+    if not keep_segments:
+        print("错误: 剪辑方案中没有保留片段")
+        sys.exit(1)
+
+    result = remap_transcript(transcript, keep_segments, args.min_keep_ratio)
+
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    print(f"✅ 时间轴映射完成: {output_path}")
+    print(f"   段落数: {len(transcript.get('segments', []))} → {len(result['segments'])}")
+    print(f"   剪辑后时长: {result['duration']:.1f} 秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,9 @@ except ImportError:
     print("错误: 请先安装 python-pptx: pip install python-pptx Pillow")
     sys.exit(1)
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "common"))
+from instrument import add_trace_argument, setup_tracing, traced, tracer
+
 
 # ── 配色方案 ──────────────────────────────────────────────────────────────────
 
@@ -266,10 +269,12 @@ def create_ending_slide(prs, theme: dict):
     return slide
 
 
+@traced()
 def generate_ppt(input_path: str, output_path: str, title: str, theme_name: str = "tech_blue"):
     """主生成函数：Markdown → PPTX。"""
     theme = THEMES.get(theme_name, THEMES["tech_blue"])
-    sections = parse_markdown(input_path)
+    with tracer.span("parse_markdown", bytes_in=Path(input_path).stat().st_size):
+        sections = parse_markdown(input_path)
 
     if not sections:
         print(f"错误: 未能从 {input_path} 解析出任何内容")
@@ -298,7 +303,9 @@ def generate_ppt(input_path: str, output_path: str, title: str, theme_name: str
     # 保存
     output = Path(output_path)
     output.parent.mkdir(parents=True, exist_ok=True)
-    prs.save(str(output))
+    with tracer.span("save_pptx", slides=len(prs.slides)) as sp:
+        prs.save(str(output))
+        sp.add(bytes_out=output.stat().st_size)
     print(f"✅ PPT 已生成: {output}")
     print(f"   共 {len(prs.slides)} 页")
     print(f"   配色方案: {theme['name']}")
@@ -315,7 +322,9 @@ def main():
         choices=list(THEMES.keys()),
         help="配色方案 (默认: tech_blue)",
     )
+    add_trace_argument(parser)
     args = parser.parse_args()
+    setup_tracing(args.trace)
     generate_ppt(args.input, args.output, args.title, args.theme)
 
 
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+流水线基准测试：本地合成测试素材，逐阶段计时，与保存的基线对比，发现吞吐或内存回退。
+
+    - 测试视频用 ffmpeg lavfi 合成（testsrc2 画面 + 正弦波 / 粉红噪声音频），覆盖不同时长、GOP 和编码，
+      按参数缓存在 ~/.cache/vlog_workflow/bench/fixtures/，重复运行不再生成
+    - 合成转录（可带词级时间戳）、剪辑方案和带重读的口播稿按规模递增，随机种子固定，结果可复现
+    - 转录阶段对接本地 speaches 替身服务（mock_speaches.py），不需要 GPU / Docker
+    - 每个用例作为独立子进程运行，带 --trace 采集 CPU 时间与峰值内存（见 common/instrument.py），
+      重复 --repeat 次取墙钟中位数
+    - 吞吐指标：视频类用例为实时倍率（媒体时长 / 墙钟），字幕生成为每秒段落数，口播稿对齐为每秒句数
+
+回退判定（与基线逐用例对比）:
+    吞吐下降超过 --max-slowdown（默认 10%）或峰值内存增长超过 --max-memory-growth（默认 20%）即视为回退，
+    退出码为 1。基线与机器相关，换机器后请重新 --save-baseline。
+
+用法:
+    python3 bench_pipeline.py --save-baseline            # 在当前版本上建立基线
+    python3 bench_pipeline.py                            # 改动后对比基线
+    python3 bench_pipeline.py --suite full --repeat 3 --only "cut-*"
+    python3 bench_pipeline.py --list                     # 列出用例
+
+依赖:
+    ffmpeg（缺少时跳过视频类用例，只运行字幕生成和口播稿对齐用例）
+    pip install requests（转录用例）
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(SKILL_DIR / "common"))
+sys.path.insert(0, str(SKILL_DIR / "subtitle" / "scripts"))
+from subtitle_writer import write_cues
+
+BENCH_DIR = Path.home() / ".cache" / "vlog_workflow" / "bench"
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+
+SCRIPTS = {
+    "transcribe": SKILL_DIR / "video_edit" / "scripts" / "transcribe.py",
+    "transcribe_batch": SKILL_DIR / "video_edit" / "scripts" / "transcribe_batch.py",
+    "cut": SKILL_DIR / "video_edit" / "scripts" / "cut_video.py",
+    "align": SKILL_DIR / "video_edit" / "scripts" / "align_script.py",
+    "srt": SKILL_DIR / "subtitle" / "scripts" / "generate_srt.py",
+    "burn": SKILL_DIR / "subtitle" / "scripts" / "burn_subtitle.py",
+}
+
+# 合成素材: 名称 → (时长秒, GOP 帧数, 视频编码, 音频源)
+MEDIA = {
+    "h264-g60-10s": (10, 60, "h264", "sine"),
+    "h264-g30-60s": (60, 30, "h264", "sine"),
+    "h264-g250-60s": (60, 250, "h264", "noise"),
+    "hevc-g60-60s": (60, 60, "hevc", "noise"),
+    "h264-g120-300s": (300, 120, "h264", "sine"),
+}
+MEDIA_SIZE = "1280x720"
+MEDIA_FPS = 30
+
+# cut 列表为剪辑引擎，其中 draft 表示用 draft 编码档位预览（滤镜图引擎 + 540p）
+SUITES = {
+    "quick": {
+        "media": ["h264-g60-10s"],
+        "srt": [1_000, 10_000],
+        "align": [1_000],
+        "cut": ["segment", "filter", "smart", "draft"],
+        "burn": ["ass"],
+        "transcribe": ["h264-g60-10s"],
+        "batch": 0,
+    },
+    "full": {
+        "media": ["h264-g30-60s", "h264-g250-60s", "hevc-g60-60s"],
+        "srt": [1_000, 10_000, 100_000],
+        "align": [1_000, 5_000],
+        "cut": ["segment", "filter", "smart", "draft"],
+        "burn": ["none", "ass", "overlay"],
+        "transcribe": ["h264-g120-300s"],
+        "batch": 4,
+    },
+}
+
+
+class BenchError(Exception):
+    pass
+
+
+# ── 合成素材 ──────────────────────────────────────────────────────────────────
+
+def make_media(name: str, fixtures_dir: Path) -> Path:
+    """用 lavfi 合成测试视频（固定 GOP、关闭场景切换检测，关键帧位置可预期），已存在时直接复用。"""
+    seconds, gop, codec, audio = MEDIA[name]
+    path = fixtures_dir / f"{name}.mp4"
+    if path.exists():
+        return path
+    fixtures_dir.mkdir(parents=True, exist_ok=True)
+    audio_src = (f"sine=frequency=440:sample_rate=48000:duration={seconds}" if audio == "sine"
+                 else f"anoisesrc=color=pink:amplitude=0.2:sample_rate=48000:duration={seconds}:seed=1")
+    if codec == "hevc":
+        video_args = ["-c:v", "libx265", "-preset", "ultrafast", "-tag:v", "hvc1",
+                      "-x265-params", f"keyint={gop}:min-keyint={gop}:scenecut=0:log-level=error"]
+    else:
+        video_args = ["-c:v", "libx264", "-preset", "veryfast", "-g", str(gop), "-keyint_min", str(gop),
+                      "-sc_threshold", "0"]
+    tmp = path.with_name(path.name + ".tmp.mp4")
+    cmd = [
+        "ffmpeg",
+        "-f", "lavfi", "-i", f"testsrc2=size={MEDIA_SIZE}:rate={MEDIA_FPS}:duration={seconds}",
+        "-f", "lavfi", "-i", audio_src,
+        *video_args, "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", "128k",
+        "-shortest", "-y", str(tmp),
+    ]
+    print(f"  生成测试素材: {name}")
+    try:
+        subprocess.run(cmd, capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        tmp.unlink(missing_ok=True)
+        raise BenchError(f"生成测试素材失败: {name}: {e.stderr[-300:]}")
+    os.replace(tmp, path)
+    return path
+
+
+def make_transcript(n_segments: int, seed: int = 0, words: bool = True) -> dict:
+    """合成 format_transcript() 结构的转录：段落 1-6 秒、中英混排，奇数段带词级时间戳。"""
+    rng = random.Random(seed)
+    pieces = ["今天", "我们", "来聊", "一聊", "视频", "剪辑", "的", "自动化", "流程", "ffmpeg", "Whisper", "，", "。"]
+    segments = []
+    t = 0.0
+    for i in range(n_segments):
+        t += rng.uniform(0.0, 0.8)
+        tokens = [rng.choice(pieces) for _ in range(rng.randint(4, 30))]
+        duration = rng.uniform(1.0, 6.0)
+        seg = {"start": round(t, 2), "end": round(t + duration, 2), "text": "".join(tokens)}
+        if words and i % 2:
+            step = duration / len(tokens)
+            seg["words"] = [{"start": round(t + k * step, 2), "end": round(t + (k + 1) * step, 2), "word": w}
+                            for k, w in enumerate(tokens)]
+        segments.append(seg)
+        t += duration
+    return {"language": "zh", "duration": round(t, 2), "text": "", "segments": segments}
+
+
+def make_plan(duration: float, seed: int = 0, keep: tuple[float, float] = (2.0, 8.0),
+              gap: tuple[float, float] = (0.3, 2.0)) -> dict:
+    """合成剪辑方案：保留片段与剪除空隙交替，长度随机。"""
+    rng = random.Random(seed)
+    keeps = []
+    t = rng.uniform(*gap)
+    while t < duration:
+        end = min(t + rng.uniform(*keep), duration)
+        if end - t > 0.5:
+            keeps.append({"start": round(t, 3), "end": round(end, 3), "note": f"片段 {len(keeps) + 1}"})
+        t = end + rng.uniform(*gap)
+    return {"keep_segments": keeps}
+
+
+def make_speech(n_sentences: int, seed: int = 0, retake: float = 0.2) -> tuple[str, dict]:
+    """合成口播稿和对应的转录：约 retake 比例的句子先读半句或整句再重读，穿插语气词和即兴内容。"""
+    rng = random.Random(seed)
+    chars = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方"
+    vocab = ["".join(rng.choice(chars) for _ in range(rng.randint(2, 4))) for _ in range(2000)]
+    sentences = ["".join(rng.choice(vocab) for _ in range(rng.randint(4, 9))) for _ in range(n_sentences)]
+    segments = []
+    t = 0.0
+    for s in sentences:
+        texts = [s]
+        if rng.random() < retake:
+            texts.insert(0, s[: len(s) // 2] if rng.random() < 0.5 else s)
+        if rng.random() < 0.05:
+            texts.insert(0, rng.choice(["嗯", "稍等一下"]))
+        for text in texts:
+            t += rng.uniform(0.2, 1.5)
+            segments.append({"start": round(t, 2), "end": round(t + len(text) * 0.25, 2), "text": text + "，"})
+            t += len(text) * 0.25
+    md = "\n".join(f"{s}。" for s in sentences)
+    return md, {"language": "zh", "duration": round(t + 1.0, 2), "text": "", "segments": segments}
+
+
+def write_json(data: dict, path: Path) -> Path:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    return path
+
+
+def write_srt(duration: float, path: Path, seed: int = 0) -> Path:
+    """覆盖整段视频的合成字幕。"""
+    segments = make_transcript(int(duration), seed, words=False)["segments"]
+    cues = ((s["start"], s["end"], s["text"][:20]) for s in segments if s["end"] <= duration)
+    with open(path, "w", encoding="utf-8") as f:
+        write_cues(cues, f, "srt")
+    return path
+
+
+# ── 用例 ──────────────────────────────────────────────────────────────────────
+
+def build_cases(suite: dict, has_ffmpeg: bool) -> list[dict]:
+    """用例列表。每个用例给出生成输入的 setup 和吞吐的计量单位，命令在运行时生成。"""
+    cases = []
+    for n in suite["srt"]:
+        cases.append({"name": f"srt-{n}", "kind": "srt", "size": n, "unit": "段/秒"})
+    for n in suite["align"]:
+        cases.append({"name": f"align-{n}", "kind": "align", "size": n, "unit": "句/秒"})
+    if not has_ffmpeg:
+        return cases
+    for media in suite["media"]:
+        for engine in suite["cut"]:
+            cases.append({"name": f"cut-{engine}-{media}", "kind": "cut", "media": media, "engine": engine,
+                          "unit": "x 实时"})
+        for mode in suite["burn"]:
+            cases.append({"name": f"burn-{mode}-{media}", "kind": "burn", "media": media, "mode": mode,
+                          "unit": "x 实时"})
+    for media in suite["transcribe"]:
+        cases.append({"name": f"transcribe-{media}", "kind": "transcribe", "media": media, "unit": "x 实时"})
+    if suite["batch"]:
+        media = suite["media"][0]
+        cases.append({"name": f"transcribe-batch{suite['batch']}-{media}", "kind": "batch", "media": media,
+                      "count": suite["batch"], "unit": "x 实时"})
+    return cases
+
+
+def prepare_case(case: dict, work: Path, fixtures: Path, api_url: str | None) -> tuple[list[str], float]:
+    """生成用例输入，返回 (命令行, 吞吐的分子：段落数或媒体秒数)。"""
+    py = sys.executable
+    if case["kind"] == "srt":
+        transcript = make_transcript(case["size"])
+        src = write_json(transcript, work / "transcript.json")
+        plan = write_json(make_plan(transcript["duration"], keep=(20.0, 120.0)), work / "plan.json")
+        return [py, str(SCRIPTS["srt"]), "-i", str(src), "-o", str(work / "out.srt"), "--plan", str(plan)], \
+            case["size"]
+
+    if case["kind"] == "align":
+        md, transcript = make_speech(case["size"])
+        script = work / "speech.md"
+        script.write_text(md, encoding="utf-8")
+        src = write_json(transcript, work / "transcript.json")
+        return [py, str(SCRIPTS["align"]), "-t", str(src), "-s", str(script), "-o", str(work / "plan.json")], \
+            case["size"]
+
+    media = make_media(case["media"], fixtures)
+    seconds = MEDIA[case["media"]][0]
+    if case["kind"] == "cut":
+        plan = make_plan(seconds)
+        kept = sum(k["end"] - k["start"] for k in plan["keep_segments"])
+        return [py, str(SCRIPTS["cut"]), "-i", str(media), "-p", str(write_json(plan, work / "plan.json")),
+                "-o", str(work / "out.mp4"), "--no-cache",
+                *(["--profile", "draft"] if case["engine"] == "draft" else ["--engine", case["engine"]])], kept
+    if case["kind"] == "burn":
+        srt = write_srt(seconds, work / "sub.srt")
+        return [py, str(SCRIPTS["burn"]), "-i", str(media), "-s", str(srt), "-o", str(work / "out.mp4"),
+                "--prerender", case["mode"], "--no-cache"], seconds
+    if case["kind"] == "transcribe":
+        return [py, str(SCRIPTS["transcribe"]), "-i", str(media), "-o", str(work / "transcript.json"),
+                "--api-url", api_url, "--no-cache"], seconds
+    if case["kind"] == "batch":
+        inputs = []
+        for i in range(case["count"]):
+            copy = work / f"input_{i}.mp4"
+            shutil.copyfile(media, copy)
+            inputs.append(str(copy))
+        return [py, str(SCRIPTS["transcribe_batch"]), *inputs, "-o", str(work / "out"),
+                "--api-url", api_url, "--no-cache"], seconds * case["count"]
+    raise BenchError(f"未知用例类型: {case['kind']}")
+
+
+def run_case(cmd: list[str], work: Path) -> dict:
+    """运行一次用例（子进程），返回墙钟、CPU（含 ffmpeg 子进程）和峰值内存。"""
+    trace_path = work / "trace.json"
+    trace_path.unlink(missing_ok=True)
+    env = {k: v for k, v in os.environ.items() if k != "VLOG_TRACE"}
+    t0 = time.perf_counter()
+    result = subprocess.run(cmd + ["--trace", str(trace_path)], capture_output=True, text=True, env=env)
+    wall = time.perf_counter() - t0
+    if result.returncode != 0:
+        tail = "\n".join((result.stdout + result.stderr).strip().split("\n")[-5:])
+        raise BenchError(f"退出码 {result.returncode}\n{tail}")
+    with open(trace_path, "r", encoding="utf-8") as f:
+        trace = json.load(f)
+    return {
+        "wall": wall,
+        "cpu": trace["cpu"] + trace["children_cpu"],
+        "peak_rss_mb": max(trace["peak_rss_mb"], trace["children_peak_rss_mb"]),
+    }
+
+
+def run_suite(cases: list[dict], repeat: int, fixtures: Path, mock_speed: float) -> dict:
+    server = api_url = None
+    if any(c["kind"] in ("transcribe", "batch") for c in cases):
+        sys.path.insert(0, str(SKILL_DIR / "video_edit" / "scripts"))
+        from mock_speaches import start_server
+        server = start_server(0, latency=0.05, speed=mock_speed)
+        api_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    results = {}
+    try:
+        for case in cases:
+            with tempfile.TemporaryDirectory(prefix="vlog_bench_") as tmp:
+                work = Path(tmp)
+                try:
+                    cmd, amount = prepare_case(case, work, fixtures, api_url)
+                    runs = [run_case(cmd, work) for _ in range(repeat)]
+                except BenchError as e:
+                    print(f"  ✗ {case['name']}: {e}")
+                    results[case["name"]] = {"error": str(e)}
+                    continue
+            wall = statistics.median(r["wall"] for r in runs)
+            results[case["name"]] = {
+                "wall": round(wall, 4),
+                "cpu": round(statistics.median(r["cpu"] for r in runs), 4),
+                "peak_rss_mb": max(r["peak_rss_mb"] for r in runs),
+                "throughput": round(amount / wall, 3) if wall > 0 else 0.0,
+                "unit": case["unit"],
+            }
+            r = results[case["name"]]
+            print(f"  {case['name']:<36}{r['wall']:>9.2f}s{r['throughput']:>11.1f} {r['unit']:<6}"
+                  f"{r['peak_rss_mb']:>8.0f}MB")
+    finally:
+        if server:
+            server.shutdown()
+    return results
+
+
+# ── 基线对比 ──────────────────────────────────────────────────────────────────
+
+def environment() -> dict:
+    try:
+        first = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True).stdout.split("\n")[0]
+    except FileNotFoundError:
+        first = None
+    return {"platform": platform.platform(), "machine": platform.machine(), "cpu_count": os.cpu_count(),
+            "python": platform.python_version(), "ffmpeg": first}
+
+
+def compare(results: dict, baseline: dict, max_slowdown: float, max_memory_growth: float) -> list[str]:
+    """逐用例与基线对比，返回回退说明列表。"""
+    regressions = []
+    print(f"\n{'用例':<36}{'吞吐 基线→本次':>22}{'变化':>9}{'内存 基线→本次':>20}{'变化':>9}")
+    for name, cur in results.items():
+        base = baseline.get("cases", {}).get(name)
+        if not base or "error" in base or "error" in cur:
+            continue
+        speed = cur["throughput"] / base["throughput"] - 1 if base["throughput"] else 0.0
+        memory = cur["peak_rss_mb"] / base["peak_rss_mb"] - 1 if base["peak_rss_mb"] else 0.0
+        flags = []
+        if speed < -max_slowdown:
+            flags.append("吞吐")
+            regressions.append(f"{name}: 吞吐下降 {-speed * 100:.1f}%（阈值 {max_slowdown * 100:.0f}%）")
+        if memory > max_memory_growth:
+            flags.append("内存")
+            regressions.append(f"{name}: 峰值内存增长 {memory * 100:.1f}%（阈值 {max_memory_growth * 100:.0f}%）")
+        mark = f"  ⚠ {'/'.join(flags)}回退" if flags else ""
+        throughput = f"{base['throughput']:.1f} → {cur['throughput']:.1f}"
+        rss = f"{base['peak_rss_mb']:.0f} → {cur['peak_rss_mb']:.0f}MB"
+        print(f"{name:<36}{throughput:>22}{speed * 100:>+8.1f}%{rss:>20}{memory * 100:>+8.1f}%{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流水线基准测试：合成素材逐阶段计时并与基线对比")
+    parser.add_argument("--suite", choices=sorted(SUITES), default="quick", help="用例集 (默认: quick)")
+    parser.add_argument("--only", action="append", help="只运行名称匹配的用例（通配符，可重复）")
+    parser.add_argument("--repeat", type=int, default=1, help="每个用例重复次数，取墙钟中位数 (默认: 1)")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help=f"基线文件 (默认: {DEFAULT_BASELINE})")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--output", "-o", help="另存本次结果 JSON")
+    parser.add_argument("--max-slowdown", type=float, default=0.10, help="允许的吞吐下降比例 (默认: 0.10)")
+    parser.add_argument("--max-memory-growth", type=float, default=0.20, help="允许的峰值内存增长比例 (默认: 0.20)")
+    parser.add_argument("--mock-speed", type=float, default=500.0,
+                        help="speaches 替身服务模拟的转录速度（音频秒数 / 处理秒数）(默认: 500)")
+    parser.add_argument("--fixtures", default=str(BENCH_DIR / "fixtures"), help="合成素材缓存目录")
+    parser.add_argument("--list", action="store_true", help="只列出用例")
+    args = parser.parse_args()
+
+    has_ffmpeg = shutil.which("ffmpeg") is not None
+    cases = build_cases(SUITES[args.suite], has_ffmpeg)
+    if args.only:
+        cases = [c for c in cases if any(fnmatch.fnmatch(c["name"], p) for p in args.only)]
+    if args.list:
+        for case in cases:
+            print(case["name"])
+        return
+    if not has_ffmpeg:
+        print("警告: 未找到 ffmpeg，跳过视频类用例（剪辑、烧录、转录）")
+    if not cases:
+        print("错误: 没有匹配的用例")
+        sys.exit(1)
+
+    print(f"运行 {args.suite} 用例集: {len(cases)} 个用例，每个重复 {args.repeat} 次")
+    results = run_suite(cases, max(args.repeat, 1), Path(args.fixtures).expanduser(), args.mock_speed)
+    report = {"suite": args.suite, "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "env": environment(),
+              "cases": results}
+    if args.output:
+        write_json(report, Path(args.output))
+
+    failed = [name for name, r in results.items() if "error" in r]
+    baseline_path = Path(args.baseline).expanduser()
+    if args.save_baseline:
+        if failed:
+            print(f"错误: {len(failed)} 个用例失败，未保存基线")
+            sys.exit(1)
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        write_json(report, baseline_path)
+        print(f"\n✅ 基线已保存: {baseline_path}")
+        return
+
+    regressions = []
+    if baseline_path.exists():
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("env", {}).get("cpu_count") != report["env"]["cpu_count"] or \
+                baseline.get("env", {}).get("ffmpeg") != report["env"]["ffmpeg"]:
+            print("\n警告: 基线来自不同的机器或 ffmpeg 版本，对比结果仅供参考")
+        regressions = compare(results, baseline, args.max_slowdown, args.max_memory_growth)
+    else:
+        print(f"\n未找到基线 {baseline_path}，使用 --save-baseline 建立")
+
+    if regressions or failed:
+        print(f"\n❌ 发现 {len(regressions)} 项回退，{len(failed)} 个用例失败")
+        for line in regressions:
+            print(f"   {line}")
+        sys.exit(1)
+    print("\n✅ 无性能回退")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+项目目录监视器：常驻运行，监视 ~/vlog_projects/ 下的各个项目，按产物依赖图增量执行流水线。
+
+依赖图（每个阶段只在输入内容变化时重建）:
+
+    raw.mp4 ──────────────→ transcript.json ──┐
+       │                                      ├──→ subtitle.srt ──┐
+       └──→ edited.mp4 ←── cut_plan.json ─────┘                   ├──→ final.mp4
+                │                                                 │
+                └─────────────────────────────────────────────────┘
+
+    transcript  transcribe.py    raw.mp4                        → transcript.json
+    edited      cut_video.py     raw.mp4 + cut_plan.json        → edited.mp4
+    subtitle    generate_srt.py  transcript.json + cut_plan.json → subtitle.srt（按剪辑方案映射时间轴，
+                                 方案与 cut_video.py 一样按 raw.mp4 的帧率/关键帧规范化，raw.mp4 也是其输入）
+    final       burn_subtitle.py edited.mp4 + subtitle.srt      → final.mp4
+
+cut_plan.json 由 Agent / 用户编写，监视器只读取不生成；缺少时下游阶段等待。
+
+规则:
+    - 是否重建按输入文件的内容哈希（SHA-256）判断，与 mtime 无关；touch、复制不会触发重建。
+      哈希按 (大小, mtime) 记忆，文件未变化时不重复计算
+    - 文件最后修改后静置 --settle 秒才视为写入完成（例如 raw.mp4 仍在复制中时不会开始转录）
+    - 产物被手动修改（例如校对后的 subtitle.srt）时不会被覆盖，下游按修改后的内容重建；
+      删除该产物即可恢复自动生成
+    - 首次接管已有产物的项目时，现有产物视为最新，不会整体重跑
+    - 失败的阶段在输入变化前不会重试，日志保存在 {project}/.pipeline/logs/
+    - 不同项目、同一项目中互不依赖的阶段并发执行，总占用不超过 --cpus；
+      编码阶段（edited、final）占用 --encode-cpus 个核，其余阶段占 1 个
+
+状态保存在 {project}/.pipeline/state.json。
+--trace 指定目录时，监视器与各阶段子进程各写一份性能 trace（见 common/instrument.py）。
+
+用法:
+    python3 watch_projects.py                          # 持续监视 ~/vlog_projects
+    python3 watch_projects.py --once                   # 把所有项目处理到最新后退出
+    python3 watch_projects.py --status                 # 只打印各项目各阶段的状态
+    python3 watch_projects.py --project demo --cpus 8 --api-url http://gpu-box:8000
+    python3 watch_projects.py --once --trace ~/vlog_traces
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(SKILL_DIR / "common"))
+from instrument import add_trace_argument, setup_tracing, tracer
+
+DEFAULT_ROOT = Path.home() / "vlog_projects"
+STATE_DIR = ".pipeline"
+
+STAGES = [
+    {"name": "transcript", "inputs": ("raw.mp4",), "output": "transcript.json", "heavy": False},
+    {"name": "edited", "inputs": ("raw.mp4", "cut_plan.json"), "output": "edited.mp4", "heavy": True},
+    {"name": "subtitle", "inputs": ("raw.mp4", "transcript.json", "cut_plan.json"), "output": "subtitle.srt",
+     "heavy": False},
+    {"name": "final", "inputs": ("edited.mp4", "subtitle.srt"), "output": "final.mp4", "heavy": True},
+]
+PRODUCED_BY = {stage["output"]: stage["name"] for stage in STAGES}
+
+
+def stage_command(stage: dict, project: Path, threads: int, args: argparse.Namespace) -> list[str]:
+    """各阶段调用的脚本与参数。"""
+    p = {name: str(project / name) for name in (
+        "raw.mp4", "transcript.json", "cut_plan.json", "edited.mp4", "subtitle.srt", "final.mp4")}
+    name = stage["name"]
+    if name == "transcript":
+        cmd = [sys.executable, str(SKILL_DIR / "video_edit" / "scripts" / "transcribe.py"),
+               "--input", p["raw.mp4"], "--output", p["transcript.json"], "--api-url", args.api_url]
+        return cmd + (["--word-timestamps"] if args.word_timestamps else [])
+    if name == "edited":
+        return [sys.executable, str(SKILL_DIR / "video_edit" / "scripts" / "cut_video.py"),
+                "--input", p["raw.mp4"], "--plan", p["cut_plan.json"], "--output", p["edited.mp4"],
+                "--encoder-threads", str(threads)]
+    if name == "subtitle":
+        return [sys.executable, str(SKILL_DIR / "subtitle" / "scripts" / "generate_srt.py"),
+                "--input", p["transcript.json"], "--plan", p["cut_plan.json"], "--source", p["raw.mp4"],
+                "--output", p["subtitle.srt"]]
+    return [sys.executable, str(SKILL_DIR / "subtitle" / "scripts" / "burn_subtitle.py"),
+            "--input", p["edited.mp4"], "--subtitle", p["subtitle.srt"], "--output", p["final.mp4"]]
+
+
+# ── 项目状态 ─────────────────────────────────────────────────────────────────
+
+class ProjectState:
+    """单个项目的持久化状态：文件哈希记忆 + 各阶段上次成功/失败时的输入哈希。"""
+
+    def __init__(self, project: Path):
+        self.project = project
+        self.path = project / STATE_DIR / "state.json"
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {}
+        self.files: dict = data.get("files", {})
+        self.stages: dict = data.get("stages", {})
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files, "stages": self.stages}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+    def file_hash(self, name: str, settle: float = 0.0) -> str | None:
+        """返回文件内容哈希；文件不存在或仍在写入（修改后不足 settle 秒）时返回 None。"""
+        path = self.project / name
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return None
+        if time.time() - st.st_mtime < settle:
+            return None
+        memo = self.files.get(name)
+        if memo and memo["size"] == st.st_size and memo["mtime_ns"] == st.st_mtime_ns:
+            return memo["sha256"]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        self.files[name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": h.hexdigest()}
+        return h.hexdigest()
+
+
+def plan_project(state: ProjectState, running: set[str], settle: float) -> dict[str, dict]:
+    """按拓扑顺序判断每个阶段的状态。
+
+    返回 {阶段名: {"status": ..., "inputs": {文件: 哈希}}}，status 取值:
+        clean    产物是最新的
+        pinned   产物被手动修改过，保留不覆盖
+        ready    需要重建且可以立即执行
+        running  正在执行
+        blocked  上游阶段尚未完成
+        waiting  缺少输入文件
+        settling 输入文件仍在写入
+        failed   上次执行失败且输入未变化
+    """
+    plan = {}
+    for stage in STAGES:
+        name = stage["name"]
+        if name in running:
+            plan[name] = {"status": "running", "inputs": {}}
+            continue
+        upstream = [PRODUCED_BY[i] for i in stage["inputs"] if i in PRODUCED_BY]
+        if any(plan[u]["status"] not in ("clean", "pinned") for u in upstream):
+            plan[name] = {"status": "blocked", "inputs": {}}
+            continue
+        if not all((state.project / i).exists() for i in stage["inputs"]):
+            plan[name] = {"status": "waiting", "inputs": {}}
+            continue
+        inputs = {i: state.file_hash(i, settle) for i in stage["inputs"]}
+        if any(h is None for h in inputs.values()):
+            plan[name] = {"status": "settling", "inputs": {}}
+            continue
+
+        record = state.stages.get(name)
+        output_hash = state.file_hash(stage["output"])
+        if record is None and output_hash is not None:
+            # 首次接管已有产物：视为最新
+            state.stages[name] = record = {"status": "ok", "inputs": inputs, "output": output_hash}
+
+        if record and output_hash is not None and record.get("status") == "ok":
+            if output_hash != record.get("output"):
+                status = "pinned"
+            elif record.get("inputs") == inputs:
+                status = "clean"
+            else:
+                status = "ready"
+        elif record and record.get("status") == "failed" and record.get("inputs") == inputs:
+            status = "failed"
+        else:
+            status = "ready"
+        plan[name] = {"status": status, "inputs": inputs}
+    return plan
+
+
+def run_stage(stage: dict, project: Path, cmd: list[str]) -> tuple[int, float]:
+    """执行单个阶段，输出写入 {project}/.pipeline/logs/{stage}.log，返回 (退出码, 耗时)。"""
+    log_dir = project / STATE_DIR / "logs"
+    log_dir.mkdir(parents=True, exist_ok=True)
+    t0 = time.monotonic()
+    with open(log_dir / f"{stage['name']}.log", "w", encoding="utf-8") as log:
+        log.write("$ " + " ".join(cmd) + "\n\n")
+        log.flush()
+        with tracer.span(f"stage:{stage['name']}", project=project.name) as sp:
+            result = subprocess.run(cmd, stdout=log, stderr=subprocess.STDOUT)
+            sp.add(returncode=result.returncode)
+    return result.returncode, time.monotonic() - t0
+
+
+# ── 调度 ─────────────────────────────────────────────────────────────────────
+
+def discover_projects(root: Path, names: list[str] | None) -> list[Path]:
+    if names:
+        return [root / n for n in names if (root / n).is_dir()]
+    if not root.exists():
+        return []
+    return sorted(p for p in root.iterdir() if p.is_dir() and not p.name.startswith("."))
+
+
+def print_status(projects: list[Path], settle: float) -> None:
+    for project in projects:
+        state = ProjectState(project)
+        plan = plan_project(state, set(), settle)
+        print(f"{project.name}: " + "  ".join(f"{name}={info['status']}" for name, info in plan.items()))
+
+
+def watch(args: argparse.Namespace) -> None:
+    root = Path(args.root).expanduser()
+    budget = max(1, args.cpus)
+    encode_cpus = min(budget, max(1, args.encode_cpus or budget // 2))
+    stage_by_name = {stage["name"]: stage for stage in STAGES}
+
+    states: dict[Path, ProjectState] = {}
+    running: dict = {}  # future → (project, stage, 输入哈希, 占用核数)
+    used = 0
+
+    print(f"监视目录: {root}（CPU 预算 {budget}，编码阶段每个占用 {encode_cpus}）")
+    with ThreadPoolExecutor(max_workers=budget) as pool:
+        while True:
+            # 收集已完成的阶段
+            done = [f for f in running if f.done()]
+            for future in done:
+                project, stage, inputs, cpus = running.pop(future)
+                used -= cpus
+                state = states[project]
+                try:
+                    code, elapsed = future.result()
+                except OSError as e:
+                    code, elapsed = -1, 0.0
+                    print(f"错误: {project.name}/{stage['name']} 无法启动: {e}")
+                record = {"status": "ok" if code == 0 else "failed", "inputs": inputs,
+                          "output": state.file_hash(stage["output"]), "finished": time.time()}
+                state.stages[stage["name"]] = record
+                state.save()
+                if code == 0:
+                    print(f"✅ {project.name}/{stage['name']} 完成 ({elapsed:.1f}s)")
+                else:
+                    print(f"❌ {project.name}/{stage['name']} 失败 (退出码 {code})，"
+                          f"日志: {project / STATE_DIR / 'logs' / (stage['name'] + '.log')}")
+
+            # 扫描项目并启动可执行的阶段
+            pending = False
+            for project in discover_projects(root, args.project):
+                state = states.setdefault(project, ProjectState(project))
+                active = {stage["name"] for p, stage, _, _ in running.values() if p == project}
+                before = json.dumps(state.stages), json.dumps(state.files)
+                plan = plan_project(state, active, args.settle)
+                if (json.dumps(state.stages), json.dumps(state.files)) != before:
+                    state.save()
+                for name, info in plan.items():
+                    if info["status"] in ("running", "settling", "ready"):
+                        pending = True
+                    if info["status"] != "ready":
+                        continue
+                    stage = stage_by_name[name]
+                    cpus = encode_cpus if stage["heavy"] else 1
+                    if running and used + cpus > budget:
+                        continue
+                    cmd = stage_command(stage, project, cpus, args)
+                    print(f"▶ {project.name}/{name}: {' + '.join(stage['inputs'])} → {stage['output']}")
+                    running[pool.submit(run_stage, stage, project, cmd)] = (project, stage, info["inputs"], cpus)
+                    used += cpus
+
+            if args.once and not running and not pending:
+                break
+            if running:
+                wait(list(running), timeout=args.interval, return_when=FIRST_COMPLETED)
+            elif args.once and pending:
+                # 只剩仍在写入的输入，稍后重新扫描
+                time.sleep(min(args.interval, 1.0))
+            else:
+                time.sleep(args.interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="监视 vlog 项目目录，按依赖图增量执行转录 → 剪辑 → 字幕 → 烧录")
+    parser.add_argument("--root", default=str(DEFAULT_ROOT), help=f"项目根目录 (默认: {DEFAULT_ROOT})")
+    parser.add_argument("--project", action="append", help="只处理指定项目（可重复）")
+    parser.add_argument("--cpus", type=int, default=os.cpu_count() or 1,
+                        help="同时运行的阶段合计占用的 CPU 核数上限 (默认: CPU 核数)")
+    parser.add_argument("--encode-cpus", type=int, default=0,
+                        help="每个编码阶段（剪辑、烧录）占用的核数 (默认: --cpus 的一半)")
+    parser.add_argument("--interval", type=float, default=5.0, help="扫描间隔秒数 (默认: 5)")
+    parser.add_argument("--settle", type=float, default=3.0,
+                        help="输入文件最后修改后静置多少秒才视为写入完成 (默认: 3)")
+    parser.add_argument("--api-url", default="http://localhost:8000", help="speaches API 地址 (默认: http://localhost:8000)")
+    parser.add_argument("--word-timestamps", action="store_true", help="转录时请求词级时间戳")
+    parser.add_argument("--once", action="store_true", help="把所有项目处理到最新（或失败/等待输入）后退出")
+    parser.add_argument("--status", action="store_true", help="只打印各项目各阶段的状态，不执行")
+    add_trace_argument(parser)
+    args = parser.parse_args()
+
+    root = Path(args.root).expanduser()
+    if not root.exists():
+        print(f"错误: 项目根目录不存在: {root}")
+        sys.exit(1)
+
+    if args.status:
+        print_status(discover_projects(root, args.project), args.settle)
+        return
+
+    setup_tracing(args.trace)
+
+    try:
+        watch(args)
+    except KeyboardInterrupt:
+        print("\n已停止监视")
+
+
+if __name__ == "__main__":
+    main()
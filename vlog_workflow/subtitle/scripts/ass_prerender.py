@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+字幕预渲染：烧录前把 SRT/WebVTT 编译成完整样式的 ASS，或进一步预光栅化为叠加图层。
+
+    - ASS 模式:     PlayRes 等于视频分辨率，字号/描边/边距按 force_style 的效果等比换算，
+                    每条字幕预先断行（\\N）并用 \\an2\\pos 固定位置，WrapStyle 2 关闭自动换行，
+                    libass 编码时不再做换行排版和碰撞检测
+    - overlay 模式: 一次 ffmpeg 调用把每条字幕渲染成一张透明 PNG（只保留底部字幕带），
+                    烧录时用 overlay 滤镜只在字幕显示的时间段内叠加，编码过程不再调用 libass
+
+编译结果按 字幕文件内容哈希 + 样式 + 分辨率 缓存在 ~/.cache/vlog_workflow/subtitles/，
+同一份字幕重复烧录（调参、重新导出）时直接复用。
+
+用法（通常由 burn_subtitle.py --prerender 调用，也可单独编译）:
+    python3 ass_prerender.py --subtitle subtitle.srt --size 1920x1080 --output subtitle.ass
+
+依赖:
+    ffmpeg (overlay 模式，subtitles 滤镜需支持 alpha 选项，ffmpeg 5.0+)
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "common"))
+from instrument import run_ffmpeg, traced
+from generate_srt import split_text
+from subtitle_writer import (
+    SUBTITLE_STYLE,
+    ass_header,
+    escape_ass_text,
+    format_ass_timestamp,
+    format_from_path,
+    read_cues,
+)
+
+COMPILE_VERSION = 1
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "vlog_workflow" / "subtitles"
+
+# ffmpeg 把 SRT 转为 ASS 时使用的默认画布；force_style 中的字号、边距都以它为基准
+_BASE_RES = (384, 288)
+_MARGIN_LR = 10
+_LINE_HEIGHT = 1.25
+
+
+def scaled_style(width: int, height: int, style: dict | None = None) -> dict:
+    """把以 384x288 画布为基准的样式换算到视频分辨率（与 SRT + force_style 烧录效果一致）。"""
+    s = {**SUBTITLE_STYLE, **(style or {})}
+    scale = height / _BASE_RES[1]
+    return {
+        **s,
+        "fontsize": max(1, round(s["fontsize"] * scale)),
+        "outline": round(s["outline"] * scale, 1),
+        "margin_v": round(s["margin_v"] * scale),
+        "margin_lr": round(_MARGIN_LR * width / _BASE_RES[0]),
+    }
+
+
+def compile_key(subtitle_path: str, width: int, height: int, style: dict | None = None) -> str:
+    """缓存键：字幕文件内容 + 样式 + 分辨率 + 编译器版本。"""
+    h = hashlib.sha256()
+    with open(subtitle_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    h.update(json.dumps({
+        "version": COMPILE_VERSION,
+        "size": [width, height],
+        "style": {**SUBTITLE_STYLE, **(style or {})},
+    }, sort_keys=True).encode())
+    return h.hexdigest()[:32]
+
+
+def wrap_lines(text: str, max_em: float) -> list[str]:
+    """按估算的显示宽度（全角 1 em，半角 0.5 em）断行，已有的换行保留。"""
+    limit = max(1, int(max_em))
+    lines = []
+    for line in text.split("\n"):
+        line = line.strip()
+        if line:
+            lines.extend(split_text(line, limit, cjk_width=True, keep_words=True))
+    return lines
+
+
+def compile_ass(subtitle_path: str, output_path: str, width: int, height: int, style: dict | None = None) -> int:
+    """把 SRT/WebVTT 编译为固定断行、固定位置的 ASS，返回条目数。"""
+    s = scaled_style(width, height, style)
+    max_em = (width - 2 * s["margin_lr"]) / s["fontsize"]
+    pos = f"{{\\an{s['alignment']}\\pos({width // 2},{height - s['margin_v']})}}"
+
+    count = 0
+    tmp = Path(output_path).with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(ass_header(s, play_res=(width, height), wrap_style=2))
+        for start, end, text in read_cues(subtitle_path):
+            lines = wrap_lines(text, max_em)
+            if not lines or end <= start:
+                continue
+            body = "\\N".join(escape_ass_text(line) for line in lines)
+            f.write(f"Dialogue: 0,{format_ass_timestamp(start)},{format_ass_timestamp(end)},"
+                    f"Default,,0,0,0,,{pos}{body}\n")
+            count += 1
+    os.replace(tmp, output_path)
+    return count
+
+
+def compiled_ass(
+    subtitle_path: str,
+    width: int,
+    height: int,
+    style: dict | None = None,
+    cache_dir: Path = DEFAULT_CACHE_DIR,
+) -> tuple[Path, bool]:
+    """返回编译后的 ASS 路径（缓存命中时直接复用）以及是否命中缓存。
+
+    输入本身是 ASS 时视为已排版，原样使用。
+    """
+    if format_from_path(subtitle_path) == "ass":
+        return Path(subtitle_path), True
+    path = Path(cache_dir) / f"{compile_key(subtitle_path, width, height, style)}.ass"
+    if path.exists():
+        return path, True
+    path.parent.mkdir(parents=True, exist_ok=True)
+    compile_ass(subtitle_path, str(path), width, height, style)
+    return path, False
+
+
+def escape_filter_path(path: str) -> str:
+    """ffmpeg 滤镜参数中的路径需要转义冒号和反斜杠。"""
+    return path.replace("\\", "\\\\").replace(":", "\\:")
+
+
+# ── overlay 模式 ─────────────────────────────────────────────────────────────
+
+def _band_height(cues: list[tuple[float, float, str]], height: int, s: dict) -> int:
+    """字幕带高度：最多行数 × 行高 + 底部边距 + 描边，取偶数。"""
+    max_lines = max((text.count("\\N") + 1 for _, _, text in cues), default=1)
+    band = math.ceil(max_lines * s["fontsize"] * _LINE_HEIGHT + s["margin_v"] + 2 * s["outline"] + 4)
+    return min(height, band + band % 2)
+
+
+def _ass_prefix(ass_path: Path) -> str:
+    """ASS 文件中 [Events] 的 Format 行及之前的全部内容。"""
+    prefix = []
+    in_events = False
+    with open(ass_path, "r", encoding="utf-8-sig") as f:
+        for line in f:
+            prefix.append(line)
+            in_events = in_events or line.strip() == "[Events]"
+            if in_events and line.startswith("Format:"):
+                break
+    return "".join(prefix)
+
+
+@traced()
+def rasterize_overlay(
+    ass_path: Path,
+    width: int,
+    height: int,
+    style: dict | None = None,
+    cache_dir: Path = DEFAULT_CACHE_DIR,
+) -> dict:
+    """把编译后的 ASS 逐条渲染为透明 PNG 并生成 concat 列表，按 ASS 内容缓存。
+
+    返回 {"concat": 列表路径, "band": 字幕带高度, "ranges": [(start, end), ...]}。
+    """
+    out_dir = Path(cache_dir) / f"{compile_key(str(ass_path), width, height, style)}.overlay"
+    meta_path = out_dir / "overlay.json"
+    if meta_path.exists():
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    s = scaled_style(width, height, style)
+    cues = sorted(read_cues(ass_path))
+    # 重叠的条目截断到下一条开始，叠加层任一时刻只显示一张图
+    cues = [(start, min(end, cues[i + 1][0]) if i + 1 < len(cues) else end, text)
+            for i, (start, end, text) in enumerate(cues)]
+    cues = [c for c in cues if c[1] > c[0]]
+    band = _band_height(cues, height, s)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    # 第 i 条字幕重新定时到 [i, i+1) 秒，1 fps 的透明画布一次渲染出全部字幕图片；
+    # 文件头（画布、样式）沿用原 ASS
+    retimed = out_dir / "retimed.ass"
+    with open(retimed, "w", encoding="utf-8") as f:
+        f.write(_ass_prefix(ass_path))
+        for i, (_, _, text) in enumerate(cues):
+            f.write(f"Dialogue: 0,{format_ass_timestamp(i)},{format_ass_timestamp(i + 0.99)},"
+                    f"Default,,0,0,0,,{text}\n")
+    cmd = [
+        "ffmpeg",
+        "-f", "lavfi",
+        "-i", f"color=c=black@0.0:s={width}x{height}:r=1:d={len(cues) + 1},format=rgba",
+        "-vf", f"subtitles='{escape_filter_path(str(retimed))}':alpha=1,crop={width}:{band}:0:{height - band}",
+        "-frames:v", str(len(cues) + 1),
+        "-start_number", "0",
+        "-y", str(out_dir / "cue_%05d.png"),
+    ]
+    run_ffmpeg(cmd, name="ffmpeg:rasterize", capture_output=True, text=True, check=True)
+    # 最后一帧不含任何字幕，作为空白图填充字幕之间的空隙
+    blank = out_dir / f"cue_{len(cues):05d}.png"
+
+    entries = []
+    t = 0.0
+    for i, (start, end, _) in enumerate(cues):
+        if start > t:
+            entries.append((blank, start - t))
+        entries.append((out_dir / f"cue_{i:05d}.png", end - start))
+        t = end
+    entries.append((blank, 1.0))
+    concat = out_dir / "overlay.ffconcat"
+    lines = ["ffconcat version 1.0"]
+    for path, duration in entries:
+        lines += [f"file '{path}'", f"duration {duration:.3f}"]
+    lines.append(f"file '{blank}'")  # concat demuxer 忽略最后一个文件的 duration
+    concat.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    meta = {"concat": str(concat), "band": band, "ranges": [(round(a, 3), round(b, 3)) for a, b, _ in cues]}
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return meta
+
+
+def overlay_filter(meta: dict, height: int) -> str:
+    """overlay 滤镜：字幕带贴在画面底部，只在有字幕的时间段启用。"""
+    enable = "+".join(f"between(t,{a},{b})" for a, b in meta["ranges"]) or "0"
+    return (f"[0:v][1:v]overlay=x=0:y={height - meta['band']}:eof_action=pass:"
+            f"enable='{enable}'[outv]")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把 SRT/WebVTT 字幕编译为固定排版的 ASS")
+    parser.add_argument("--subtitle", "-s", required=True, help="输入字幕文件（SRT / WebVTT）")
+    parser.add_argument("--size", required=True, help="视频分辨率，如 1920x1080")
+    parser.add_argument("--output", "-o", required=True, help="输出 ASS 文件路径")
+    parser.add_argument("--font", default=SUBTITLE_STYLE["font"], help=f"字体名称 (默认: {SUBTITLE_STYLE['font']})")
+    parser.add_argument("--fontsize", type=int, default=SUBTITLE_STYLE["fontsize"],
+                        help=f"字号，以 384x288 画布为基准 (默认: {SUBTITLE_STYLE['fontsize']})")
+    parser.add_argument("--outline", type=int, default=SUBTITLE_STYLE["outline"],
+                        help=f"描边粗细 (默认: {SUBTITLE_STYLE['outline']})")
+    parser.add_argument("--margin-v", type=int, default=SUBTITLE_STYLE["margin_v"],
+                        help=f"底部边距 (默认: {SUBTITLE_STYLE['margin_v']})")
+    args = parser.parse_args()
+
+    if not Path(args.subtitle).exists():
+        print(f"错误: 字幕文件不存在: {args.subtitle}")
+        sys.exit(1)
+    if format_from_path(args.subtitle) == "ass":
+        print("错误: 输入已经是 ASS 文件")
+        sys.exit(1)
+    try:
+        width, height = (int(v) for v in args.size.lower().split("x"))
+    except ValueError:
+        print(f"错误: 分辨率格式应为 宽x高，例如 1920x1080: {args.size}")
+        sys.exit(1)
+
+    style = dict(font=args.font, fontsize=args.fontsize, outline=args.outline, margin_v=args.margin_v)
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    count = compile_ass(args.subtitle, args.output, width, height, style)
+    print(f"✅ ASS 字幕已编译: {args.output}")
+    print(f"   字幕条数: {count}")
+    print(f"   画布: {width}x{height}，字号 {scaled_style(width, height, style)['fontsize']}px")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+split_text 微基准：对比单遍扫描实现与旧的逐标点 rfind 实现的耗时，并校验两者输出逐字一致。
+
+用法:
+    python3 bench_split_text.py [--lengths 50 500 5000 50000] [--repeat 5] [--max-chars 20]
+"""
+
+import argparse
+import random
+import time
+
+from generate_srt import split_text
+
+
+def split_text_legacy(text: str, max_chars: int) -> list[str]:
+    """旧实现（每行对 11 个标点各做一次 rfind 并重新切片 remaining），仅用于对照。"""
+    if len(text) <= max_chars:
+        return [text]
+
+    lines = []
+    split_points = ["，", "。", "！", "？", "；", "、", ",", ".", "!", "?", " "]
+
+    remaining = text
+    while len(remaining) > max_chars:
+        best_pos = -1
+        for punct in split_points:
+            pos = remaining[:max_chars].rfind(punct)
+            if pos > best_pos:
+                best_pos = pos
+
+        if best_pos > 0:
+            lines.append(remaining[: best_pos + 1].strip())
+            remaining = remaining[best_pos + 1 :].strip()
+        else:
+            lines.append(remaining[:max_chars])
+            remaining = remaining[max_chars:]
+
+    if remaining.strip():
+        lines.append(remaining.strip())
+
+    return lines
+
+
+def make_text(length: int, rng: random.Random) -> str:
+    """生成中英混排、标点稀疏不均的合成转录文本。"""
+    pieces = "今天我们来聊一聊视频剪辑的自动化流程首先是语音识别然后对齐口播稿"
+    words = ["ffmpeg", "Whisper", "GPU", "API", "large-v3", "OK"]
+    puncts = ["，", "。", "！", "？", "、", ",", ".", " ", "  "]
+    out = []
+    total = 0
+    while total < length:
+        r = rng.random()
+        if r < 0.08:
+            piece = rng.choice(puncts)
+        elif r < 0.15:
+            piece = f" {rng.choice(words)} "
+        else:
+            piece = rng.choice(pieces)
+        out.append(piece)
+        total += len(piece)
+    return "".join(out)[:length]
+
+
+def check_equivalence(rng: random.Random, cases: int = 2000) -> int:
+    mismatches = 0
+    for _ in range(cases):
+        text = make_text(rng.randint(0, 200), rng)
+        max_chars = rng.randint(1, 30)
+        if split_text(text, max_chars) != split_text_legacy(text, max_chars):
+            mismatches += 1
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="split_text 微基准")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[50, 500, 5000, 50000], help="文本长度（字）")
+    parser.add_argument("--repeat", type=int, default=5, help="每个长度重复次数")
+    parser.add_argument("--max-chars", type=int, default=20, help="每行最大字数 (默认: 20)")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    mismatches = check_equivalence(rng)
+    print(f"一致性校验: 2000 个随机样本，不一致 {mismatches} 个")
+
+    print(f"\n{'长度':>8} {'旧实现 (ms)':>12} {'新实现 (ms)':>12} {'加速比':>8}")
+    for length in args.lengths:
+        text = make_text(length, rng)
+        timings = []
+        for fn in (split_text_legacy, split_text):
+            t0 = time.perf_counter()
+            for _ in range(args.repeat):
+                fn(text, args.max_chars)
+            timings.append((time.perf_counter() - t0) / args.repeat * 1000)
+        print(f"{length:>8} {timings[0]:>12.3f} {timings[1]:>12.3f} {timings[0] / timings[1]:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,15 +5,49 @@
 用法:
     python3 burn_subtitle.py --input edited.mp4 --subtitle subtitle.srt --output final.mp4 [选项]
 
+    # 合并模式：直接从原始视频 + 剪辑方案 + 原始转录生成 final.mp4，
+    # 字幕时间轴自动映射到剪辑后的时间轴，一次解码 → trim/concat → 字幕 → 一次编码
+    python3 burn_subtitle.py --input raw.mp4 --plan cut_plan.json --transcript transcript.json --output final.mp4
+
+    # --prerender ass 先把字幕编译为固定排版的 ASS（按内容 + 样式缓存），--prerender overlay 预光栅化为字幕图层，
+    # --benchmark-prerender 对比三种模式的编码帧率
+    python3 burn_subtitle.py --input edited.mp4 --subtitle subtitle.srt --output final.mp4 --prerender ass
+
+    # 分段并行烧录：在关键帧处切成 4 段同时编码，再用 concat 流复制拼接（--benchmark 对比单进程耗时）
+    python3 burn_subtitle.py --input edited.mp4 --subtitle subtitle.srt --output final.mp4 --jobs 4 [--benchmark]
+    # 分段结果缓存在输入视频旁的 .render/（common/render_cache.py），中断后重新运行只烧录未完成的段
+
 依赖:
     ffmpeg (命令行工具)
 """
 
 import argparse
+import hashlib
+import json
+import os
 import subprocess
+import shutil
 import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "common"))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "video_edit" / "scripts"))
+from media_index import frame_rate, has_audio, load_index, seek_point
+from timeline import remap_segments
+from instrument import add_trace_argument, run_ffmpeg, setup_tracing, traced
+from encoder_profiles import (
+    BURN_PROFILE, audio_args, get_profile, load_profiles, profile_key, scale_filter, video_args,
+)
+from plan_optimizer import optimize_plan
+from cut_video import build_filter_graph, encoder_threads_per_job
+from render_cache import DEFAULT_MAX_MB as RENDER_CACHE_MAX_MB, RenderCache, segment_key
+from generate_srt import generate_srt
+from subtitle_writer import SUBTITLE_STYLE
+from ass_prerender import compiled_ass, escape_filter_path, overlay_filter, rasterize_overlay
+
 
 def check_ffmpeg() -> bool:
     """检查 ffmpeg 是否已安装。"""
@@ -24,6 +58,121 @@ def check_ffmpeg() -> bool:
         return False
 
 
+def build_subtitle_filter(
+    subtitle_path: str,
+    font: str = "Noto Sans CJK SC",
+    fontsize: int = 24,
+    outline: int = 2,
+    margin_v: int = 40,
+) -> str:
+    """构建 subtitles 滤镜参数（颜色、对齐方式与 generate_srt.py 生成的 ASS 样式共用 SUBTITLE_STYLE）。"""
+    return (
+        f"subtitles='{escape_filter_path(subtitle_path)}':"
+        f"force_style='FontName={font},"
+        f"FontSize={fontsize},"
+        f"PrimaryColour={SUBTITLE_STYLE['primary_colour']},"
+        f"OutlineColour={SUBTITLE_STYLE['outline_colour']},"
+        f"Outline={outline},"
+        f"MarginV={margin_v},"
+        f"Alignment={SUBTITLE_STYLE['alignment']}'"
+    )
+
+
+@traced()
+def burn_subtitle_fused(
+    input_path: str,
+    keep_segments: list[dict],
+    transcript_segments: list[dict],
+    output_path: str,
+    max_chars: int = 20,
+    min_keep_ratio: float = 0.3,
+    font: str = "Noto Sans CJK SC",
+    fontsize: int = 24,
+    outline: int = 2,
+    margin_v: int = 40,
+    profile: dict | None = None,
+) -> bool:
+    """剪辑 + 字幕烧录合并为一次编码：原始视频 → trim/concat → subtitles → 编码 final.mp4。
+
+    剪辑方案先按 cut_video.py 的规则规范化（合并重叠/相接片段、去碎片、对齐帧），
+    滤镜图和字幕时间轴映射使用同一份结果，重叠区间不会被重复拼接而导致字幕错位。
+    """
+    profile = profile or get_profile(BURN_PROFILE)
+    index = load_index(input_path)
+    keeps, _ = optimize_plan(keep_segments, index)
+    if not keeps:
+        print("错误: 剪辑方案规范化后没有剩余的保留片段")
+        return False
+    segments = remap_segments(transcript_segments, keeps, min_keep_ratio)
+
+    video = index.get("video") or {}
+    with_audio = has_audio(index)
+
+    tmp_dir = Path(tempfile.mkdtemp(prefix="burn_fused_"))
+    try:
+        srt_path = tmp_dir / "subtitle.srt"
+        graph_path = tmp_dir / "graph.txt"
+        srt_path.write_text(generate_srt(segments, max_chars), encoding="utf-8")
+        subtitle_filter = build_subtitle_filter(str(srt_path), font, fontsize, outline, margin_v)
+        if scale_filter(profile):
+            subtitle_filter += f",{scale_filter(profile)}"
+        graph_path.write_text(
+            build_filter_graph(keeps, with_audio) + f";\n[outv]{subtitle_filter}[outsub]",
+            encoding="utf-8",
+        )
+
+        cmd = [
+            "ffmpeg",
+            "-i", input_path,
+            "-filter_complex_script", str(graph_path),
+            "-map", "[outsub]",
+            *video_args(profile),
+        ]
+        if video.get("pix_fmt"):
+            cmd += ["-pix_fmt", video["pix_fmt"]]
+        if with_audio:
+            cmd += ["-map", "[outa]", *audio_args(profile)]
+        cmd += ["-y", output_path]
+
+        print(f"正在剪辑并烧录字幕（单次编码）...")
+        print(f"  保留片段: {len(keeps)} 个，字幕段落: {len(segments)} 条")
+        print(f"  字体: {font}")
+        print(f"  字号: {fontsize}")
+        print(f"  描边: {outline}px")
+
+        run_ffmpeg(cmd, name="ffmpeg:cut_burn", capture_output=True, text=True, check=True)
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"错误: 剪辑 + 字幕烧录失败")
+        for line in e.stderr.strip().split("\n")[-5:]:
+            print(f"  {line}")
+        return False
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def prerendered_filter(
+    subtitle_path: str,
+    index: dict | None,
+    mode: str,
+    font: str = "Noto Sans CJK SC",
+    fontsize: int = 24,
+    outline: int = 2,
+    margin_v: int = 40,
+) -> str:
+    """返回烧录用的 subtitles 滤镜：mode 为 ass 时使用预编译（带缓存）的 ASS，否则 SRT + force_style。"""
+    video = (index or {}).get("video") or {}
+    if mode == "ass" and video.get("width") and video.get("height"):
+        style = dict(font=font, fontsize=fontsize, outline=outline, margin_v=margin_v)
+        ass_path, cached = compiled_ass(subtitle_path, int(video["width"]), int(video["height"]), style)
+        print(f"  预编译 ASS: {ass_path}{'（缓存）' if cached else ''}")
+        return f"subtitles='{escape_filter_path(str(ass_path))}'"
+    if mode == "ass":
+        print("  源视频索引中没有分辨率信息，改用 SRT + force_style")
+    return build_subtitle_filter(subtitle_path, font, fontsize, outline, margin_v)
+
+
+@traced()
 def burn_subtitle(
     input_path: str,
     subtitle_path: str,
@@ -33,42 +182,63 @@ def burn_subtitle(
     fontcolor: str = "white",
     outline: int = 2,
     margin_v: int = 40,
+    prerender: str = "none",
+    profile: dict | None = None,
 ) -> bool:
-    """使用 ffmpeg subtitles 滤镜将字幕烧录到视频。"""
+    """使用 ffmpeg 将字幕烧录到视频。画面缩放（draft 档位）在字幕绘制之后进行。
 
-    # 构建 subtitles 滤镜参数
-    # 注意：ffmpeg subtitles 滤镜中路径需要转义冒号和反斜杠
-    escaped_sub_path = subtitle_path.replace("\\", "\\\\").replace(":", "\\:")
-    subtitle_filter = (
-        f"subtitles='{escaped_sub_path}':"
-        f"force_style='FontName={font},"
-        f"FontSize={fontsize},"
-        f"PrimaryColour=&H00FFFFFF,"  # 白色
-        f"OutlineColour=&H00000000,"  # 黑色描边
-        f"Outline={outline},"
-        f"MarginV={margin_v},"
-        f"Alignment=2'"  # 底部居中
-    )
+    prerender:
+        none    SRT + force_style，libass 在编码时排版
+        ass     先编译为固定排版的 ASS（按内容 + 样式缓存），libass 只做绘制
+        overlay 预先把每条字幕光栅化为透明图片，编码时只在有字幕的时间段 overlay 叠加
+    """
+    # 从源视频索引读取流参数：保持原像素格式（如 10bit），无音频时不映射音频
+    try:
+        index = load_index(input_path)
+    except (RuntimeError, FileNotFoundError):
+        index = None
+    video = (index or {}).get("video") or {}
+    style = dict(font=font, fontsize=fontsize, outline=outline, margin_v=margin_v)
+    profile = profile or get_profile(BURN_PROFILE)
+    scale = scale_filter(profile)
 
-    cmd = [
-        "ffmpeg",
-        "-i", input_path,
-        "-vf", subtitle_filter,
-        "-c:v", "libx264",
-        "-preset", "medium",
-        "-crf", "18",
-        "-c:a", "copy",
-        "-y",
-        output_path,
-    ]
-
-    print(f"正在烧录字幕...")
+    print(f"正在烧录字幕（预渲染: {prerender}，编码档位: {profile['name']}）...")
     print(f"  字体: {font}")
     print(f"  字号: {fontsize}")
     print(f"  描边: {outline}px")
 
+    cmd = ["ffmpeg", "-i", input_path]
+    graph_path = None
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        if prerender == "overlay" and video.get("width") and video.get("height"):
+            width, height = int(video["width"]), int(video["height"])
+            ass_path, _ = compiled_ass(subtitle_path, width, height, style)
+            meta = rasterize_overlay(ass_path, width, height, style)
+            print(f"  字幕图层: {len(meta['ranges'])} 条，字幕带高度 {meta['band']}px")
+            # enable 表达式随字幕条数增长，写入脚本文件避免命令行过长
+            fd, graph_path = tempfile.mkstemp(prefix="burn_overlay_", suffix=".txt")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(overlay_filter(meta, height))
+                if scale:
+                    f.write(f";\n[outv]{scale}[outscaled]")
+            cmd += ["-f", "concat", "-safe", "0", "-i", meta["concat"],
+                    "-filter_complex_script", graph_path, "-map", "[outscaled]" if scale else "[outv]"]
+            cmd += ["-map", "0:a?"]
+        else:
+            mode = "ass" if prerender == "overlay" else prerender
+            vf = prerendered_filter(subtitle_path, index, mode, **style)
+            cmd += ["-vf", f"{vf},{scale}" if scale else vf]
+
+        cmd += video_args(profile)
+        if video.get("pix_fmt"):
+            cmd += ["-pix_fmt", video["pix_fmt"]]
+        cmd += ["-c:a", "copy"] if index is None or has_audio(index) else ["-an"]
+        cmd += [
+            "-y",
+            output_path,
+        ]
+
+        run_ffmpeg(cmd, name="ffmpeg:burn", capture_output=True, text=True, check=True)
         return True
     except subprocess.CalledProcessError as e:
         print(f"错误: 字幕烧录失败")
@@ -77,18 +247,234 @@ def burn_subtitle(
         for line in stderr_lines[-5:]:
             print(f"  {line}")
         return False
+    finally:
+        if graph_path:
+            Path(graph_path).unlink(missing_ok=True)
+
+
+def plan_chunks(index: dict, jobs: int, min_seconds: float = 1.0) -> list[tuple[float, float | None]]:
+    """在关键帧处把视频均分为约 jobs 段，返回 (start, end) 列表，最后一段 end 为 None（到结尾）。"""
+    duration = index.get("duration", 0.0)
+    points = [0.0]
+    for i in range(1, jobs):
+        k = seek_point(index, duration * i / jobs)
+        if k - points[-1] >= min_seconds and duration - k >= min_seconds:
+            points.append(k)
+    return [(start, end) for start, end in zip(points, points[1:] + [None])]
+
+
+@traced()
+def burn_subtitle_parallel(
+    input_path: str,
+    subtitle_path: str,
+    output_path: str,
+    jobs: int = 4,
+    font: str = "Noto Sans CJK SC",
+    fontsize: int = 24,
+    outline: int = 2,
+    margin_v: int = 40,
+    prerender: str = "none",
+    profile: dict | None = None,
+    cache: RenderCache | None = None,
+) -> bool:
+    """分段并行烧录字幕：在关键帧处切段、各段同时编码，再用 concat demuxer 流复制拼接。
+
+    - 每段用 setpts 先把时间戳平移回原始时间轴再过 subtitles 滤镜，因此直接使用原字幕文件，
+      跨越分段边界的字幕在两段中各自完整渲染，不会被截断
+    - 视频分段只编码画面（-an），音频最后从原视频整体流复制，分段边界处不会出现音频断裂
+    - 指定 cache 时各段输出按视频哈希 + 分段起止 + 字幕内容与样式 + 编码档位缓存，中断后重新运行只烧录未完成的段
+    """
+    index = load_index(input_path)
+    video = index.get("video") or {}
+    chunks = plan_chunks(index, jobs)
+    threads = encoder_threads_per_job(len(chunks))
+
+    print(f"正在分段并行烧录字幕: {len(chunks)} 段，每段编码器 {threads} 线程")
+    print(f"  字体: {font}")
+    print(f"  字号: {fontsize}")
+    print(f"  描边: {outline}px")
+    subtitle_filter = prerendered_filter(subtitle_path, index, prerender, font, fontsize, outline, margin_v)
+    profile = profile or get_profile(BURN_PROFILE)
+    if scale_filter(profile):
+        subtitle_filter += f",{scale_filter(profile)}"
+
+    tmp_dir = Path(tempfile.mkdtemp(prefix="burn_parallel_"))
+    params = {
+        "profile": profile_key(profile),
+        "subtitle": hashlib.sha256(Path(subtitle_path).read_bytes()).hexdigest(),
+        "style": [font, fontsize, outline, margin_v, prerender],
+        "pix_fmt": video.get("pix_fmt"),
+    }
+
+    def burn_chunk(i: int) -> Path:
+        start, end = chunks[i]
+        end_label = f"{end:.1f}s" if end is not None else "结尾"
+        key = segment_key(index, "burn_chunk", start, end, params) if cache else None
+        cached = cache.get(key) if cache else None
+        if cached:
+            print(f"  段 {i + 1}/{len(chunks)} 复用缓存: [{start:.1f}s - {end_label}]")
+            return cached
+        chunk_path = cache.partial_path(key, "mp4") if cache else tmp_dir / f"chunk_{i:04d}.mp4"
+        cmd = ["ffmpeg", "-ss", f"{start:.6f}", "-i", input_path]
+        if end is not None:
+            cmd += ["-t", f"{end - start:.6f}"]
+        cmd += [
+            "-an",
+            "-vf", f"setpts=PTS+{start:.6f}/TB,{subtitle_filter},setpts=PTS-STARTPTS",
+            *video_args(profile, threads),
+        ]
+        if video.get("pix_fmt"):
+            cmd += ["-pix_fmt", video["pix_fmt"]]
+        cmd += ["-y", str(chunk_path)]
+        t0 = time.monotonic()
+        try:
+            run_ffmpeg(cmd, name="ffmpeg:burn_chunk", capture_output=True, text=True, check=True)
+            if cache:
+                chunk_path = cache.put(key, chunk_path, {"kind": "burn_chunk", "start": start, "end": end,
+                                                         "seconds": round(time.monotonic() - t0, 3)})
+        finally:
+            if cache and chunk_path.name.endswith(".partial.mp4"):
+                chunk_path.unlink(missing_ok=True)
+        print(f"  段 {i + 1}/{len(chunks)} 完成: [{start:.1f}s - {end_label}] 耗时 {time.monotonic() - t0:.1f}s")
+        return chunk_path
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+            chunk_files = list(pool.map(burn_chunk, range(len(chunks))))
+        if cache:
+            print(f"  分段缓存: {cache.summary()}")
+
+        concat_list = tmp_dir / "chunks.txt"
+        concat_list.write_text("".join(f"file '{p}'\n" for p in chunk_files))
+        cmd = ["ffmpeg", "-f", "concat", "-safe", "0", "-i", str(concat_list)]
+        if has_audio(index):
+            cmd += ["-i", input_path, "-map", "0:v", "-map", "1:a"]
+        cmd += ["-c", "copy", "-y", output_path]
+        run_ffmpeg(cmd, name="ffmpeg:concat", capture_output=True, text=True, check=True)
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"错误: 字幕烧录失败")
+        for line in e.stderr.strip().split("\n")[-5:]:
+            print(f"  {line}")
+        return False
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def benchmark(
+    input_path: str,
+    subtitle_path: str,
+    output_path: str,
+    jobs: int,
+    prerender: str = "none",
+    profile: dict | None = None,
+    **style,
+) -> bool:
+    """对比单进程烧录与分段并行烧录的墙钟耗时，保留并行模式的输出。"""
+    single_output = str(Path(output_path).with_suffix(".single.mp4"))
+    t0 = time.monotonic()
+    ok_single = burn_subtitle(input_path, subtitle_path, single_output, prerender=prerender, profile=profile,
+                              **style)
+    single_time = time.monotonic() - t0
+    Path(single_output).unlink(missing_ok=True)
+
+    t0 = time.monotonic()
+    ok_parallel = burn_subtitle_parallel(input_path, subtitle_path, output_path, jobs, prerender=prerender,
+                                         profile=profile, **style)
+    parallel_time = time.monotonic() - t0
+
+    print("\n📊 基准测试")
+    print(f"   单进程:         {single_time:8.1f}s {'' if ok_single else '(失败)'}")
+    print(f"   并行 ({jobs} 段):  {parallel_time:8.1f}s {'' if ok_parallel else '(失败)'}")
+    if ok_single and ok_parallel and parallel_time > 0:
+        print(f"   加速比:         {single_time / parallel_time:8.2f}x")
+    return ok_single and ok_parallel
+
+
+def _frame_count(index: dict) -> float:
+    """按时长 × 帧率估算视频帧数。"""
+    return index.get("duration", 0.0) * frame_rate(index)
+
+
+def benchmark_prerender(
+    input_path: str,
+    subtitle_path: str,
+    output_path: str,
+    profile: dict | None = None,
+    **style,
+) -> bool:
+    """单进程下依次用 none / ass / overlay 三种预渲染模式烧录，对比编码帧率，保留 ass 模式的输出。
+
+    预渲染（编译 ASS、光栅化字幕图片）先单独执行一次，计时只包含烧录本身；
+    预渲染结果有缓存，日常重复烧录时这部分开销同样不计。
+    """
+    index = load_index(input_path)
+    video = index.get("video") or {}
+    frames = _frame_count(index)
+    if video.get("width") and video.get("height"):
+        width, height = int(video["width"]), int(video["height"])
+        ass_path, _ = compiled_ass(subtitle_path, width, height, style)
+        rasterize_overlay(ass_path, width, height, style)
+
+    results = {}
+    for mode in ("none", "ass", "overlay"):
+        mode_output = output_path if mode == "ass" else str(Path(output_path).with_suffix(f".{mode}.mp4"))
+        t0 = time.monotonic()
+        ok = burn_subtitle(input_path, subtitle_path, mode_output, prerender=mode, profile=profile, **style)
+        results[mode] = (ok, time.monotonic() - t0)
+        if mode_output != output_path:
+            Path(mode_output).unlink(missing_ok=True)
+
+    print(f"\n📊 预渲染基准测试（约 {frames:.0f} 帧）")
+    for mode, (ok, elapsed) in results.items():
+        fps = frames / elapsed if ok and elapsed > 0 else 0.0
+        print(f"   {mode:8s} {elapsed:8.1f}s {fps:8.1f} fps {'' if ok else '(失败)'}")
+    base_ok, base_time = results["none"]
+    for mode in ("ass", "overlay"):
+        ok, elapsed = results[mode]
+        if base_ok and ok and elapsed > 0:
+            print(f"   {mode} 相对 none 加速比: {base_time / elapsed:.2f}x")
+    return all(ok for ok, _ in results.values())
 
 
 def main():
     parser = argparse.ArgumentParser(description="将 SRT 字幕烧录到视频中")
     parser.add_argument("--input", "-i", required=True, help="输入视频文件路径")
-    parser.add_argument("--subtitle", "-s", required=True, help="SRT 字幕文件路径")
+    parser.add_argument("--subtitle", "-s", help="字幕文件路径（SRT / WebVTT / ASS）")
     parser.add_argument("--output", "-o", required=True, help="输出视频文件路径")
+    parser.add_argument("--plan", "-p", help="剪辑方案 JSON（合并模式：输入为原始视频）")
+    parser.add_argument("--transcript", "-t", help="原始视频的转录 JSON（合并模式）")
+    parser.add_argument("--max-chars", type=int, default=20, help="合并模式下字幕每行最大字数 (默认: 20)")
     parser.add_argument("--font", default="Noto Sans CJK SC", help="字体名称 (默认: Noto Sans CJK SC)")
     parser.add_argument("--fontsize", type=int, default=24, help="字号 (默认: 24)")
     parser.add_argument("--outline", type=int, default=2, help="描边粗细 (默认: 2)")
     parser.add_argument("--margin-v", type=int, default=40, help="底部边距 (默认: 40)")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="分段并行烧录的段数/并发数，1 表示单进程 (默认: 1)")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="同时运行单进程与 --jobs 并行烧录并对比耗时")
+    parser.add_argument("--prerender", choices=["none", "ass", "overlay"], default="none",
+                        help="字幕预渲染: none=SRT+force_style, ass=预编译固定排版的 ASS（带缓存）, "
+                             "overlay=预光栅化字幕图层并 overlay 叠加（仅单进程） (默认: none)")
+    parser.add_argument("--benchmark-prerender", action="store_true",
+                        help="单进程依次用 none/ass/overlay 烧录并对比编码帧率")
+    parser.add_argument("--profile", choices=list(load_profiles()), default=BURN_PROFILE,
+                        help=f"编码档位，draft 为 540p 快速预览 (默认: {BURN_PROFILE})")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="分段并行烧录时不使用渲染片段缓存（默认各段缓存在输入视频旁的 .render/，中断后重新运行只烧录未完成的段）")
+    parser.add_argument("--cache-max-mb", type=float, default=RENDER_CACHE_MAX_MB,
+                        help=f"片段缓存大小上限 MB，烧录结束后按最近使用淘汰 (默认: {RENDER_CACHE_MAX_MB})")
+    add_trace_argument(parser)
     args = parser.parse_args()
+    setup_tracing(args.trace)
+
+    if args.plan and not args.transcript:
+        parser.error("合并模式需要同时指定 --plan 和 --transcript")
+    if not args.plan and not args.subtitle:
+        parser.error("请指定 --subtitle，或使用 --plan + --transcript 合并模式")
+
+    if args.prerender == "overlay" and args.jobs > 1:
+        parser.error("--prerender overlay 仅支持单进程烧录（--jobs 1）")
 
     if not check_ffmpeg():
         print("错误: 未找到 ffmpeg，请先安装: brew install ffmpeg")
@@ -99,23 +485,54 @@ def main():
         print(f"错误: 输入视频不存在: {input_path}")
         sys.exit(1)
 
-    subtitle_path = Path(args.subtitle)
-    if not subtitle_path.exists():
-        print(f"错误: 字幕文件不存在: {subtitle_path}")
-        sys.exit(1)
-
     output = Path(args.output)
     output.parent.mkdir(parents=True, exist_ok=True)
 
-    if burn_subtitle(
-        str(input_path),
-        str(subtitle_path),
-        str(output),
-        font=args.font,
-        fontsize=args.fontsize,
-        outline=args.outline,
-        margin_v=args.margin_v,
-    ):
+    style = dict(font=args.font, fontsize=args.fontsize, outline=args.outline, margin_v=args.margin_v)
+    profile = get_profile(args.profile)
+
+    if args.plan:
+        for path, label in ((args.plan, "剪辑方案"), (args.transcript, "转录文件")):
+            if not Path(path).exists():
+                print(f"错误: {label}不存在: {path}")
+                sys.exit(1)
+        with open(args.plan, "r", encoding="utf-8") as f:
+            keep_segments = json.load(f).get("keep_segments", [])
+        with open(args.transcript, "r", encoding="utf-8") as f:
+            transcript_segments = json.load(f).get("segments", [])
+        if not keep_segments:
+            print("错误: 剪辑方案中没有保留片段")
+            sys.exit(1)
+        ok = burn_subtitle_fused(
+            str(input_path), keep_segments, transcript_segments, str(output),
+            max_chars=args.max_chars, profile=profile, **style,
+        )
+    else:
+        subtitle_path = Path(args.subtitle)
+        if not subtitle_path.exists():
+            print(f"错误: 字幕文件不存在: {subtitle_path}")
+            sys.exit(1)
+        if args.benchmark_prerender:
+            ok = benchmark_prerender(str(input_path), str(subtitle_path), str(output), profile, **style)
+        elif args.benchmark:
+            ok = benchmark(str(input_path), str(subtitle_path), str(output), max(args.jobs, 2),
+                           prerender=args.prerender, profile=profile, **style)
+        elif args.jobs > 1:
+            cache = None
+            if not args.no_cache:
+                try:
+                    cache = RenderCache.for_source(str(input_path), args.cache_max_mb)
+                except RuntimeError as e:
+                    print(f"警告: {e}，不使用片段缓存")
+            ok = burn_subtitle_parallel(str(input_path), str(subtitle_path), str(output), args.jobs,
+                                        prerender=args.prerender, profile=profile, cache=cache, **style)
+            if cache:
+                cache.prune()
+        else:
+            ok = burn_subtitle(str(input_path), str(subtitle_path), str(output),
+                               prerender=args.prerender, profile=profile, **style)
+
+    if ok:
         print(f"\n✅ 带字幕视频已生成: {output}")
     else:
         print("\n❌ 字幕烧录失败")
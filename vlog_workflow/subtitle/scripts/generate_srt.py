@@ -1,63 +1,163 @@
 #!/usr/bin/env python3
 """
-SRT 字幕生成脚本：将 Whisper 转录 JSON 转换为 SRT 字幕文件。
+SRT 字幕生成脚本：将 Whisper 转录 JSON 转换为 SRT 字幕文件（也支持 WebVTT / ASS）。
+
+转录 JSON 逐段增量读取、字幕逐条写出，数小时的长转录也只占用很少的内存。
 
 用法:
     python3 generate_srt.py --input transcript.json --output subtitle.srt [--max-chars 20]
+
+    # 转录带词级时间戳（transcribe.py --word-timestamps）时，自动按真实词边界断行和定时
+
+    # 输入为原始视频的转录时，用剪辑方案把字幕映射到 edited.mp4 的时间轴（无需重新转录）
+    # --source 指定原始视频时，先按 cut_video.py 的规则规范化方案（对齐到帧、合并/去碎片），与剪辑结果逐帧一致
+    python3 generate_srt.py --input transcript.json --plan cut_plan.json --source raw.mp4 --output subtitle.srt
+
+    # 按输出扩展名（或 --format）生成 WebVTT / ASS；ASS 内置与烧录相同的字幕样式
+    python3 generate_srt.py --input transcript.json --output subtitle.ass
 """
 
 import argparse
+import bisect
+import io
 import json
+import re
 import sys
+import unicodedata
+from itertools import accumulate
 from pathlib import Path
+from typing import Iterable, Iterator
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "common"))
+from timeline import iter_remap_segments, load_keep_segments
+from instrument import add_trace_argument, setup_tracing, tracer
+from subtitle_writer import FORMATS, format_from_path, iter_json_array, write_cues
+
+
+# 优先在这些标点处分割
+SPLIT_POINTS = frozenset("，。！？；、,.!? ")
+_SPLIT_RE = re.compile("[" + re.escape("".join(sorted(SPLIT_POINTS))) + "]")
+
+
+def _char_width(ch: str) -> float:
+    """CJK 宽度规则：全角/宽字符计 1，半角字符（拉丁字母、数字、半角标点）计 0.5。"""
+    return 1.0 if unicodedata.east_asian_width(ch) in ("W", "F") else 0.5
+
 
+def _is_word_char(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum()
 
-def format_timestamp(seconds: float) -> str:
-    """将秒数转换为 SRT 时间戳格式: HH:MM:SS,mmm"""
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    millis = int((seconds % 1) * 1000)
-    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
 
+def split_text(text: str, max_chars: int, cjk_width: bool = False, keep_words: bool = False) -> list[str]:
+    """将长文本按标点或字数拆分为多行。
 
-def split_text(text: str, max_chars: int) -> list[str]:
-    """将长文本按标点或字数拆分为多行。"""
-    if len(text) <= max_chars:
+    先用一次正则扫描预计算全部分割点（断行机会），每行只做二分查找，不再对剩余文本反复切片，
+    整体为线性时间，且只为输出的行分配字符串。默认行为与逐标点 rfind 的旧实现逐字一致。
+
+    cjk_width=True 时 max_chars 按 CJK 宽度计（半角字符算半个字）；
+    keep_words=True 时强制断行不会切在拉丁单词中间。
+    """
+    n = len(text)
+    widths = list(accumulate(map(_char_width, text), initial=0.0)) if cjk_width else None
+
+    def width(lo: int, hi: int) -> float:
+        return widths[hi] - widths[lo] if widths else hi - lo
+
+    if width(0, n) <= max_chars:
         return [text]
 
+    split_positions = [m.start() for m in _SPLIT_RE.finditer(text)]
+
     lines = []
-    # 优先在标点处分割
-    split_points = ["，", "。", "！", "？", "；", "、", ",", ".", "!", "?", " "]
-
-    remaining = text
-    while len(remaining) > max_chars:
-        # 在 max_chars 范围内找最后一个分割点
-        best_pos = -1
-        for punct in split_points:
-            pos = remaining[:max_chars].rfind(punct)
-            if pos > best_pos:
-                best_pos = pos
-
-        if best_pos > 0:
-            lines.append(remaining[: best_pos + 1].strip())
-            remaining = remaining[best_pos + 1 :].strip()
+    lo, hi = 0, n
+    while width(lo, hi) > max_chars:
+        # 窗口 text[lo:limit] 为宽度不超过 max_chars 的最长前缀
+        if widths:
+            limit = min(bisect.bisect_right(widths, widths[lo] + max_chars) - 1, hi)
+        else:
+            limit = lo + max_chars
+
+        k = bisect.bisect_left(split_positions, limit) - 1
+        best = split_positions[k] if k >= 0 else -1
+        if best > lo:
+            lines.append(text[lo : best + 1].strip())
+            lo = best + 1
+            while lo < hi and text[lo].isspace():
+                lo += 1
+            while hi > lo and text[hi - 1].isspace():
+                hi -= 1
         else:
             # 没有合适的分割点，强制按字数分割
-            lines.append(remaining[:max_chars])
-            remaining = remaining[max_chars:]
+            cut = max(limit, lo + 1)
+            if keep_words and cut < hi and _is_word_char(text[cut - 1]) and _is_word_char(text[cut]):
+                word_start = cut
+                while word_start > lo and _is_word_char(text[word_start - 1]):
+                    word_start -= 1
+                if word_start > lo:
+                    cut = word_start
+            lines.append(text[lo:cut])
+            lo = cut
 
-    if remaining.strip():
-        lines.append(remaining.strip())
+    if text[lo:hi].strip():
+        lines.append(text[lo:hi].strip())
 
     return lines
 
 
-def generate_srt(segments: list[dict], max_chars: int = 20) -> str:
-    """从转录段落生成 SRT 字幕内容。"""
-    srt_entries = []
-    index = 1
+# 优先断行的标点（与 split_text 一致）
+BREAK_PUNCTS = SPLIT_POINTS
+
 
+def split_words(words: list[dict], max_chars: int) -> list[list[dict]]:
+    """按词级时间戳断行：在真实词边界上贪心填充每行，超长时优先回退到行内最后一个标点之后断开。
+
+    每个词最多被回退搬移一次到下一行（回退长度受 max_chars 限制），整体为线性时间。
+    """
+    lines = []
+    line: list[dict] = []
+    length = 0
+    last_break = -1  # line 中最后一个以标点结尾的词的下标
+
+    for w in words:
+        text = w.get("word", "")
+        size = len(text.lstrip()) if not line else len(text)
+        # 纯标点不放到行首，允许其略微超出 max_chars
+        is_punct = bool(text.strip()) and all(ch in BREAK_PUNCTS for ch in text.strip())
+        if line and length + size > max_chars and not is_punct:
+            if 0 <= last_break < len(line) - 1:
+                lines.append(line[: last_break + 1])
+                line = line[last_break + 1 :]
+            else:
+                lines.append(line)
+                line = []
+            length = len("".join(x.get("word", "") for x in line).lstrip())
+            last_break = -1
+            for j, x in enumerate(line):
+                if x.get("word", "").rstrip()[-1:] in BREAK_PUNCTS:
+                    last_break = j
+            size = len(text.lstrip()) if not line else len(text)
+        line.append(w)
+        length += size
+        if text.rstrip()[-1:] in BREAK_PUNCTS:
+            last_break = len(line) - 1
+
+    if line:
+        lines.append(line)
+    return lines
+
+
+def iter_cues(
+    segments: Iterable[dict],
+    max_chars: int = 20,
+    use_words: bool = True,
+    cjk_width: bool = False,
+    keep_words: bool = False,
+) -> Iterator[tuple[float, float, str]]:
+    """从转录段落逐条产出字幕条目 (开始, 结束, 文本)。
+
+    段落带词级时间戳（words）且 use_words=True 时，按真实词边界断行，每行的起止时间取自首尾词；
+    否则按字数拆分并按行数均分段落时长。
+    """
     for seg in segments:
         text = seg.get("text", "").strip()
         if not text:
@@ -67,56 +167,117 @@ def generate_srt(segments: list[dict], max_chars: int = 20) -> str:
         end = seg.get("end", 0)
         duration = end - start
 
+        if use_words and seg.get("words"):
+            for line_words in split_words(seg["words"], max_chars):
+                line = "".join(w.get("word", "") for w in line_words).strip()
+                if not line:
+                    continue
+                yield line_words[0].get("start", start), line_words[-1].get("end", end), line
+            continue
+
         # 将长段落拆分
-        lines = split_text(text, max_chars)
+        lines = split_text(text, max_chars, cjk_width=cjk_width, keep_words=keep_words)
 
         if len(lines) == 1:
-            entry = f"{index}\n{format_timestamp(start)} --> {format_timestamp(end)}\n{lines[0]}\n"
-            srt_entries.append(entry)
-            index += 1
+            yield start, end, lines[0]
         else:
             # 按行数均分时间
             time_per_line = duration / len(lines)
             for i, line in enumerate(lines):
-                line_start = start + i * time_per_line
-                line_end = start + (i + 1) * time_per_line
-                entry = f"{index}\n{format_timestamp(line_start)} --> {format_timestamp(line_end)}\n{line}\n"
-                srt_entries.append(entry)
-                index += 1
+                yield start + i * time_per_line, start + (i + 1) * time_per_line, line
+
 
-    return "\n".join(srt_entries)
+def generate_srt(
+    segments: list[dict],
+    max_chars: int = 20,
+    use_words: bool = True,
+    cjk_width: bool = False,
+    keep_words: bool = False,
+) -> str:
+    """从转录段落生成 SRT 字幕内容（整体返回字符串，适合短转录；长转录请用 iter_cues + write_cues）。"""
+    buf = io.StringIO()
+    write_cues(iter_cues(segments, max_chars, use_words, cjk_width, keep_words), buf, "srt")
+    return buf.getvalue()
+
+
+def _counting(items: Iterable, counts: dict, key: str) -> Iterator:
+    for item in items:
+        counts[key] += 1
+        yield item
 
 
 def main():
-    parser = argparse.ArgumentParser(description="Whisper 转录 JSON → SRT 字幕文件")
+    parser = argparse.ArgumentParser(description="Whisper 转录 JSON → SRT / WebVTT / ASS 字幕文件")
     parser.add_argument("--input", "-i", required=True, help="输入转录 JSON 文件路径")
-    parser.add_argument("--output", "-o", required=True, help="输出 SRT 文件路径")
+    parser.add_argument("--output", "-o", required=True, help="输出字幕文件路径")
+    parser.add_argument("--format", "-f", choices=FORMATS,
+                        help="字幕格式 (默认: 按输出文件扩展名推断，未知扩展名为 srt)")
     parser.add_argument("--max-chars", type=int, default=20, help="每行最大字数 (默认: 20)")
+    parser.add_argument("--cjk-width", action="store_true",
+                        help="按 CJK 宽度计算每行字数（半角字母/数字算半个字）")
+    parser.add_argument("--keep-words", action="store_true", help="强制断行时不切断英文单词")
+    parser.add_argument("--no-word-timing", action="store_true",
+                        help="忽略转录中的词级时间戳，按行数均分段落时长")
+    parser.add_argument("--plan", "-p", help="剪辑方案 JSON：把原始视频时间轴的转录映射到剪辑后的时间轴")
+    parser.add_argument("--source", help="原始视频（raw.mp4）：映射前按 cut_video.py 的规则规范化剪辑方案")
+    parser.add_argument("--min-keep-ratio", type=float, default=0.3,
+                        help="映射时段落保留比例低于该值则丢弃 (默认: 0.3)")
+    add_trace_argument(parser)
     args = parser.parse_args()
+    setup_tracing(args.trace)
 
     input_path = Path(args.input)
     if not input_path.exists():
         print(f"错误: 输入文件不存在: {input_path}")
         sys.exit(1)
 
-    with open(input_path, "r", encoding="utf-8") as f:
-        transcript = json.load(f)
-
-    segments = transcript.get("segments", [])
-    if not segments:
-        print("错误: 转录结果中没有段落")
-        sys.exit(1)
+    keep_segments = None
+    if args.plan:
+        try:
+            keep_segments = load_keep_segments(args.plan, args.source)
+        except RuntimeError as e:
+            print(f"错误: {e}")
+            sys.exit(1)
+        if not keep_segments:
+            print("错误: 剪辑方案中没有保留片段")
+            sys.exit(1)
 
-    srt_content = generate_srt(segments, args.max_chars)
+    # 段落逐个流经 读取 → 时间轴映射 → 断行 → 写出，全程不在内存中累积
+    counts = {"read": 0, "mapped": 0}
+    segments = _counting(iter_json_array(input_path, "segments"), counts, "read")
+    if keep_segments:
+        segments = _counting(iter_remap_segments(segments, keep_segments, args.min_keep_ratio),
+                             counts, "mapped")
+    cues = iter_cues(
+        segments, args.max_chars,
+        use_words=not args.no_word_timing,
+        cjk_width=args.cjk_width,
+        keep_words=args.keep_words,
+    )
 
+    fmt = args.format or format_from_path(args.output)
     output_path = Path(args.output)
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(srt_content)
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    try:
+        with tracer.span("generate_srt", format=fmt, bytes_in=input_path.stat().st_size) as sp, \
+                open(tmp_path, "w", encoding="utf-8") as f:
+            entry_count = write_cues(cues, f, fmt)
+            sp.add(cues=entry_count, segments=counts["read"], bytes_out=f.tell())
+    except (ValueError, json.JSONDecodeError) as e:
+        tmp_path.unlink(missing_ok=True)
+        print(f"错误: 转录 JSON 解析失败: {e}")
+        sys.exit(1)
+
+    if counts["read"] == 0:
+        tmp_path.unlink(missing_ok=True)
+        print("错误: 转录结果中没有段落")
+        sys.exit(1)
+    tmp_path.replace(output_path)
 
-    # 统计
-    entry_count = srt_content.count("\n\n") + 1
-    print(f"✅ SRT 字幕已生成: {output_path}")
+    print(f"✅ {fmt.upper()} 字幕已生成: {output_path}")
+    if keep_segments:
+        print(f"   已映射到剪辑后时间轴: 段落 {counts['read']} → {counts['mapped']}")
     print(f"   字幕条数: {entry_count}")
     print(f"   每行最大字数: {args.max_chars}")
 
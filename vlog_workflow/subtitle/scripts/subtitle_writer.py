@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+流式字幕写出：逐段读取 transcript.json、逐条写出字幕，内存占用与转录长度无关。
+
+    - iter_json_array: 增量解析 JSON 顶层对象中的某个数组（默认 segments），逐个产出元素
+    - write_cues:      把 (开始, 结束, 文本) 字幕条目流式写成 SRT / WebVTT / ASS
+    - read_cues:       逐条读回 SRT / WebVTT / ASS 字幕文件
+
+ASS 输出内置与 burn_subtitle.py 烧录时相同的样式（SUBTITLE_STYLE），
+可直接用于 ffmpeg subtitles 滤镜或其它播放器，无需再 force_style。
+
+通常由 generate_srt.py 调用，不单独运行。
+"""
+
+import json
+from pathlib import Path
+from typing import IO, Iterable, Iterator
+
+# 字幕样式：白色文字、黑色描边、底部居中（burn_subtitle.py 的 force_style 也使用这组值）
+SUBTITLE_STYLE = {
+    "font": "Noto Sans CJK SC",
+    "fontsize": 24,
+    "primary_colour": "&H00FFFFFF",  # 白色
+    "outline_colour": "&H00000000",  # 黑色描边
+    "outline": 2,
+    "margin_v": 40,
+    "alignment": 2,  # 底部居中
+}
+
+FORMATS = ("srt", "vtt", "ass")
+
+_WHITESPACE = " \t\r\n"
+_decoder = json.JSONDecoder()
+
+
+# ── 增量 JSON 解析 ───────────────────────────────────────────────────────────
+
+class _JsonReader:
+    """在分块读入的缓冲区上逐个解码 JSON 值，已消费的部分随时丢弃。"""
+
+    def __init__(self, f: IO[str], chunk_size: int = 1 << 16):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size: int = 0) -> bool:
+        data = self.f.read(max(self.chunk_size, size))
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """跳过空白，返回下一个字符（不消费），文件结束时返回空串。"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, ch: str) -> None:
+        if self.peek() != ch:
+            raise ValueError(f"JSON 格式错误: 期望 {ch!r}，实际 {self.peek()!r}")
+        self.pos += 1
+
+    def value(self):
+        """解码下一个完整的 JSON 值；缓冲区不足时继续读入。"""
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # 值不完整：按已缓冲长度成倍读入，超长字段（如整篇 text）也保持线性耗时
+                if self._fill(len(self.buf) - self.pos):
+                    continue
+                raise
+            # 数字/字面量恰好停在缓冲区末尾时可能被截断，读入更多后重新解码
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def iter_json_array(path: str | Path, key: str = "segments") -> Iterator[dict]:
+    """增量读取 JSON 文件顶层对象中 key 对应的数组，逐个产出元素。
+
+    其它顶层字段（如 text）会被解码后直接丢弃；数组元素读完一个产出一个，不在内存中累积。
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        reader = _JsonReader(f)
+        reader.expect("{")
+        if reader.peek() == "}":
+            return
+        while True:
+            name = reader.value()
+            reader.expect(":")
+            if name == key and reader.peek() == "[":
+                reader.expect("[")
+                if reader.peek() == "]":
+                    return
+                while True:
+                    yield reader.value()
+                    if reader.peek() == "]":
+                        return
+                    reader.expect(",")
+            reader.value()
+            if reader.peek() == "}":
+                return
+            reader.expect(",")
+
+
+# ── 时间戳格式 ───────────────────────────────────────────────────────────────
+
+def format_timestamp(seconds: float) -> str:
+    """将秒数转换为 SRT 时间戳格式: HH:MM:SS,mmm"""
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    secs = int(seconds % 60)
+    millis = int((seconds % 1) * 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+
+def format_vtt_timestamp(seconds: float) -> str:
+    """WebVTT 时间戳: HH:MM:SS.mmm"""
+    return format_timestamp(seconds).replace(",", ".")
+
+
+def format_ass_timestamp(seconds: float) -> str:
+    """ASS 时间戳: H:MM:SS.cc（百分之一秒）"""
+    cs = int(round(seconds * 100))
+    return f"{cs // 360000}:{cs // 6000 % 60:02d}:{cs // 100 % 60:02d}.{cs % 100:02d}"
+
+
+# ── 写出 ─────────────────────────────────────────────────────────────────────
+
+def ass_header(style: dict | None = None, play_res: tuple[int, int] = (384, 288), wrap_style: int = 0) -> str:
+    """ASS 文件头与 Default 样式。
+
+    PlayRes 默认取 384x288，与 ffmpeg 把 SRT 转为 ASS 时的默认画布一致，
+    因此相同的 FontSize/MarginV 在烧录时与 SRT + force_style 的效果相同。
+    """
+    s = {**SUBTITLE_STYLE, **(style or {})}
+    return (
+        "[Script Info]\n"
+        "ScriptType: v4.00+\n"
+        f"PlayResX: {play_res[0]}\n"
+        f"PlayResY: {play_res[1]}\n"
+        f"WrapStyle: {wrap_style}\n"
+        "ScaledBorderAndShadow: yes\n"
+        "\n"
+        "[V4+ Styles]\n"
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+        "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+        "Alignment, MarginL, MarginR, MarginV, Encoding\n"
+        f"Style: Default,{s['font']},{s['fontsize']},{s['primary_colour']},&H000000FF,"
+        f"{s['outline_colour']},&H00000000,0,0,0,0,100,100,0,0,1,{s['outline']},0,"
+        f"{s['alignment']},10,10,{s['margin_v']},1\n"
+        "\n"
+        "[Events]\n"
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+    )
+
+
+def escape_ass_text(text: str) -> str:
+    # 花括号在 ASS 中是覆盖标签，换行写作 \N
+    return text.replace("{", "(").replace("}", ")").replace("\n", "\\N")
+
+
+def write_cues(
+    cues: Iterable[tuple[float, float, str]],
+    f: IO[str],
+    fmt: str = "srt",
+    style: dict | None = None,
+) -> int:
+    """把字幕条目逐条写入 f，返回写出的条目数。"""
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的字幕格式: {fmt}")
+
+    if fmt == "vtt":
+        f.write("WEBVTT\n\n")
+    elif fmt == "ass":
+        f.write(ass_header(style))
+
+    count = 0
+    for start, end, text in cues:
+        count += 1
+        if fmt == "srt":
+            # 条目之间空一行，末条之后不留空行（与旧版 "\n".join 输出一致）
+            if count > 1:
+                f.write("\n")
+            f.write(f"{count}\n{format_timestamp(start)} --> {format_timestamp(end)}\n{text}\n")
+        elif fmt == "vtt":
+            f.write(f"{format_vtt_timestamp(start)} --> {format_vtt_timestamp(end)}\n{text}\n\n")
+        else:
+            f.write(f"Dialogue: 0,{format_ass_timestamp(start)},{format_ass_timestamp(end)},"
+                    f"Default,,0,0,0,,{escape_ass_text(text)}\n")
+    return count
+
+
+def _parse_timestamp(ts: str) -> float:
+    """解析 SRT / WebVTT / ASS 时间戳（HH:MM:SS,mmm / [HH:]MM:SS.mmm / H:MM:SS.cc）。"""
+    parts = ts.strip().replace(",", ".").split(":")
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def read_cues(path: str | Path) -> Iterator[tuple[float, float, str]]:
+    """逐条读取 SRT / WebVTT / ASS 字幕文件中的条目 (开始, 结束, 文本)。
+
+    SRT/WebVTT 多行文本以换行连接；ASS 返回 Dialogue 的原始 Text 字段（保留覆盖标签）。
+    """
+    fmt = format_from_path(path)
+    with open(path, "r", encoding="utf-8-sig") as f:
+        if fmt == "ass":
+            for line in f:
+                if line.startswith("Dialogue:"):
+                    fields = line[len("Dialogue:"):].rstrip("\r\n").split(",", 9)
+                    if len(fields) == 10:
+                        yield _parse_timestamp(fields[1]), _parse_timestamp(fields[2]), fields[9]
+            return
+
+        timing = None
+        lines: list[str] = []
+        for line in f:
+            line = line.rstrip("\r\n")
+            if "-->" in line:
+                start, _, end = line.partition("-->")
+                # WebVTT 时间戳后可能跟定位设置（如 line:90%）
+                timing = (_parse_timestamp(start), _parse_timestamp(end.split()[0]))
+                lines = []
+            elif not line.strip():
+                if timing and lines:
+                    yield timing[0], timing[1], "\n".join(lines)
+                timing = None
+            elif timing:
+                lines.append(line)
+        if timing and lines:
+            yield timing[0], timing[1], "\n".join(lines)
+
+
+def format_from_path(path: str | Path) -> str:
+    """按扩展名推断字幕格式，未知扩展名按 SRT 处理。"""
+    suffix = Path(path).suffix.lower().lstrip(".")
+    return suffix if suffix in FORMATS else "srt"
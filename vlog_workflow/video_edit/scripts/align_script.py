@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+口播稿对齐：把 transcript.json 的段落与 speech.md 逐段对齐，找出重读的部分，自动生成剪辑方案草稿。
+
+    - 两边文本统一规范化（NFKC、小写、去标点空白、去掉"嗯""呃"等语气词），口播稿按句拆分后拼成一条字符串
+    - 用字符 2-gram 倒排索引为每个段落投票找出候选位置，再在候选窗口内用位并行编辑距离（Myers 算法）
+      求段落在口播稿中的最佳匹配区间（半全局对齐：口播稿两端不计罚分）
+    - 同一段口播稿读了多遍时，按时间顺序选出一条在口播稿上单调前进的段落链（加权最长链，树状数组 O(n log n)），
+      未被选中的重读段落剪掉；--prefer last 保留最后一遍，--prefer best 保留与口播稿最一致的一遍
+    - 只由语气词组成的段落剪掉；口播稿之外的即兴内容默认保留并标注，加 --drop-unmatched 时剪掉
+    - 一小时的转录（一千多个段落、上万字口播稿）几秒内完成，输出可直接交给 cut_video.py，也可由 Agent 在此基础上修改
+
+用法:
+    python3 align_script.py --transcript transcript.json --script speech.md --output cut_plan.json
+    python3 align_script.py -t transcript.json -s speech.md -o cut_plan.json --prefer best --max-pause 1.0
+"""
+
+import argparse
+import bisect
+import json
+import re
+import sys
+import time
+import unicodedata
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "common"))
+from instrument import add_trace_argument, setup_tracing, tracer
+
+# 对齐时忽略的单字语气词（"那个""就是"可能是正文，不在此列）
+FILLERS = set("嗯呃额唔哦噢")
+
+NGRAM = 2
+# 出现次数超过该值的 n-gram 区分度太低，不参与投票
+MAX_POSTINGS = 64
+# 投票时对角线（口播稿位置 - 段落内位置）的分桶宽度
+VOTE_BIN = 4
+# 每个段落最多精确比对的候选位置数
+TOP_CANDIDATES = 3
+# 前后两段在口播稿上允许重叠的字符数（对齐边界误差）
+OVERLAP_CHARS = 2
+
+_COMMENT_RE = re.compile(r"<!--.*?-->", re.S)
+_LINK_RE = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+_LINE_MARK_RE = re.compile(r"^\s*(?:>\s*|[-*+]\s+|\d+[.)、]\s+)")
+_SENTENCE_RE = re.compile(r"[^。！？!?；;…\n]+[。！？!?；;…]*")
+
+
+def normalize(text: str) -> str:
+    """规范化：全角转半角、小写，只保留文字和数字，去掉单字语气词。"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return "".join(ch for ch in text if unicodedata.category(ch)[0] in "LN" and ch not in FILLERS)
+
+
+def parse_script(md_text: str) -> list[str]:
+    """从口播稿 Markdown 中取出朗读的句子（跳过注释、标题和代码块，去掉列表、强调和链接标记）。"""
+    md_text = _COMMENT_RE.sub("", md_text)
+    sentences = []
+    in_code = False
+    for line in md_text.split("\n"):
+        if line.strip().startswith("```"):
+            in_code = not in_code
+            continue
+        if in_code or line.lstrip().startswith("#"):
+            continue
+        line = _LINK_RE.sub(r"\1", _LINE_MARK_RE.sub("", line))
+        line = line.replace("**", "").replace("__", "").replace("`", "")
+        sentences.extend(s.strip() for s in _SENTENCE_RE.findall(line) if normalize(s))
+    return sentences
+
+
+class ScriptIndex:
+    """规范化后的口播稿字符串 + 句子边界 + n-gram 倒排索引。"""
+
+    def __init__(self, sentences: list[str]):
+        self.sentences = sentences
+        parts = [normalize(s) for s in sentences]
+        self.starts = []
+        pos = 0
+        for p in parts:
+            self.starts.append(pos)
+            pos += len(p)
+        self.text = "".join(parts)
+        self.postings: dict[str, list[int]] = {}
+        for i in range(len(self.text) - NGRAM + 1):
+            self.postings.setdefault(self.text[i:i + NGRAM], []).append(i)
+
+    def sentence_at(self, pos: int) -> int:
+        return max(bisect.bisect_right(self.starts, pos) - 1, 0)
+
+    def candidates(self, query: str) -> list[int]:
+        """按 n-gram 对角线投票，返回得票最多的几个候选起点。"""
+        votes = Counter()
+        for j in range(len(query) - NGRAM + 1):
+            posts = self.postings.get(query[j:j + NGRAM])
+            if not posts or len(posts) > MAX_POSTINGS:
+                continue
+            for p in posts:
+                votes[(p - j) // VOTE_BIN] += 1
+        return [b * VOTE_BIN for b, n in votes.most_common(TOP_CANDIDATES) if n >= 2 or len(query) <= NGRAM + 1]
+
+
+def _myers_best_end(pattern: str, text: str) -> tuple[int, int]:
+    """位并行半全局编辑距离：pattern 与 text 任意子串的最小距离及该子串的结束位置（含）。
+
+    Myers (1999)，每个 text 字符只做常数次整数位运算，Python 大整数天然支持任意长度的 pattern。
+    """
+    m = len(pattern)
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    peq: dict[str, int] = {}
+    for i, ch in enumerate(pattern):
+        peq[ch] = peq.get(ch, 0) | (1 << i)
+    pv, mv, score = mask, 0, m
+    best, best_end = m, -1
+    for j, ch in enumerate(text):
+        eq = peq.get(ch, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = (ph << 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+        # 同分时取更靠后的结束位置：末字识别错误（替换）不会让匹配区间缩短
+        if score <= best:
+            best, best_end = score, j
+    return best, best_end
+
+
+def locate(query: str, index: ScriptIndex) -> tuple[int, int, int] | None:
+    """段落在口播稿中的最佳匹配 (编辑距离, 起点, 终点不含)，找不到候选时返回 None。"""
+    m = len(query)
+    band = max(8, m // 4)
+    best = None
+    for d in index.candidates(query):
+        lo = max(0, d - band)
+        hi = min(len(index.text), d + m + band + VOTE_BIN)
+        dist, end = _myers_best_end(query, index.text[lo:hi])
+        if end < 0 or (best and dist >= best[0]):
+            continue
+        # 反向再做一次得到匹配起点
+        _, rev_end = _myers_best_end(query[::-1], index.text[lo:lo + end + 1][::-1])
+        best = (dist, lo + end - rev_end, lo + end + 1)
+    return best
+
+
+class _MaxTree:
+    """树状数组：前缀最大值（值为可比较的元组）。"""
+
+    def __init__(self, size: int):
+        self.tree = [None] * (size + 1)
+
+    def update(self, pos: int, value) -> None:
+        pos += 1
+        while pos < len(self.tree):
+            if self.tree[pos] is None or value > self.tree[pos]:
+                self.tree[pos] = value
+            pos += pos & -pos
+
+    def query(self, pos: int):
+        pos = min(pos + 1, len(self.tree) - 1)
+        best = None
+        while pos > 0:
+            if self.tree[pos] is not None and (best is None or self.tree[pos] > best):
+                best = self.tree[pos]
+            pos -= pos & -pos
+        return best
+
+
+def choose_takes(matches: list[dict], script_len: int, prefer: str = "last") -> set[int]:
+    """按时间顺序选出在口播稿上单调前进、覆盖最多的段落链，返回选中段落的下标。
+
+    权重为段落覆盖的口播稿字数（best 模式再乘以匹配准确率）；同权时选时间更晚的一遍。
+    """
+    tree = _MaxTree(script_len + 1)
+    score: dict[int, float] = {}
+    parent: dict[int, int | None] = {}
+    for m in matches:
+        weight = m["b"] - m["a"]
+        if prefer == "best":
+            weight *= 1 - m["error"]
+        prev = tree.query(m["a"] + OVERLAP_CHARS)
+        score[m["i"]] = weight + (prev[0] if prev else 0)
+        parent[m["i"]] = prev[1] if prev else None
+        tree.update(m["b"], (score[m["i"]], m["i"]))
+    if not score:
+        return set()
+    i = max(score, key=lambda k: (score[k], k))
+    chosen = set()
+    while i is not None:
+        chosen.add(i)
+        i = parent[i]
+    return chosen
+
+
+def _fmt(t: float) -> str:
+    return f"{int(t // 60):02d}:{t % 60:04.1f}"
+
+
+def _sentences_label(index: ScriptIndex, a: int, b: int) -> str:
+    first, last = index.sentence_at(a) + 1, index.sentence_at(max(b - 1, a)) + 1
+    return f"口播稿第 {first} 句" if first == last else f"口播稿第 {first}-{last} 句"
+
+
+def align(
+    transcript: dict,
+    sentences: list[str],
+    prefer: str = "last",
+    max_error: float = 0.35,
+    drop_unmatched: bool = False,
+) -> tuple[list[dict], ScriptIndex]:
+    """逐段对齐并决定取舍，返回每个段落的 {start, end, keep, note/reason, ...} 和口播稿索引。"""
+    index = ScriptIndex(sentences)
+    segments = transcript.get("segments", [])
+    decisions = []
+    matches = []
+    for i, seg in enumerate(segments):
+        query = normalize(seg.get("text", ""))
+        item = {"i": i, "start": seg["start"], "end": seg["end"], "text": seg.get("text", "")}
+        decisions.append(item)
+        if not query:
+            item.update(keep=False, reason="语气词")
+            continue
+        hit = locate(query, index) if index.text else None
+        if hit and hit[0] / len(query) <= max_error:
+            dist, a, b = hit
+            item.update(a=a, b=b, error=round(dist / len(query), 3))
+            matches.append(item)
+        elif drop_unmatched:
+            item.update(keep=False, reason="口播稿外内容")
+        else:
+            item.update(keep=True, note="口播稿外内容（请确认）")
+
+    chosen = choose_takes(matches, len(index.text), prefer)
+    chosen_items = sorted((decisions[i] for i in chosen), key=lambda d: d["a"])
+    chosen_starts = [d["a"] for d in chosen_items]
+    for m in matches:
+        label = _sentences_label(index, m["a"], m["b"])
+        if m["i"] in chosen:
+            m.update(keep=True, note=label)
+            continue
+        # 找出与之重叠最多的选中段落，即保留的那一遍
+        k = bisect.bisect_right(chosen_starts, m["b"])
+        overlaps = [(min(c["b"], m["b"]) - max(c["a"], m["a"]), c) for c in chosen_items[max(k - 8, 0):k]]
+        overlap, kept = max(overlaps, key=lambda x: x[0], default=(0, None))
+        if kept is None or overlap <= OVERLAP_CHARS:
+            m.update(keep=True, note=f"{label}（顺序与口播稿不符，请确认）")
+        else:
+            which = "更准确的" if prefer == "best" else "后面的"
+            m.update(keep=False, reason=f"重读{label}，保留 {_fmt(kept['start'])} 处{which}一遍")
+    return decisions, index
+
+
+def build_plan(decisions: list[dict], duration: float, max_pause: float = 1.0, pad: float = 0.15) -> dict:
+    """由逐段取舍生成 cut_plan.json：相邻保留段落合并（停顿超过 max_pause 秒时断开），其余时间为剪除区间。"""
+    keeps: list[dict] = []
+    last_kept = None
+    for k, d in enumerate(decisions):
+        if not d["keep"]:
+            continue
+        prev_end = decisions[k - 1]["end"] if k else 0.0
+        next_start = decisions[k + 1]["start"] if k + 1 < len(decisions) else duration
+        start = max(d["start"] - pad, prev_end, 0.0)
+        end = min(d["end"] + pad, max(next_start, d["end"]), duration)
+        if keeps and last_kept == k - 1 and start - keeps[-1]["end"] <= max_pause:
+            keeps[-1]["end"] = round(end, 3)
+            if d["note"] not in keeps[-1]["notes"]:
+                keeps[-1]["notes"].append(d["note"])
+        else:
+            keeps.append({"start": round(start, 3), "end": round(end, 3), "notes": [d["note"]]})
+        last_kept = k
+
+    removed = []
+    cursor = 0.0
+    bounds = [(k["start"], k["end"]) for k in keeps] + [(duration, duration)]
+    for start, end in bounds:
+        if start - cursor > 1e-3:
+            reasons = []
+            for d in decisions:
+                if not d["keep"] and d["end"] > cursor and d["start"] < start and d["reason"] not in reasons:
+                    reasons.append(d["reason"])
+            if not reasons:
+                label = "开头静音" if cursor == 0.0 else ("结尾静音" if start >= duration else "静音停顿")
+                reasons.append(f"{label} {start - cursor:.1f} 秒")
+            removed.append({"start": round(cursor, 3), "end": round(start, 3), "reason": "；".join(reasons)})
+        cursor = max(cursor, end)
+
+    return {
+        "keep_segments": [{"start": k["start"], "end": k["end"], "note": "；".join(_merge_labels(k["notes"]))}
+                          for k in keeps],
+        "removed_segments": removed,
+    }
+
+
+def _merge_labels(notes: list[str]) -> list[str]:
+    """把相邻的「口播稿第 a-b 句」合并成一个范围。"""
+    merged: list = []
+    for note in notes:
+        m = re.fullmatch(r"口播稿第 (\d+)(?:-(\d+))? 句", note)
+        if not m:
+            merged.append(note)
+            continue
+        first, last = int(m.group(1)), int(m.group(2) or m.group(1))
+        if merged and isinstance(merged[-1], tuple) and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return [n if isinstance(n, str) else (f"口播稿第 {n[0]} 句" if n[0] == n[1] else f"口播稿第 {n[0]}-{n[1]} 句")
+            for n in merged]
+
+
+def missing_sentences(decisions: list[dict], index: ScriptIndex, min_coverage: float = 0.5) -> list[int]:
+    """保留的段落覆盖不到一半的口播稿句子（漏读或识别错误），返回句子下标。"""
+    covered = bytearray(len(index.text))
+    for d in decisions:
+        if d.get("keep") and "a" in d:
+            covered[d["a"]:d["b"]] = b"\x01" * (d["b"] - d["a"])
+    ends = index.starts[1:] + [len(index.text)]
+    return [i for i, (a, b) in enumerate(zip(index.starts, ends))
+            if b > a and sum(covered[a:b]) < (b - a) * min_coverage]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对齐转录与口播稿，找出重读部分并生成剪辑方案草稿")
+    parser.add_argument("--transcript", "-t", required=True, help="transcript.json 路径")
+    parser.add_argument("--script", "-s", required=True, help="口播稿 speech.md 路径")
+    parser.add_argument("--output", "-o", required=True, help="输出剪辑方案 JSON 路径")
+    parser.add_argument("--prefer", choices=["last", "best"], default="last",
+                        help="重读时保留哪一遍：last 最后一遍，best 与口播稿最一致的一遍 (默认: last)")
+    parser.add_argument("--max-error", type=float, default=0.35,
+                        help="段落与口播稿的编辑距离 / 段落字数超过该值视为口播稿外内容 (默认: 0.35)")
+    parser.add_argument("--drop-unmatched", action="store_true", help="剪掉口播稿外内容（默认保留并标注）")
+    parser.add_argument("--max-pause", type=float, default=1.0,
+                        help="保留段落之间超过该秒数的停顿被剪掉 (默认: 1.0)")
+    parser.add_argument("--pad", type=float, default=0.15, help="保留段落前后的缓冲秒数 (默认: 0.15)")
+    add_trace_argument(parser)
+    args = parser.parse_args()
+    setup_tracing(args.trace)
+
+    for path in (args.transcript, args.script):
+        if not Path(path).exists():
+            print(f"错误: 文件不存在: {path}")
+            sys.exit(1)
+    with open(args.transcript, "r", encoding="utf-8") as f:
+        transcript = json.load(f)
+    sentences = parse_script(Path(args.script).read_text(encoding="utf-8"))
+    if not sentences:
+        print(f"错误: 口播稿中没有可朗读的内容: {args.script}")
+        sys.exit(1)
+    segments = transcript.get("segments", [])
+    duration = transcript.get("duration") or (segments[-1]["end"] if segments else 0.0)
+
+    t0 = time.perf_counter()
+    with tracer.span("align", segments=len(segments), script_chars=sum(len(s) for s in sentences)):
+        decisions, index = align(transcript, sentences, args.prefer, args.max_error, args.drop_unmatched)
+        plan = build_plan(decisions, duration, args.max_pause, args.pad)
+    elapsed = time.perf_counter() - t0
+
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(plan, f, ensure_ascii=False, indent=2)
+
+    matched = sum(1 for d in decisions if "a" in d)
+    retakes = sum(1 for d in decisions if "a" in d and not d["keep"])
+    offscript = sum(1 for d in decisions if d["text"].strip() and "a" not in d and normalize(d["text"]))
+    kept = sum(k["end"] - k["start"] for k in plan["keep_segments"])
+    print(f"✅ 对齐完成（{elapsed:.2f} 秒）: {output_path}")
+    print(f"   段落: {len(decisions)}，对上口播稿 {matched}，重读剪掉 {retakes}，口播稿外 {offscript}")
+    print(f"   保留 {len(plan['keep_segments'])} 段，{kept:.1f} / {duration:.1f} 秒；"
+          f"剪除 {len(plan['removed_segments'])} 段")
+    missing = missing_sentences(decisions, index)
+    if missing:
+        print(f"警告: {len(missing)} 句口播稿在保留的段落中没有找到（漏读或识别有误）:")
+        for i in missing[:10]:
+            print(f"   第 {i + 1} 句: {sentences[i][:40]}")
+        if len(missing) > 10:
+            print(f"   ……共 {len(missing)} 句")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+音频事件检测：找出录制时的拍桌子 / 响指（短促尖峰）和长停顿，输出带时间戳的标记，供剪辑方案吸附边界。
+
+    - 以内存映射方式逐块读取 extract_audio() 输出的 16kHz 单声道 PCM WAV，向量化计算每 10ms 帧的能量和峰值，
+      音频本身不整体载入内存（每小时只占约 3MB 帧特征），多小时的录音也能处理
+    - 尖峰：帧能量比前 100ms 高出 --rise-db，且 100-200ms 后回落 --decay-db 以上（语音起始不会这么快衰减），
+      持续不超过 80ms；相距 0.3 秒以内的尖峰合并
+    - 长停顿：能量低于 底噪（10% 分位）+ 12dB、持续 --min-silence 秒以上的区间，与 vad.py 的阈值一致
+    - 尖峰紧接着长停顿（录制技巧中的"说错后拍桌子、停 2-3 秒再重来"）时标记为 retake
+
+用法:
+    python3 audio_events.py --input raw.mp4 --output markers.json
+    python3 audio_events.py --input audio.wav --output markers.json --min-silence 2.0
+    python3 audio_events.py --self-test          # 用合成音频自检检测精度
+
+输出格式:
+    {"duration": 3600.0, "markers": [
+        {"type": "transient", "time": 12.34, "level_db": -8.1, "retake": true},
+        {"type": "silence", "start": 12.5, "end": 15.1}
+    ]}
+
+依赖:
+    pip install numpy
+    ffmpeg (输入为视频时提取音频)
+"""
+
+import argparse
+import json
+import struct
+import subprocess
+import sys
+import tempfile
+import wave
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    print("错误: 请先安装 numpy: pip install numpy")
+    sys.exit(1)
+
+from vad import _extract_wav, _runs
+
+FRAME_MS = 10
+_BLOCK_SECONDS = 60
+
+EVENT_PARAMS = {
+    "rise_db": 15.0,
+    "decay_db": 12.0,
+    "min_level_db": 25.0,  # 尖峰至少比底噪高出的分贝数
+    "max_transient": 0.08,
+    "min_silence": 1.5,
+    "silence_db": 12.0,  # 静音阈值：底噪 + 该值，与 vad.py 一致
+}
+
+
+def pcm_layout(wav_path: str) -> tuple[int, int, int]:
+    """解析 16-bit 单声道 WAV 头，返回 (data 块偏移, 采样数, 采样率)。"""
+    with open(wav_path, "rb") as f:
+        riff, _, fmt = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or fmt != b"WAVE":
+            raise ValueError(f"不是 WAV 文件: {wav_path}")
+        rate = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"WAV 中没有 data 块: {wav_path}")
+            chunk_id, size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                audio_format, channels, rate, _, _, bits = struct.unpack("<HHIIHH", f.read(16))
+                if audio_format != 1 or channels != 1 or bits != 16:
+                    raise ValueError("需要 16-bit 单声道 PCM WAV（extract_audio 的输出）")
+                f.seek(size - 16 + (size & 1), 1)
+            elif chunk_id == b"data":
+                offset = f.tell()
+                break
+            else:
+                f.seek(size + (size & 1), 1)
+    if rate is None:
+        raise ValueError(f"WAV 缺少 fmt 块: {wav_path}")
+    # 管道输出的 WAV 头里 data 长度可能是占位值，以实际文件大小为准
+    return offset, min(size, Path(wav_path).stat().st_size - offset) // 2, rate
+
+
+def frame_features(wav_path: str, frame_ms: int = FRAME_MS) -> tuple[np.ndarray, np.ndarray, float, float]:
+    """逐块内存映射 PCM，计算每帧 RMS 能量和峰值（dBFS），返回 (能量, 峰值, 帧长秒数, 音频时长)。
+
+    每次只映射一块（60 秒），用完即解除映射，常驻内存不随音频时长增长。
+    """
+    offset, n_samples, rate = pcm_layout(wav_path)
+    frame_len = max(int(rate * frame_ms / 1000), 1)
+    n_frames = n_samples // frame_len
+    level = np.empty(n_frames, dtype=np.float32)
+    peak = np.empty(n_frames, dtype=np.float32)
+    step = max(int(_BLOCK_SECONDS * rate / frame_len), 1)
+    for first in range(0, n_frames, step):
+        count = min(step, n_frames - first)
+        block = np.memmap(wav_path, dtype="<i2", mode="r", offset=offset + first * frame_len * 2,
+                          shape=(count * frame_len,))
+        frames = block.astype(np.float32).reshape(count, frame_len) / 32768.0
+        del block
+        level[first:first + count] = np.mean(frames * frames, axis=1)
+        peak[first:first + count] = np.max(np.abs(frames), axis=1)
+    return (10 * np.log10(np.maximum(level, 1e-10)),
+            20 * np.log10(np.maximum(peak, 1e-5)),
+            frame_len / rate,
+            n_samples / rate)
+
+
+def _window_mean_db(power: np.ndarray, lo: int, hi: int) -> np.ndarray:
+    """每帧 i 在 [i+lo, i+hi) 范围内的平均功率（dB），越界部分按已有帧计算。"""
+    csum = np.concatenate(([0.0], np.cumsum(power, dtype=np.float64)))
+    idx = np.arange(power.size)
+    a = np.clip(idx + lo, 0, power.size)
+    b = np.clip(idx + hi, 0, power.size)
+    mean = (csum[b] - csum[a]) / np.maximum(b - a, 1)
+    return 10 * np.log10(np.maximum(mean, 1e-10))
+
+
+def detect_events(
+    wav_path: str,
+    rise_db: float = EVENT_PARAMS["rise_db"],
+    decay_db: float = EVENT_PARAMS["decay_db"],
+    min_level_db: float = EVENT_PARAMS["min_level_db"],
+    max_transient: float = EVENT_PARAMS["max_transient"],
+    min_silence: float = EVENT_PARAMS["min_silence"],
+    silence_db: float = EVENT_PARAMS["silence_db"],
+) -> tuple[list[dict], float]:
+    """检测尖峰和长停顿，返回 (按时间排序的标记, 音频时长)。"""
+    level, peak, frame_sec, duration = frame_features(wav_path)
+    if level.size == 0:
+        return [], duration
+    floor = float(np.percentile(level, 10))
+    power = 10 ** (level / 10)
+
+    before = _window_mean_db(power, -int(0.1 / frame_sec), 0)
+    after = _window_mean_db(power, int(0.1 / frame_sec), int(0.2 / frame_sec))
+    width = int(max_transient / frame_sec)
+    # 局部最大：±width 帧内能量最高的帧
+    padded = np.pad(level, width, constant_values=-np.inf)
+    local_max = np.lib.stride_tricks.sliding_window_view(padded, 2 * width + 1).max(axis=1)
+    # 持续时间：峰值帧后能量保持在峰值 -6dB 以内的帧数不超过 width
+    held = _window_mean_db(power, 1, width + 1) >= level - 6
+    candidate = (
+        (level >= local_max)
+        & (level - before >= rise_db)
+        & (level - after >= decay_db)
+        & (level >= floor + min_level_db)
+        & ~held
+    )
+
+    markers = []
+    last = -1.0
+    for i in np.flatnonzero(candidate).tolist():
+        # 尖峰时刻取能量最高帧的起点，合并相距 0.3 秒以内的重复检测
+        t = i * frame_sec
+        if t - last < 0.3:
+            continue
+        last = t
+        markers.append({"type": "transient", "time": round(t, 3), "level_db": round(float(level[i]), 1),
+                        "peak_db": round(float(peak[i]), 1)})
+
+    silent = level < floor + silence_db
+    min_frames = int(min_silence / frame_sec)
+    silences = [(s, e) for s, e in _runs(silent) if e - s >= min_frames]
+    for s, e in silences:
+        markers.append({"type": "silence", "start": round(s * frame_sec, 3), "end": round(e * frame_sec, 3)})
+
+    # 尖峰之后 0.5 秒内进入长停顿：说错后拍桌子、停顿再重来
+    starts = np.array([s * frame_sec for s, _ in silences])
+    for m in markers:
+        if m["type"] == "transient":
+            k = np.searchsorted(starts, m["time"])
+            m["retake"] = bool(k < starts.size and starts[k] - m["time"] <= 0.5)
+    markers.sort(key=lambda m: m.get("time", m.get("start")))
+    return markers, duration
+
+
+def load_markers(path: str) -> list[dict]:
+    """读取 audio_events.py 的输出。"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["markers"]
+
+
+def _synthetic_audio(path: str, rate: int = 16000) -> tuple[list[float], list[tuple[float, float]]]:
+    """合成自检音频：语音状噪声段落之间有长停顿，部分停顿前有拍桌子，另有一次拍桌子落在语音中间。"""
+    rng = np.random.default_rng(0)
+    layout = [("speech", 4.0), ("clap", 0), ("silence", 2.5), ("speech", 6.0), ("silence", 0.6),
+              ("speech", 3.0), ("clap", 0), ("silence", 3.0), ("speech", 5.0), ("silence", 2.0),
+              ("speech", 2.0), ("clap_over", 0), ("speech", 2.0), ("silence", 1.0)]
+    parts = []
+    claps, silences = [], []
+    t = 0.0
+    for kind, seconds in layout:
+        if kind == "speech":
+            n = int(seconds * rate)
+            tt = np.arange(n) / rate
+            # 4Hz 音节包络，起音 20ms 淡入
+            envelope = (0.5 + 0.5 * np.abs(np.sin(2 * np.pi * 2 * tt))) * np.minimum(tt / 0.02, 1)
+            parts.append(0.08 * envelope * rng.standard_normal(n))
+        elif kind == "silence":
+            n = int(seconds * rate)
+            parts.append(0.0008 * rng.standard_normal(n))
+            if seconds >= EVENT_PARAMS["min_silence"]:
+                silences.append((t, t + seconds))
+        else:
+            n = int(0.06 * rate)
+            hit = 0.9 * np.exp(-np.arange(n) / rate / 0.008) * rng.standard_normal(n)
+            if kind == "clap_over":
+                # 叠加在语音上：不占用时间轴
+                parts[-1][-n:] += hit
+                claps.append(t - n / rate)
+                continue
+            parts.append(hit)
+            claps.append(t)
+        t += n / rate
+    audio = np.clip(np.concatenate(parts), -1, 1)
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes((audio * 32767).astype("<i2").tobytes())
+    return claps, silences
+
+
+def self_test() -> bool:
+    """合成音频自检：尖峰误差不超过 20ms，长停顿边界误差不超过 50ms，无误报。"""
+    with tempfile.TemporaryDirectory() as tmp:
+        wav_path = str(Path(tmp) / "synthetic.wav")
+        claps, silences = _synthetic_audio(wav_path)
+        markers, _ = detect_events(wav_path)
+    found = [m for m in markers if m["type"] == "transient"]
+    found_silences = [m for m in markers if m["type"] == "silence"]
+
+    ok = True
+    if len(found) != len(claps) or any(abs(m["time"] - c) > 0.02 for m, c in zip(found, claps)):
+        print(f"错误: 尖峰检测不符，期望 {[round(c, 3) for c in claps]}，实际 {[m['time'] for m in found]}")
+        ok = False
+    if [m["retake"] for m in found] != [True, True, False]:
+        print(f"错误: retake 标记不符: {[m['retake'] for m in found]}")
+        ok = False
+    # 尖峰本身在停顿之前，停顿从尖峰衰减后开始
+    if len(found_silences) != len(silences) or any(
+        abs(m["end"] - e) > 0.05 or m["start"] < s - 0.1 or m["start"] > s + 0.1
+        for m, (s, e) in zip(found_silences, silences)
+    ):
+        print(f"错误: 长停顿检测不符，期望 {[(round(s, 2), round(e, 2)) for s, e in silences]}，"
+              f"实际 {[(m['start'], m['end']) for m in found_silences]}")
+        ok = False
+    if ok:
+        print(f"✅ 自检通过: {len(found)} 个尖峰（{sum(m['retake'] for m in found)} 个 retake），"
+              f"{len(found_silences)} 个长停顿")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检测拍桌子/响指尖峰和长停顿，输出剪辑标记")
+    parser.add_argument("--input", "-i", help="输入视频或 16kHz 单声道 WAV")
+    parser.add_argument("--output", "-o", help="输出标记 JSON")
+    parser.add_argument("--min-silence", type=float, default=EVENT_PARAMS["min_silence"],
+                        help=f"长停顿的最短秒数 (默认: {EVENT_PARAMS['min_silence']})")
+    parser.add_argument("--rise-db", type=float, default=EVENT_PARAMS["rise_db"],
+                        help=f"尖峰比前 100ms 高出的分贝数 (默认: {EVENT_PARAMS['rise_db']})")
+    parser.add_argument("--decay-db", type=float, default=EVENT_PARAMS["decay_db"],
+                        help=f"尖峰在 100-200ms 后回落的分贝数 (默认: {EVENT_PARAMS['decay_db']})")
+    parser.add_argument("--self-test", action="store_true", help="用合成音频检查检测精度")
+    args = parser.parse_args()
+
+    if args.self_test:
+        sys.exit(0 if self_test() else 1)
+    if not args.input or not args.output:
+        parser.error("请指定 --input 和 --output（或使用 --self-test）")
+    input_path = Path(args.input)
+    if not input_path.exists():
+        print(f"错误: 输入文件不存在: {input_path}")
+        sys.exit(1)
+
+    tmp_wav = None
+    wav_path = str(input_path)
+    if input_path.suffix.lower() != ".wav":
+        tmp_wav = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
+        tmp_wav.close()
+        wav_path = tmp_wav.name
+        try:
+            _extract_wav(str(input_path), wav_path)
+        except (subprocess.CalledProcessError, FileNotFoundError) as e:
+            Path(wav_path).unlink(missing_ok=True)
+            print(f"错误: ffmpeg 提取音频失败: {e}")
+            sys.exit(1)
+
+    try:
+        markers, duration = detect_events(wav_path, rise_db=args.rise_db, decay_db=args.decay_db,
+                                          min_silence=args.min_silence)
+    except (ValueError, OSError) as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+    finally:
+        if tmp_wav:
+            Path(wav_path).unlink(missing_ok=True)
+
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({"duration": round(duration, 3), "markers": markers}, f, ensure_ascii=False, indent=2)
+
+    transients = [m for m in markers if m["type"] == "transient"]
+    silences = [m for m in markers if m["type"] == "silence"]
+    print(f"✅ 音频事件检测完成: {output_path}")
+    print(f"   时长: {duration:.1f} 秒，尖峰 {len(transients)} 个（其中 retake {sum(m['retake'] for m in transients)} 个），"
+          f"长停顿 {len(silences)} 个（共 {sum(m['end'] - m['start'] for m in silences):.1f} 秒）")
+
+
+if __name__ == "__main__":
+    main()
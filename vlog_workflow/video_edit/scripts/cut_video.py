@@ -3,7 +3,32 @@
 视频剪辑脚本：根据剪辑方案（保留区间 JSON）使用 ffmpeg 执行精确剪辑。
 
 用法:
-    python3 cut_video.py --input raw.mp4 --plan cut_plan.json --output edited.mp4
+    python3 cut_video.py --input raw.mp4 --plan cut_plan.json --output edited.mp4 [--engine auto] [--verify]
+
+    # 逐段剪切并行执行（segment/smart 引擎），编码线程总数不超过 CPU 核数
+    python3 cut_video.py --input raw.mp4 --plan cut_plan.json --output edited.mp4 --engine smart --jobs 4
+
+    # 草稿预览：540p、ultrafast，快速检查剪辑方案（编码档位见 common/encoder_profiles.py）
+    python3 cut_video.py --input raw.mp4 --plan cut_plan.json --output preview.mp4 --profile draft
+
+    # 剪辑点吸附到关键帧（流复制 / 智能剪切更准更快），并保存实际使用的方案供字幕映射
+    python3 cut_video.py --input raw.mp4 --plan cut_plan.json --output edited.mp4 --snap keyframe --save-plan cut_plan.json
+
+    # 自检：合成长 GOP 测试片，在关键帧之间智能剪切，检查时长和音画对齐
+    python3 cut_video.py --self-test
+
+剪辑前会先规范化剪辑方案（common/plan_optimizer.py）：排序，合并重叠、相接或间隙不超过一帧的片段，
+去掉短于一帧的碎片，剪辑点对齐到帧边界，并打印节省的片段数和剪辑点的变化。
+
+逐段剪切（segment/smart 引擎）的每段输出缓存在源视频旁的 .render/（common/render_cache.py），
+键为源视频内容哈希 + 起止时间 + 编码档位。中断或个别片段失败后重新运行、或只改动了方案中的几个片段时，
+只重新剪切变化的片段再拼接；--no-cache 关闭。
+
+剪辑引擎:
+    segment  逐段剪切（优先 -c copy）后用 concat 拼接，片段少时最快
+    filter   用单个 trim/atrim + concat 滤镜图一次解码、一次编码完成全部剪辑
+    smart    逐段智能剪切：按关键帧索引只重编码首尾不完整的 GOP，中间流复制，帧精确且接近复制速度
+    auto     片段数 >= --filter-threshold 时使用 filter，否则使用 segment（默认）
 
 依赖:
     ffmpeg (命令行工具)
@@ -19,11 +44,24 @@ cut_plan.json 格式:
 
 import argparse
 import json
+import os
+import shutil
 import subprocess
 import sys
 import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "common"))
+from media_index import has_audio, keyframes_between, load_index
+from instrument import add_trace_argument, run_ffmpeg, setup_tracing, traced, tracer
+from encoder_profiles import (
+    CUT_PROFILE, audio_args, get_profile, load_profiles, profile_key, scale_filter, video_args,
+)
+from plan_optimizer import DEFAULT_TOLERANCE, format_report, load_markers, optimize_plan
+from render_cache import DEFAULT_MAX_MB as RENDER_CACHE_MAX_MB, RenderCache, segment_key
+
 
 def check_ffmpeg() -> bool:
     """检查 ffmpeg 是否已安装。"""
@@ -50,7 +88,107 @@ def get_video_duration(video_path: str) -> float:
         return 0.0
 
 
-def cut_segment(input_path: str, output_path: str, start: float, end: float) -> bool:
+def build_filter_graph(segments: list[dict], has_audio: bool = True) -> str:
+    """根据保留片段构建 trim/atrim + concat 滤镜图。"""
+    chains = []
+    pads = []
+    for i, seg in enumerate(segments):
+        start, end = seg["start"], seg["end"]
+        chains.append(f"[0:v]trim=start={start:.3f}:end={end:.3f},setpts=PTS-STARTPTS[v{i}]")
+        pads.append(f"[v{i}]")
+        if has_audio:
+            chains.append(f"[0:a]atrim=start={start:.3f}:end={end:.3f},asetpts=PTS-STARTPTS[a{i}]")
+            pads.append(f"[a{i}]")
+
+    outputs = "[outv][outa]" if has_audio else "[outv]"
+    chains.append(f"{''.join(pads)}concat=n={len(segments)}:v=1:a={1 if has_audio else 0}{outputs}")
+    return ";\n".join(chains)
+
+
+@traced()
+def cut_with_filter_graph(
+    input_path: str,
+    segments: list[dict],
+    output_path: str,
+    index: dict,
+    profile: dict | None = None,
+    threads: int = 0,
+) -> bool:
+    """单次解码 → trim/concat →（按档位缩放）→ 单次编码，完成整个剪辑方案。"""
+    profile = profile or get_profile(CUT_PROFILE)
+    with_audio = has_audio(index)
+    graph = build_filter_graph(segments, with_audio)
+    video_out = "[outv]"
+    if scale_filter(profile):
+        graph += f";\n[outv]{scale_filter(profile)}[outscaled]"
+        video_out = "[outscaled]"
+    with tempfile.NamedTemporaryFile(mode="w", suffix=".txt", delete=False) as f:
+        f.write(graph)
+        graph_file = f.name
+
+    cmd = [
+        "ffmpeg",
+        "-i", input_path,
+        "-filter_complex_script", graph_file,
+        "-map", video_out,
+    ]
+    if with_audio:
+        cmd += ["-map", "[outa]", *audio_args(profile)]
+    cmd += [
+        *video_args(profile, threads),
+        "-y",
+        output_path,
+    ]
+    try:
+        run_ffmpeg(cmd, name="ffmpeg:filter_graph", capture_output=True, text=True, check=True)
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"  警告: 滤镜图剪辑失败: {e.stderr[-200:]}")
+        return False
+    finally:
+        Path(graph_file).unlink(missing_ok=True)
+
+
+@traced()
+def reencode_segment(
+    input_path: str,
+    output_path: str,
+    start: float,
+    end: float,
+    threads: int = 0,
+    profile: dict | None = None,
+) -> bool:
+    """重新编码剪切单个片段（帧精确）。threads > 0 时限制编码线程数。"""
+    profile = profile or get_profile(CUT_PROFILE)
+    vf = scale_filter(profile)
+    cmd = [
+        "ffmpeg",
+        "-ss", f"{start:.3f}",
+        "-i", input_path,
+        "-t", f"{end - start:.3f}",
+        *(["-vf", vf] if vf else []),
+        *video_args(profile, threads),
+        *audio_args(profile),
+        "-y",
+        output_path,
+    ]
+    try:
+        run_ffmpeg(cmd, name="ffmpeg:reencode", capture_output=True, text=True, check=True)
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"  错误: 片段剪切失败: {e.stderr[:200]}")
+        return False
+
+
+@traced()
+def cut_segment(
+    input_path: str,
+    output_path: str,
+    start: float,
+    end: float,
+    threads: int = 0,
+    profile: dict | None = None,
+) -> bool:
     """使用 ffmpeg 剪切单个片段。"""
     duration = end - start
     cmd = [
@@ -64,30 +202,155 @@ def cut_segment(input_path: str, output_path: str, start: float, end: float) ->
         output_path,
     ]
     try:
-        subprocess.run(cmd, capture_output=True, text=True, check=True)
+        run_ffmpeg(cmd, name="ffmpeg:copy", capture_output=True, text=True, check=True)
         return True
-    except subprocess.CalledProcessError as e:
+    except subprocess.CalledProcessError:
         print(f"  警告: 快速剪切失败，尝试重新编码...")
         # 回退到重新编码模式
-        cmd_reencode = [
-            "ffmpeg",
-            "-ss", f"{start:.3f}",
-            "-i", input_path,
-            "-t", f"{duration:.3f}",
-            "-c:v", "libx264", "-preset", "fast", "-crf", "18",
-            "-c:a", "aac", "-b:a", "192k",
-            "-y",
-            output_path,
-        ]
-        try:
-            subprocess.run(cmd_reencode, capture_output=True, text=True, check=True)
-            return True
-        except subprocess.CalledProcessError as e2:
-            print(f"  错误: 片段剪切失败: {e2.stderr[:200]}")
-            return False
+        return reencode_segment(input_path, output_path, start, end, threads, profile)
+
 
+# ── 智能剪切：只重编码片段首尾不完整的 GOP ─────────────────────────────────────
 
-def concat_segments(segment_files: list[str], output_path: str) -> bool:
+# ffprobe profile 名称 → 编码器 -profile:v 参数
+_X264_PROFILES = {
+    "constrained baseline": "baseline",
+    "baseline": "baseline",
+    "main": "main",
+    "high": "high",
+    "high 10": "high10",
+    "high 4:2:2": "high422",
+    "high 4:4:4 predictive": "high444",
+}
+_SMART_ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+
+
+def _smart_encoder_args(stream_info: dict, threads: int = 0, profile: dict | None = None) -> list[str] | None:
+    """生成与源视频编码参数兼容的重编码参数（编码器随源视频，速度/质量取自档位），不支持的编码返回 None。"""
+    encoder = _SMART_ENCODERS.get(stream_info.get("codec_name"))
+    if not encoder:
+        return None
+    profile = profile or get_profile(CUT_PROFILE)
+    args = video_args({**profile, "extra": []}, threads, codec=encoder)
+    if stream_info.get("pix_fmt"):
+        args += ["-pix_fmt", stream_info["pix_fmt"]]
+    codec_profile = (stream_info.get("profile") or "").lower()
+    if encoder == "libx264" and codec_profile in _X264_PROFILES:
+        args += ["-profile:v", _X264_PROFILES[codec_profile]]
+    elif encoder == "libx265" and codec_profile in ("main", "main 10"):
+        args += ["-profile:v", codec_profile.replace(" ", "")]
+    return args
+
+
+@traced()
+def smart_cut_segment(
+    input_path: str,
+    output_path: str,
+    start: float,
+    end: float,
+    index: dict,
+    threads: int = 0,
+    profile: dict | None = None,
+) -> bool:
+    """帧精确的智能剪切：只重编码 start 之后第一个关键帧之前、end 之前最后一个关键帧之后的部分，
+    中间完整的 GOP 直接流复制。音频整体重编码一次以保证采样级对齐。
+
+    输出为 MPEG-TS（码流内带 SPS/PPS），以便不同编码来源的部分能安全拼接。
+    """
+    eps = 1e-3
+    profile = profile or get_profile(CUT_PROFILE)
+    encoder_args = _smart_encoder_args(index.get("video") or {}, threads, profile)
+    inner = keyframes_between(index, start, end, eps)
+    if encoder_args is None or len(inner) < 2:
+        # 片段内没有完整 GOP 或编码不受支持，整体重编码
+        return reencode_segment(input_path, output_path, start, end, threads, profile)
+
+    k_first, k_last = inner[0], inner[-1]
+    tmp_dir = Path(tempfile.mkdtemp(prefix="smartcut_"))
+    parts = []
+
+    def run(cmd: list[str], name: str) -> None:
+        run_ffmpeg(cmd, name=name, capture_output=True, text=True, check=True)
+
+    try:
+        if k_first - start > eps:
+            head = tmp_dir / "head.ts"
+            run(["ffmpeg", "-ss", f"{start:.6f}", "-i", input_path, "-t", f"{k_first - start:.6f}",
+                 "-an", *encoder_args, "-f", "mpegts", "-y", str(head)], "ffmpeg:smart_head")
+            parts.append(head)
+
+        middle = tmp_dir / "middle.ts"
+        run(["ffmpeg", "-ss", f"{k_first:.6f}", "-i", input_path, "-t", f"{k_last - k_first:.6f}",
+             "-an", "-c:v", "copy", "-f", "mpegts", "-y", str(middle)], "ffmpeg:smart_copy")
+        parts.append(middle)
+
+        if end - k_last > eps:
+            tail = tmp_dir / "tail.ts"
+            run(["ffmpeg", "-ss", f"{k_last:.6f}", "-i", input_path, "-t", f"{end - k_last:.6f}",
+                 "-an", *encoder_args, "-f", "mpegts", "-y", str(tail)], "ffmpeg:smart_tail")
+            parts.append(tail)
+
+        audio = tmp_dir / "audio.m4a"
+        with_audio = has_audio(index)
+        if with_audio:
+            run(["ffmpeg", "-ss", f"{start:.6f}", "-i", input_path, "-t", f"{end - start:.6f}",
+                 "-vn", *audio_args(profile), "-y", str(audio)], "ffmpeg:smart_audio")
+
+        concat_list = tmp_dir / "parts.txt"
+        concat_list.write_text("".join(f"file '{p}'\n" for p in parts))
+        cmd = ["ffmpeg", "-f", "concat", "-safe", "0", "-i", str(concat_list)]
+        if with_audio:
+            cmd += ["-i", str(audio), "-map", "0:v", "-map", "1:a"]
+        cmd += ["-c", "copy", "-f", "mpegts", "-y", output_path]
+        run(cmd, "ffmpeg:smart_concat")
+        return True
+    except subprocess.CalledProcessError:
+        print("  警告: 智能剪切失败，整体重新编码...")
+        return reencode_segment(input_path, output_path, start, end, threads, profile)
+    finally:
+        for p in tmp_dir.iterdir():
+            p.unlink(missing_ok=True)
+        tmp_dir.rmdir()
+
+
+def verify_output(output_path: str, segments: list[dict], tolerance: float = 0.1) -> bool:
+    """校验输出视频：音视频时长都应与保留片段总时长一致，且音视频之间不出现漂移。"""
+    expected = sum(s["end"] - s["start"] for s in segments)
+    cmd = [
+        "ffprobe", "-v", "quiet",
+        "-print_format", "json",
+        "-show_streams",
+        output_path,
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        streams = json.loads(result.stdout).get("streams", [])
+    except (subprocess.CalledProcessError, ValueError):
+        print("  校验失败: 无法读取输出视频信息")
+        return False
+
+    durations = {}
+    for st in streams:
+        kind = st.get("codec_type")
+        if kind in ("video", "audio") and kind not in durations and st.get("duration"):
+            durations[kind] = float(st["duration"])
+
+    ok = True
+    for kind, duration in durations.items():
+        diff = duration - expected
+        print(f"  校验 {kind}: {duration:.3f}s（预期 {expected:.3f}s，偏差 {diff:+.3f}s）")
+        if abs(diff) > tolerance:
+            ok = False
+    if "video" in durations and "audio" in durations:
+        drift = durations["audio"] - durations["video"]
+        print(f"  校验音画同步: 音频 - 视频 = {drift:+.3f}s")
+        if abs(drift) > tolerance:
+            ok = False
+    return ok
+
+
+@traced()
+def concat_segments(segment_files: list[str], output_path: str, profile: dict | None = None) -> bool:
     """使用 ffmpeg concat 拼接所有片段。"""
     # 创建 concat 列表文件
     with tempfile.NamedTemporaryFile(mode="w", suffix=".txt", delete=False) as f:
@@ -105,7 +368,7 @@ def concat_segments(segment_files: list[str], output_path: str) -> bool:
         output_path,
     ]
     try:
-        subprocess.run(cmd, capture_output=True, text=True, check=True)
+        run_ffmpeg(cmd, name="ffmpeg:concat", capture_output=True, text=True, check=True)
         return True
     except subprocess.CalledProcessError:
         # 回退到重新编码
@@ -114,13 +377,13 @@ def concat_segments(segment_files: list[str], output_path: str) -> bool:
             "-f", "concat",
             "-safe", "0",
             "-i", concat_list,
-            "-c:v", "libx264", "-preset", "fast", "-crf", "18",
-            "-c:a", "aac", "-b:a", "192k",
+            *video_args(profile or get_profile(CUT_PROFILE)),
+            *audio_args(profile or get_profile(CUT_PROFILE)),
             "-y",
             output_path,
         ]
         try:
-            subprocess.run(cmd_reencode, capture_output=True, text=True, check=True)
+            run_ffmpeg(cmd_reencode, name="ffmpeg:concat_reencode", capture_output=True, text=True, check=True)
             return True
         except subprocess.CalledProcessError as e:
             print(f"错误: 拼接失败: {e.stderr[:200]}")
@@ -129,12 +392,219 @@ def concat_segments(segment_files: list[str], output_path: str) -> bool:
         Path(concat_list).unlink(missing_ok=True)
 
 
+# segment/smart 引擎默认的每个编码器线程数，固定值保证 --jobs 不改变输出
+SEGMENT_ENCODER_THREADS = 1
+
+
+def encoder_threads_per_job(jobs: int) -> int:
+    """并行剪切时每个编码器可用的线程数，保证 jobs 个编码器合计不超过 CPU 核数。"""
+    return max(1, (os.cpu_count() or 1) // max(jobs, 1))
+
+
+def cut_by_segments(
+    input_path: str,
+    segments: list[dict],
+    output_path: str,
+    index: dict,
+    smart: bool = False,
+    jobs: int = 1,
+    threads: int = 0,
+    profile: dict | None = None,
+    cache: RenderCache | None = None,
+) -> bool:
+    """逐段剪切后拼接。smart=True 时使用关键帧感知的智能剪切；编码档位需要缩小画面时逐段整体重编码。
+
+    jobs > 1 时用有界线程池同时运行多个 ffmpeg 进程；拼接顺序始终与 segments 一致。
+    threads 为每个编码器的线程数（0 表示由 ffmpeg 自动决定）。x264 的输出与线程数有关，
+    因此只要 threads 相同，并行与串行的结果逐字节一致。
+
+    指定 cache 时每段输出按源视频哈希 + 起止时间 + 编码档位缓存，已完成的片段直接复用；
+    任一片段失败时整体失败，已完成的片段保留在缓存中，重新运行只剪切失败和改动过的片段。
+    """
+    profile = profile or get_profile(CUT_PROFILE)
+    # 编码档位要求缩小画面而源视频更高时，流复制会输出原分辨率，必须逐段整体重编码
+    height = (index.get("video") or {}).get("height")
+    rescale = bool(scale_filter(profile)) and not (height and int(height) <= int(profile["height"]))
+    if rescale:
+        smart = False
+        print(f"编码档位需要缩放到 {profile['height']}p，逐段整体重编码")
+    kind = "reencode" if rescale else "smart" if smart else "copy"
+    ext = "ts" if smart else "mp4"
+    tmp_dir = Path(tempfile.mkdtemp(prefix="cut_"))
+
+    if smart:
+        print(f"智能剪切: 源视频共 {len(index.get('keyframes', []))} 个关键帧")
+    if jobs > 1:
+        print(f"并行剪切: {jobs} 个任务，每个编码器 {threads or '自动'} 线程")
+
+    def cut_one(i: int) -> str | None:
+        seg = segments[i]
+        note = seg.get("note", "")
+        label = f"{i+1}/{len(segments)}: [{seg['start']:.1f}s - {seg['end']:.1f}s]"
+        key = segment_key(index, kind, seg["start"], seg["end"], {"profile": profile_key(profile)}) if cache else None
+        cached = cache.get(key) if cache else None
+        if cached:
+            print(f"  片段 {label} 复用缓存 {note}")
+            return str(cached)
+        if jobs == 1:
+            print(f"  剪切片段 {label} {note}")
+
+        seg_file = cache.partial_path(key, ext) if cache else tmp_dir / f"seg_{i:04d}.{ext}"
+        t0 = time.monotonic()
+        try:
+            if rescale:
+                ok = reencode_segment(input_path, str(seg_file), seg["start"], seg["end"], threads, profile)
+            elif smart:
+                ok = smart_cut_segment(input_path, str(seg_file), seg["start"], seg["end"], index, threads, profile)
+            else:
+                ok = cut_segment(input_path, str(seg_file), seg["start"], seg["end"], threads, profile)
+            elapsed = time.monotonic() - t0
+            if ok and cache:
+                seg_file = cache.put(key, seg_file, {"kind": kind, "start": seg["start"], "end": seg["end"],
+                                                     "seconds": round(elapsed, 3)})
+        finally:
+            if cache and seg_file.name.endswith(f".partial.{ext}"):
+                seg_file.unlink(missing_ok=True)
+
+        if not ok:
+            print(f"  错误: 片段 {i+1} 剪切失败")
+            return None
+        if jobs == 1:
+            print(f"    耗时 {elapsed:.1f}s")
+        else:
+            print(f"  片段 {label} 完成 耗时 {elapsed:.1f}s {note}")
+        return str(seg_file)
+
+    try:
+        if jobs > 1:
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                results = list(pool.map(cut_one, range(len(segments))))
+        else:
+            results = [cut_one(i) for i in range(len(segments))]
+        if cache:
+            print(f"片段缓存: {cache.summary()}")
+
+        failed = [i + 1 for i, f in enumerate(results) if not f]
+        if failed:
+            print(f"错误: {len(failed)} 个片段剪切失败: {', '.join(map(str, failed))}")
+            if cache:
+                print("   已完成的片段已缓存，重新运行只会剪切失败的片段")
+            return False
+
+        # 拼接
+        print(f"\n拼接 {len(results)} 个片段...")
+        ok = concat_segments(results, output_path, profile)
+        if not ok:
+            print("错误: 视频拼接失败")
+        return ok
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _stream_times(path: str) -> dict:
+    """各流的 (start_time, duration)，按 codec_type 取第一个流。"""
+    result = subprocess.run(["ffprobe", "-v", "quiet", "-print_format", "json", "-show_streams", path],
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for st in json.loads(result.stdout).get("streams", []):
+        kind = st.get("codec_type")
+        if kind in ("video", "audio") and kind not in times:
+            times[kind] = (float(st.get("start_time") or 0.0), float(st.get("duration") or 0.0))
+    return times
+
+
+def self_test(tolerance: float = 0.1) -> bool:
+    """合成素材自检：用 lavfi 生成关键帧间隔 3 秒的测试片，在关键帧之间的位置智能剪切，
+    检查每段和拼接结果的音视频时长与保留区间一致、音视频起点对齐。没有 ffmpeg 时跳过。"""
+    if not check_ffmpeg() or shutil.which("ffprobe") is None:
+        print("警告: 未找到 ffmpeg / ffprobe，跳过自检")
+        return True
+    # 关键帧在 0/3/6/9 秒：第一段不含完整 GOP（整体重编码），后两段含首尾重编码 + 中间流复制
+    segments = [{"start": 0.5, "end": 2.2}, {"start": 1.3, "end": 7.4}, {"start": 6.7, "end": 11.1}]
+    with tempfile.TemporaryDirectory(prefix="cut_selftest_") as tmp:
+        source = str(Path(tmp) / "source.mp4")
+        subprocess.run([
+            "ffmpeg", "-f", "lavfi", "-i", "testsrc2=size=320x240:rate=30:duration=12",
+            "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=48000:duration=12",
+            "-c:v", "libx264", "-preset", "ultrafast", "-g", "90", "-keyint_min", "90", "-sc_threshold", "0",
+            "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest", "-y", source,
+        ], capture_output=True, check=True)
+        index = load_index(source)
+
+        ok = True
+        for i, seg in enumerate(segments):
+            seg_file = str(Path(tmp) / f"seg_{i}.ts")
+            if not smart_cut_segment(source, seg_file, seg["start"], seg["end"], index):
+                print(f"错误: 片段 {i + 1} 智能剪切失败")
+                ok = False
+                continue
+            times = _stream_times(seg_file)
+            expected = seg["end"] - seg["start"]
+            (v_start, v_dur), (a_start, a_dur) = times["video"], times["audio"]
+            print(f"  片段 {i + 1} [{seg['start']:.1f}s - {seg['end']:.1f}s]: 视频 {v_dur:.3f}s，音频 {a_dur:.3f}s，"
+                  f"起点差 {a_start - v_start:+.3f}s（预期 {expected:.3f}s）")
+            if abs(v_dur - expected) > tolerance or abs(a_dur - expected) > tolerance \
+                    or abs(a_start - v_start) > tolerance / 2:
+                print(f"错误: 片段 {i + 1} 时长或音视频起点超出容差 {tolerance}s")
+                ok = False
+
+        output = str(Path(tmp) / "output.mp4")
+        if not cut_by_segments(source, segments, output, index, smart=True):
+            print("错误: 智能剪切拼接失败")
+            return False
+        if not verify_output(output, segments, tolerance):
+            ok = False
+        times = _stream_times(output)
+        v_start, a_start = times["video"][0], times["audio"][0]
+        if abs(a_start - v_start) > tolerance / 2:
+            print(f"错误: 拼接结果音视频起点相差 {a_start - v_start:+.3f}s")
+            ok = False
+    if ok:
+        print(f"✅ 自检通过: {len(segments)} 个不在关键帧上的片段，时长与音视频起点均在 {tolerance}s 容差内")
+    return ok
+
+
 def main():
     parser = argparse.ArgumentParser(description="根据剪辑方案执行视频剪辑")
-    parser.add_argument("--input", "-i", required=True, help="输入视频文件路径")
-    parser.add_argument("--plan", "-p", required=True, help="剪辑方案 JSON 文件路径")
-    parser.add_argument("--output", "-o", required=True, help="输出视频文件路径")
+    parser.add_argument("--input", "-i", help="输入视频文件路径")
+    parser.add_argument("--plan", "-p", help="剪辑方案 JSON 文件路径")
+    parser.add_argument("--output", "-o", help="输出视频文件路径")
+    parser.add_argument("--engine", choices=["auto", "segment", "filter", "smart"], default="auto",
+                        help="剪辑引擎 (默认: auto)")
+    parser.add_argument("--filter-threshold", type=int, default=8,
+                        help="auto 模式下片段数达到该值时使用滤镜图引擎 (默认: 8)")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="逐段剪切时并行运行的 ffmpeg 任务数 (默认: 1)")
+    parser.add_argument("--encoder-threads", type=int, default=None,
+                        help=f"每个编码器的线程数，逐段引擎默认 {SEGMENT_ENCODER_THREADS}（不随 --jobs 变化，"
+                             "并行与串行输出逐字节一致），滤镜图引擎默认由 ffmpeg 决定")
+    parser.add_argument("--profile", choices=list(load_profiles()), default=CUT_PROFILE,
+                        help=f"重编码使用的编码档位，draft 为 540p 快速预览 (默认: {CUT_PROFILE})")
+    parser.add_argument("--snap", choices=["none", "keyframe", "silence"], default="none",
+                        help="剪辑点吸附到附近的关键帧或停顿，见 common/plan_optimizer.py (默认: none)")
+    parser.add_argument("--markers", help="--snap silence 使用的停顿/尖峰标记（audio_events.py 或 vad.py --speech "
+                        "的输出），默认使用方案同目录的 markers.json")
+    parser.add_argument("--snap-tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"吸附时剪辑点最多移动的秒数 (默认: {DEFAULT_TOLERANCE})")
+    parser.add_argument("--min-gap", type=float, default=None, help="间隙不超过该秒数的相邻片段合并 (默认: 一帧)")
+    parser.add_argument("--min-length", type=float, default=None, help="短于该秒数的片段丢弃 (默认: 一帧)")
+    parser.add_argument("--save-plan", help="把实际使用的（优化后的）剪辑方案写到该路径，供字幕映射使用")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="不使用渲染片段缓存（默认逐段剪切的结果缓存在源视频旁的 .render/，重新运行只剪切改动过的片段）")
+    parser.add_argument("--cache-max-mb", type=float, default=RENDER_CACHE_MAX_MB,
+                        help=f"片段缓存大小上限 MB，剪辑结束后按最近使用淘汰 (默认: {RENDER_CACHE_MAX_MB})")
+    parser.add_argument("--verify", action="store_true",
+                        help="剪辑完成后校验输出音视频时长与保留片段总时长一致、音画同步")
+    parser.add_argument("--self-test", action="store_true",
+                        help="用 lavfi 合成的长 GOP 测试片检查智能剪切的时长和音画对齐（没有 ffmpeg 时跳过）")
+    add_trace_argument(parser)
     args = parser.parse_args()
+    setup_tracing(args.trace)
+
+    if args.self_test:
+        sys.exit(0 if self_test() else 1)
+    if not args.input or not args.plan or not args.output:
+        parser.error("需要 --input、--plan 和 --output")
 
     if not check_ffmpeg():
         print("错误: 未找到 ffmpeg，请先安装: brew install ffmpeg")
@@ -154,10 +624,44 @@ def main():
         print("错误: 剪辑方案中没有保留片段")
         sys.exit(1)
 
-    # 按 start 排序
-    segments.sort(key=lambda s: s["start"])
+    # 源视频索引（时长、关键帧、流参数），同一文件重复剪辑时无需再次 ffprobe
+    try:
+        with tracer.span("load_index"):
+            index = load_index(str(input_path))
+    except RuntimeError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+    original_duration = index["duration"]
 
-    original_duration = get_video_duration(str(input_path))
+    # 规范化剪辑方案：排序、合并相接/重叠片段、去除碎片、对齐帧，可选吸附
+    markers = None
+    if args.snap == "silence":
+        markers_path = Path(args.markers) if args.markers else Path(args.plan).parent / "markers.json"
+        try:
+            markers = load_markers(str(markers_path))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"错误: 无法读取停顿标记 {markers_path}: {e}（先运行 audio_events.py 或用 --markers 指定）")
+            sys.exit(1)
+    with tracer.span("optimize_plan", snap=args.snap):
+        segments, report = optimize_plan(segments, index, None if args.snap == "none" else args.snap, markers,
+                                         args.min_gap, args.min_length, args.snap_tolerance)
+    if not segments:
+        print("错误: 剪辑方案优化后没有剩余的保留片段")
+        sys.exit(1)
+    print("剪辑方案优化:")
+    for line in format_report(report):
+        print(f"   {line}")
+    if args.save_plan:
+        with open(args.save_plan, "w", encoding="utf-8") as f:
+            json.dump({**plan, "keep_segments": segments}, f, ensure_ascii=False, indent=2)
+        print(f"   实际使用的方案: {args.save_plan}")
+    elif args.snap != "none":
+        print("警告: 吸附移动了剪辑点，生成字幕时请使用同一份方案（加 --save-plan 保存，"
+              "或先用 common/plan_optimizer.py 改写 cut_plan.json）")
+    elif report["moved"] or report["merged"] or report["dropped"] or report["invalid"]:
+        print("警告: 规范化改变了剪辑方案，字幕映射请加 --source 原始视频按同样规则规范化"
+              f"（generate_srt.py / timeline.py --plan {args.plan} --source {args.input}），或加 --save-plan 保存实际方案")
+    print()
     total_kept = sum(s["end"] - s["start"] for s in segments)
 
     print(f"原始视频时长: {original_duration:.1f} 秒")
@@ -166,44 +670,68 @@ def main():
     print(f"剪除时长: {original_duration - total_kept:.1f} 秒")
     print()
 
-    # 逐段剪切
-    tmp_dir = tempfile.mkdtemp()
-    segment_files = []
-
-    for i, seg in enumerate(segments):
-        seg_file = f"{tmp_dir}/seg_{i:04d}.mp4"
-        note = seg.get("note", "")
-        print(f"  剪切片段 {i+1}/{len(segments)}: [{seg['start']:.1f}s - {seg['end']:.1f}s] {note}")
-
-        if not cut_segment(str(input_path), seg_file, seg["start"], seg["end"]):
-            print(f"  错误: 片段 {i+1} 剪切失败，跳过")
-            continue
-
-        segment_files.append(seg_file)
-
-    if not segment_files:
-        print("错误: 没有成功剪切的片段")
-        sys.exit(1)
-
-    # 拼接
-    print(f"\n拼接 {len(segment_files)} 个片段...")
     output_path = Path(args.output)
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    if concat_segments(segment_files, str(output_path)):
+    jobs = max(args.jobs, 1)
+    profile = get_profile(args.profile)
+    engine = args.engine
+    if scale_filter(profile):
+        # 缩小画面必须重编码，流复制的引擎无意义；滤镜图一次解码、一次编码最快
+        if engine not in ("auto", "filter"):
+            print(f"编码档位 {args.profile} 需要缩放画面，改用滤镜图引擎")
+        engine = "filter"
+    elif engine == "auto":
+        engine = "filter" if len(segments) >= args.filter_threshold else "segment"
+
+    # 逐段引擎的编码器线程数不随 --jobs 变化，并行与串行输出逐字节一致（x264 的输出取决于线程数）。
+    # 逐段重编码的多是首尾不完整的 GOP，单线程即可，吞吐靠 --jobs；滤镜图引擎只有一个编码器，由 ffmpeg 自动决定
+    if args.encoder_threads is not None:
+        threads = args.encoder_threads
+    else:
+        threads = 0 if engine == "filter" else SEGMENT_ENCODER_THREADS
+
+    cache = None
+    if not args.no_cache:
+        try:
+            cache = RenderCache.for_source(str(input_path), args.cache_max_mb)
+        except RuntimeError as e:
+            print(f"警告: {e}，不使用片段缓存")
+
+    with tracer.span("cut_video", engine=engine, profile=args.profile, segments=len(segments), media_seconds=round(total_kept, 3),
+                     bytes_in=input_path.stat().st_size) as sp:
+        if engine == "filter":
+            print(f"使用滤镜图引擎：单次编码 {len(segments)} 个片段...")
+            ok = cut_with_filter_graph(str(input_path), segments, str(output_path), index, profile, threads)
+            if not ok:
+                print("  回退到逐段剪切引擎...")
+                ok = cut_by_segments(str(input_path), segments, str(output_path), index,
+                                     jobs=jobs, threads=threads, profile=profile, cache=cache)
+        else:
+            ok = cut_by_segments(str(input_path), segments, str(output_path), index,
+                                 smart=engine == "smart", jobs=jobs, threads=threads, profile=profile,
+                                 cache=cache)
+        if ok:
+            sp.add(bytes_out=output_path.stat().st_size)
+        if cache:
+            sp.add(cache_hits=cache.hits, cache_misses=cache.misses)
+            cache.prune()
+
+    if ok and args.verify:
+        print("\n校验输出...")
+        if not verify_output(str(output_path), segments):
+            print("错误: 输出校验未通过")
+            sys.exit(1)
+
+    if ok:
         final_duration = get_video_duration(str(output_path))
         print(f"\n✅ 剪辑完成: {output_path}")
         print(f"   最终时长: {final_duration:.1f} 秒")
         print(f"   减少: {original_duration - final_duration:.1f} 秒 ({(1 - final_duration/original_duration)*100:.1f}%)")
     else:
-        print("错误: 视频拼接失败")
+        print("错误: 视频剪辑失败")
         sys.exit(1)
 
-    # 清理临时文件
-    for f in segment_files:
-        Path(f).unlink(missing_ok=True)
-    Path(tmp_dir).rmdir()
-
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+本地 speaches 替身服务：实现 /v1/audio/transcriptions 的 verbose_json 响应，不加载任何模型，
+用于在没有 GPU / Docker 的环境下验证批量转录队列、重试和多端点调度。
+
+    - 按上传音频时长模拟处理耗时（--latency + 时长 / --speed）
+    - --fail-rate 按概率返回 503，--max-concurrent 超出并发上限时返回 503（模拟过载）
+    - 返回的段落每 5 秒一段，请求了词级时间戳时附带 words
+    - 支持 Content-Length 与分块传输编码（transcribe.py --stream）两种上传方式
+
+用法:
+    python3 mock_speaches.py --port 8001 --latency 0.5 --fail-rate 0.1 --max-concurrent 2
+    python3 transcribe_batch.py a.mp4 b.mp4 --api-url http://localhost:8001
+
+也可在脚本中启动: server = start_server(8001, latency=0.2)；用完后 server.shutdown()。port 为 0 时使用空闲端口。
+transcribe_batch.py --self-test 用它验证批量转录的重试和并发上限。
+"""
+
+import argparse
+import io
+import json
+import random
+import threading
+import time
+import wave
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SEGMENT_SECONDS = 5.0
+
+
+def _audio_duration(data: bytes) -> float:
+    """WAV 按文件头计算时长，其它格式按 16kHz 单声道 16bit 估算。"""
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wav:
+            return wav.getnframes() / wav.getframerate()
+    except (wave.Error, EOFError):
+        return len(data) / 32000
+
+
+def fake_result(duration: float, words: bool = False) -> dict:
+    """生成与 speaches verbose_json 结构一致的模拟转录结果。"""
+    segments = []
+    all_words = []
+    t = 0.0
+    i = 0
+    while t < duration:
+        end = min(t + SEGMENT_SECONDS, duration)
+        text = f"模拟段落{i}"
+        segments.append({"id": i, "start": round(t, 2), "end": round(end, 2), "text": text})
+        if words:
+            half = (t + end) / 2
+            all_words += [{"start": round(t, 2), "end": round(half, 2), "word": "模拟"},
+                          {"start": round(half, 2), "end": round(end, 2), "word": f"段落{i}"}]
+        t = end
+        i += 1
+    result = {
+        "language": "zh",
+        "duration": round(duration, 3),
+        "text": "".join(s["text"] for s in segments),
+        "segments": segments,
+    }
+    if words:
+        result["words"] = all_words
+    return result
+
+
+class MockState:
+    """服务端统计与并发计数（多个请求线程共享）。"""
+
+    def __init__(self, latency: float, speed: float, fail_rate: float, max_concurrent: int, seed: int | None):
+        self.latency = latency
+        self.speed = speed
+        self.fail_rate = fail_rate
+        self.max_concurrent = max_concurrent
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.requests = 0
+        self.rejected = 0
+        self.busy = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"requests": self.requests, "rejected": self.rejected, "busy": self.busy,
+                    "peak_concurrency": self.peak}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 支持 keep-alive
+    state: MockState = None
+    verbose = False
+
+    def log_message(self, fmt, *args):
+        if self.verbose:
+            super().log_message(fmt, *args)
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b"".join(chunks)
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/v1/models":
+            self._send_json(200, {"data": [{"id": "large-v3", "object": "model"}]})
+        elif self.path == "/stats":
+            self._send_json(200, self.state.stats())
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/v1/audio/transcriptions":
+            self._send_json(404, {"error": "not found"})
+            return
+        body = self._read_body()
+        state = self.state
+        with state.lock:
+            state.requests += 1
+            overloaded = state.max_concurrent and state.active >= state.max_concurrent
+            injected = state.rng.random() < state.fail_rate
+            if overloaded or injected:
+                state.rejected += 1
+                state.busy += bool(overloaded)
+            else:
+                state.active += 1
+                state.peak = max(state.peak, state.active)
+        if overloaded or injected:
+            self._send_json(503, {"error": "server busy" if overloaded else "injected failure"})
+            return
+
+        try:
+            message = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {self.headers.get('Content-Type', '')}\r\n\r\n".encode() + body)
+            fields, audio = {}, b""
+            for part in message.iter_parts():
+                name = part.get_param("name", header="content-disposition")
+                if part.get_filename():
+                    audio = part.get_payload(decode=True) or b""
+                else:
+                    fields.setdefault(name, []).append(part.get_content().strip())
+            duration = _audio_duration(audio)
+            time.sleep(state.latency + duration / state.speed)
+            words = "word" in fields.get("timestamp_granularities[]", [])
+            self._send_json(200, fake_result(duration, words))
+        finally:
+            with state.lock:
+                state.active -= 1
+
+
+def start_server(
+    port: int = 8001,
+    host: str = "127.0.0.1",
+    latency: float = 0.2,
+    speed: float = 200.0,
+    fail_rate: float = 0.0,
+    max_concurrent: int = 0,
+    seed: int | None = None,
+    verbose: bool = False,
+) -> ThreadingHTTPServer:
+    """在后台线程启动替身服务并返回 server 对象（server.mock_state 为统计信息）。"""
+    state = MockState(latency, speed, fail_rate, max_concurrent, seed)
+    handler = type("Handler", (MockHandler,), {"state": state, "verbose": verbose})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.mock_state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 speaches 替身服务（模拟转录 API）")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址 (默认: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8001, help="监听端口 (默认: 8001)")
+    parser.add_argument("--latency", type=float, default=0.2, help="每个请求的固定处理耗时（秒）(默认: 0.2)")
+    parser.add_argument("--speed", type=float, default=200.0,
+                        help="模拟的转录速度（音频秒数 / 处理秒数）(默认: 200)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="随机返回 503 的概率 (默认: 0)")
+    parser.add_argument("--max-concurrent", type=int, default=0,
+                        help="并发请求上限，超出时返回 503，0 表示不限 (默认: 0)")
+    parser.add_argument("--seed", type=int, default=None, help="故障注入的随机种子")
+    parser.add_argument("--verbose", action="store_true", help="打印每个请求的访问日志")
+    args = parser.parse_args()
+
+    server = start_server(args.port, args.host, args.latency, args.speed, args.fail_rate,
+                          args.max_concurrent, args.seed, args.verbose)
+    print(f"✅ speaches 替身服务已启动: http://{args.host}:{args.port}（Ctrl+C 停止）")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        stats = server.mock_state.stats()
+        print(f"\n已停止: 请求 {stats['requests']} 个，拒绝 {stats['rejected']} 个（其中超出并发上限 {stats['busy']} 个），"
+              f"峰值并发 {stats['peak_concurrency']}")
+
+
+if __name__ == "__main__":
+    main()
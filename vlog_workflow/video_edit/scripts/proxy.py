@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+低分辨率代理：为源视频生成一次 540p 短 GOP（或全帧内）代理文件，审阅剪辑方案时从代理渲染预览，几秒内出片。
+
+    - 代理用 draft 编码档位（540p、ultrafast）编码，关键帧间隔 --gop 秒（默认 0.5），--intra 时每帧都是关键帧；
+      帧率和时间轴与源视频一致，cut_plan.json 的时间戳可直接用于代理
+    - 代理缓存在项目目录的 .proxy/ 下（目录不可写时改存 ~/.cache/vlog_workflow/proxy/），
+      按源文件大小 + mtime、内容抽样哈希和编码参数校验，源视频不变时不会重新生成
+    - 预览：剪辑方案先做与 cut_video.py 相同的规范化，再在代理上智能剪切（关键帧密集，几乎全部流复制）；
+      指定 --transcript 时用合并模式一次编码出带字幕的预览
+    - 成片仍用同一份方案对源视频执行 cut_video.py / burn_subtitle.py
+
+用法:
+    python3 proxy.py --input raw.mp4                                            # 生成（或检查）代理
+    python3 proxy.py --input raw.mp4 --plan cut_plan.json --output preview.mp4
+    python3 proxy.py --input raw.mp4 --plan cut_plan.json --transcript transcript.json --output preview.mp4
+
+依赖:
+    ffmpeg (命令行工具)
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "common"))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "subtitle" / "scripts"))
+from media_index import frame_rate, load_index, quick_hash
+from instrument import add_trace_argument, run_ffmpeg, setup_tracing, traced, tracer
+from encoder_profiles import audio_args, get_profile, profile_key, scale_filter, video_args
+from plan_optimizer import format_report, optimize_plan
+from cut_video import check_ffmpeg, cut_by_segments, cut_with_filter_graph
+
+PROXY_PROFILE = "draft"
+PROXY_VERSION = 1
+FALLBACK_DIR = Path.home() / ".cache" / "vlog_workflow" / "proxy"
+
+
+def _candidates(source: str) -> list[Path]:
+    """代理文件的候选位置：项目目录 .proxy/，不可写时退到缓存目录。"""
+    p = Path(source).resolve()
+    digest = hashlib.sha256(str(p).encode()).hexdigest()[:16]
+    return [p.parent / ".proxy" / f"{p.name}.proxy.mp4", FALLBACK_DIR / f"{digest}.proxy.mp4"]
+
+
+def _meta_path(proxy: Path) -> Path:
+    return proxy.with_suffix(".json")
+
+
+def proxy_params(gop: float, profile: dict) -> dict:
+    """影响代理内容的参数（任一变化都重新生成）。"""
+    return {"version": PROXY_VERSION, "gop": gop, "profile": profile_key(profile)}
+
+
+def find_proxy(source: str, params: dict) -> Path | None:
+    """返回仍然有效的代理文件，没有时返回 None。"""
+    st = os.stat(source)
+    for proxy in _candidates(source):
+        try:
+            with open(_meta_path(proxy), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+        src = meta.get("source", {})
+        if not proxy.exists() or meta.get("params") != params or src.get("size") != st.st_size:
+            continue
+        if src.get("mtime_ns") == st.st_mtime_ns:
+            return proxy
+        # mtime 变化（例如被复制/touch），用内容哈希确认是否同一文件
+        if src.get("quick_hash") == quick_hash(source):
+            src["mtime_ns"] = st.st_mtime_ns
+            _meta_path(proxy).write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+            return proxy
+    return None
+
+
+@traced()
+def build_proxy(source: str, gop: float = 0.5, profile: dict | None = None) -> Path | None:
+    """用 ffmpeg 生成代理文件（先写临时文件，完成后原子替换），返回代理路径。"""
+    profile = profile or get_profile(PROXY_PROFILE)
+    index = load_index(source)
+    fps = frame_rate(index) or 30.0
+    keyint = 1 if gop <= 0 else max(int(round(gop * fps)), 1)
+    st = os.stat(source)
+    meta = {
+        "source": {"path": str(Path(source).resolve()), "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                   "quick_hash": quick_hash(source)},
+        "params": proxy_params(gop, profile),
+    }
+
+    for proxy in _candidates(source):
+        try:
+            proxy.parent.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            continue
+        tmp = proxy.with_name(proxy.name + ".tmp.mp4")
+        cmd = ["ffmpeg", "-i", source, "-map", "0:v:0", "-map", "0:a:0?"]
+        if scale_filter(profile):
+            cmd += ["-vf", scale_filter(profile)]
+        cmd += [
+            *video_args(profile),
+            "-g", str(keyint), "-keyint_min", str(keyint), "-sc_threshold", "0",
+            "-pix_fmt", "yuv420p",
+            *audio_args(profile),
+            "-movflags", "+faststart",
+            "-y", str(tmp),
+        ]
+        try:
+            result = run_ffmpeg(cmd, name="ffmpeg:proxy", capture_output=True, text=True)
+        except OSError as e:
+            print(f"错误: 无法运行 ffmpeg: {e}")
+            return None
+        if result.returncode != 0:
+            tmp.unlink(missing_ok=True)
+            if "Permission denied" in result.stderr:
+                continue
+            print(f"错误: 代理生成失败: {result.stderr[-500:]}")
+            return None
+        os.replace(tmp, proxy)
+        _meta_path(proxy).write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        return proxy
+    print("错误: 没有可写的代理目录")
+    return None
+
+
+def ensure_proxy(source: str, gop: float = 0.5, intra: bool = False, rebuild: bool = False) -> Path | None:
+    """返回有效的代理文件，不存在或已失效时生成。"""
+    profile = get_profile(PROXY_PROFILE)
+    gop = 0.0 if intra else gop
+    proxy = None if rebuild else find_proxy(source, proxy_params(gop, profile))
+    if proxy:
+        return proxy
+    print(f"生成代理: {Path(source).name}（{'全帧内' if gop <= 0 else f'关键帧间隔 {gop:g} 秒'}，"
+          f"编码档位 {PROXY_PROFILE}）...")
+    t0 = time.monotonic()
+    proxy = build_proxy(source, gop, profile)
+    if proxy:
+        print(f"   耗时 {time.monotonic() - t0:.1f}s，{proxy.stat().st_size / 1e6:.1f}MB: {proxy}")
+    return proxy
+
+
+@traced()
+def render_preview(
+    source: str,
+    keep_segments: list[dict],
+    output_path: str,
+    transcript_segments: list[dict] | None = None,
+    engine: str = "smart",
+    jobs: int = 1,
+    max_chars: int = 20,
+    gop: float = 0.5,
+    intra: bool = False,
+) -> bool:
+    """从代理渲染剪辑方案的预览（可带字幕）。方案按源视频规范化，与成片的剪辑点一致。"""
+    segments, report = optimize_plan(keep_segments, load_index(source))
+    for line in format_report(report):
+        print(f"   {line}")
+    proxy = ensure_proxy(source, gop, intra)
+    if not proxy or not segments:
+        return False
+
+    profile = get_profile(PROXY_PROFILE)
+    if transcript_segments is not None:
+        from burn_subtitle import burn_subtitle_fused
+        print(f"从代理渲染带字幕预览: {len(segments)} 个片段")
+        return burn_subtitle_fused(str(proxy), segments, transcript_segments, output_path,
+                                   max_chars=max_chars, profile=profile)
+
+    proxy_index = load_index(str(proxy))
+    print(f"从代理渲染预览: {len(segments)} 个片段（{engine}）")
+    if engine == "filter":
+        return cut_with_filter_graph(str(proxy), segments, output_path, proxy_index, profile)
+    return cut_by_segments(str(proxy), segments, output_path, proxy_index,
+                           smart=engine == "smart", jobs=jobs, profile=profile)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成低分辨率代理，并从代理快速渲染剪辑方案预览")
+    parser.add_argument("--input", "-i", required=True, help="源视频（raw.mp4）")
+    parser.add_argument("--plan", "-p", help="剪辑方案 JSON；不指定时只生成代理")
+    parser.add_argument("--output", "-o", help="预览视频输出路径")
+    parser.add_argument("--transcript", "-t", help="原始视频的转录 JSON，指定时预览带字幕")
+    parser.add_argument("--engine", choices=["smart", "segment", "filter"], default="smart",
+                        help="预览的剪辑引擎 (默认: smart，代理关键帧密集，几乎全部流复制)")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="逐段剪切时并行的 ffmpeg 任务数 (默认: 1)")
+    parser.add_argument("--max-chars", type=int, default=20, help="预览字幕每行最大字数 (默认: 20)")
+    parser.add_argument("--gop", type=float, default=0.5, help="代理关键帧间隔（秒）(默认: 0.5)")
+    parser.add_argument("--intra", action="store_true", help="代理每帧都是关键帧（体积更大，剪切全部流复制）")
+    parser.add_argument("--rebuild", action="store_true", help="忽略已有代理，重新生成")
+    add_trace_argument(parser)
+    args = parser.parse_args()
+    setup_tracing(args.trace)
+
+    if args.plan and not args.output:
+        parser.error("渲染预览需要 --output")
+    if args.transcript and not args.plan:
+        parser.error("--transcript 需要与 --plan 一起使用")
+    if not check_ffmpeg():
+        print("错误: 未找到 ffmpeg，请先安装: brew install ffmpeg")
+        sys.exit(1)
+    if not Path(args.input).exists():
+        print(f"错误: 输入视频不存在: {args.input}")
+        sys.exit(1)
+
+    try:
+        if not args.plan:
+            proxy = ensure_proxy(args.input, args.gop, args.intra, args.rebuild)
+            if not proxy:
+                sys.exit(1)
+            print(f"✅ 代理: {proxy}")
+            return
+        if args.rebuild and not ensure_proxy(args.input, args.gop, args.intra, rebuild=True):
+            sys.exit(1)
+
+        with open(args.plan, "r", encoding="utf-8") as f:
+            keep_segments = json.load(f).get("keep_segments", [])
+        if not keep_segments:
+            print("错误: 剪辑方案中没有保留片段")
+            sys.exit(1)
+        transcript_segments = None
+        if args.transcript:
+            with open(args.transcript, "r", encoding="utf-8") as f:
+                transcript_segments = json.load(f).get("segments", [])
+
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        t0 = time.monotonic()
+        with tracer.span("preview", segments=len(keep_segments), subtitles=bool(transcript_segments)):
+            ok = render_preview(args.input, keep_segments, args.output, transcript_segments, args.engine,
+                                max(args.jobs, 1), args.max_chars, args.gop, args.intra)
+    except RuntimeError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+
+    if not ok:
+        print("错误: 预览渲染失败")
+        sys.exit(1)
+    print(f"\n✅ 预览已生成（{time.monotonic() - t0:.1f}s）: {args.output}")
+    print("   确认后用同一份方案对源视频执行 cut_video.py / burn_subtitle.py 生成成片")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,22 @@
 用法:
     python3 transcribe.py --input video.mp4 --output transcript.json [--api-url http://localhost:8000]
 
+    # 分块并行转录（长视频推荐）：每块约 300 秒，块间重叠 2 秒，4 个并发请求
+    python3 transcribe.py --input video.mp4 --output transcript.json --chunk-seconds 300 --workers 4
+
+    # 流式模式：ffmpeg 输出直接作为上传请求体，不写临时 WAV（可选 FLAC/Opus 压缩）
+    python3 transcribe.py --input video.mp4 --output transcript.json --stream --stream-format flac
+
+    # 词级时间戳：字幕按真实词边界断行和定时
+    python3 transcribe.py --input video.mp4 --output transcript.json --word-timestamps
+
+    # 语音活动检测：只上传有声部分，跳过开头空白和长停顿，时间戳自动映射回原始时间轴（需要 numpy）
+    python3 transcribe.py --input video.mp4 --output transcript.json --vad
+
+    # 转录结果默认缓存在 ~/.cache/vlog_workflow/transcripts，源文件未变化时直接复用
+    python3 transcribe.py --input video.mp4 --output transcript.json --no-cache
+    python3 transcript_cache.py --stats
+
 依赖:
     pip install requests
 
@@ -13,10 +29,17 @@
 """
 
 import argparse
+import hashlib
 import json
+import os
+import shutil
 import subprocess
 import sys
 import tempfile
+import uuid
+import wave
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 try:
@@ -25,7 +48,29 @@ except ImportError:
     print("错误: 请先安装 requests: pip install requests")
     sys.exit(1)
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "common"))
+from instrument import add_trace_argument, run_ffmpeg, setup_tracing, traced, tracer
+from transcript_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_MB, TranscriptCache, hash_pcm, make_key
+
+# 语音识别请求参数（同时作为转录缓存键的一部分）
+TRANSCRIBE_PARAMS = {
+    "model": "large-v3",
+    "language": "zh",
+    "timestamp_granularities[]": "segment",
+}
+
+# 分块拼接时段落结尾允许越过块归属区间的秒数（识别时间戳的抖动），超出则交给下一块
+STITCH_TOLERANCE = 0.3
 
+
+def transcribe_params(word_timestamps: bool = False) -> dict:
+    """返回语音识别请求参数；word_timestamps=True 时同时请求词级时间戳。"""
+    if not word_timestamps:
+        return TRANSCRIBE_PARAMS
+    return {**TRANSCRIBE_PARAMS, "timestamp_granularities[]": ["segment", "word"]}
+
+
+@traced()
 def extract_audio(video_path: str, audio_path: str) -> bool:
     """使用 ffmpeg 从视频中提取音频。"""
     cmd = [
@@ -38,7 +83,7 @@ def extract_audio(video_path: str, audio_path: str) -> bool:
         audio_path,
     ]
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        run_ffmpeg(cmd, name="ffmpeg:extract_audio", capture_output=True, text=True, check=True)
         return True
     except subprocess.CalledProcessError as e:
         print(f"错误: ffmpeg 提取音频失败: {e.stderr}")
@@ -48,71 +93,439 @@ def extract_audio(video_path: str, audio_path: str) -> bool:
         return False
 
 
-def transcribe_audio(audio_path: str, api_url: str) -> dict:
-    """调用 speaches OpenAI 兼容 API 进行语音识别。"""
+# 流式上传支持的中间格式: (ffmpeg 参数, 文件后缀, MIME 类型)
+STREAM_FORMATS = {
+    "wav": (["-acodec", "pcm_s16le", "-f", "wav"], ".wav", "audio/wav"),
+    "flac": (["-acodec", "flac", "-f", "flac"], ".flac", "audio/flac"),
+    "opus": (["-acodec", "libopus", "-b:a", "32k", "-f", "ogg"], ".ogg", "audio/ogg"),
+}
+
+
+def _multipart_stream(source, filename: str, mime: str, fields: dict, hasher=None):
+    """生成 multipart/form-data 请求体：先输出表单字段，再边读边输出文件内容。
+
+    返回 (content_type, 生成器)。配合 requests 的 data=生成器 使用分块传输编码上传。
+    """
+    boundary = uuid.uuid4().hex
+    content_type = f"multipart/form-data; boundary={boundary}"
+
+    def body():
+        for name, values in fields.items():
+            for value in values if isinstance(values, list) else [values]:
+                yield (f"--{boundary}\r\n"
+                       f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                       f"{value}\r\n").encode()
+        yield (f"--{boundary}\r\n"
+               f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+               f"Content-Type: {mime}\r\n\r\n").encode()
+        for block in iter(lambda: source.read(1 << 16), b""):
+            if hasher is not None:
+                hasher.update(block)
+            yield block
+        yield f"\r\n--{boundary}--\r\n".encode()
+
+    return content_type, body()
+
+
+@traced()
+def transcribe_stream(
+    input_path: str,
+    api_url: str,
+    fmt: str = "wav",
+    params: dict = TRANSCRIBE_PARAMS,
+) -> tuple[dict, str]:
+    """流式转录：ffmpeg 解码输出的音频经管道直接作为上传请求体，提取与上传同时进行。
+
+    返回 (API 原始结果, 上传音频流的哈希)，哈希用于转录缓存。
+    """
+    codec_args, suffix, mime = STREAM_FORMATS[fmt]
+    cmd = [
+        "ffmpeg", "-loglevel", "error",
+        "-i", input_path,
+        "-vn",
+        "-ar", "16000",
+        "-ac", "1",
+        *codec_args,
+        "pipe:1",
+    ]
     url = f"{api_url}/v1/audio/transcriptions"
+    print(f"正在流式调用语音识别 API: {url} (格式: {fmt})")
+    print("这可能需要几分钟，取决于视频长度...")
 
-    with open(audio_path, "rb") as f:
-        files = {"file": (Path(audio_path).name, f, "audio/wav")}
-        data = {
-            "model": "large-v3",
-            "language": "zh",
-            "response_format": "verbose_json",
-            "timestamp_granularities[]": "segment",
-        }
-        print(f"正在调用语音识别 API: {url}")
-        print("这可能需要几分钟，取决于视频长度...")
-
-        try:
-            response = requests.post(url, files=files, data=data, timeout=3600)
-            response.raise_for_status()
-            return response.json()
-        except requests.ConnectionError:
-            print(f"错误: 无法连接到 speaches 服务 ({api_url})")
-            print("请确保 Docker 服务已启动: docker compose up -d")
-            sys.exit(1)
-        except requests.HTTPError as e:
-            print(f"错误: API 返回错误: {e.response.status_code} - {e.response.text}")
+    stderr_file = tempfile.TemporaryFile()
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file)
+    except FileNotFoundError:
+        print("错误: 未找到 ffmpeg，请先安装: brew install ffmpeg")
+        sys.exit(1)
+
+    hasher = hashlib.sha256()
+    fields = {**params, "response_format": "verbose_json"}
+    content_type, body = _multipart_stream(proc.stdout, f"audio{suffix}", mime, fields, hasher)
+    try:
+        with tracer.span("http:transcribe_stream", "http") as sp:
+            response = requests.post(url, data=body, headers={"Content-Type": content_type}, timeout=3600)
+            sp.add(status=response.status_code, bytes_in=len(response.content))
+        proc.wait()
+        if proc.returncode != 0:
+            stderr_file.seek(0)
+            print(f"错误: ffmpeg 提取音频失败: {stderr_file.read().decode(errors='replace')}")
             sys.exit(1)
+        response.raise_for_status()
+        return response.json(), hasher.hexdigest()
+    except requests.ConnectionError:
+        print(f"错误: 无法连接到 speaches 服务 ({api_url})")
+        print("请确保 Docker 服务已启动: docker compose up -d")
+        sys.exit(1)
+    except requests.HTTPError as e:
+        print(f"错误: API 返回错误: {e.response.status_code} - {e.response.text}")
+        sys.exit(1)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        stderr_file.close()
+
+
+def _post_transcription(
+    audio_path: str,
+    api_url: str,
+    params: dict = TRANSCRIBE_PARAMS,
+    session: "requests.Session | None" = None,
+    timeout: float = 3600,
+) -> dict:
+    """上传单个音频文件到 speaches，失败时抛出 requests 异常。传入 session 时复用其连接池。"""
+    url = f"{api_url}/v1/audio/transcriptions"
+
+    with open(audio_path, "rb") as f, tracer.span("http:transcribe", "http", url=url) as sp:
+        files = {"file": (Path(audio_path).name, f, "audio/wav")}
+        data = {**params, "response_format": "verbose_json"}
+        sp.add(bytes_out=os.fstat(f.fileno()).st_size)
+        response = (session or requests).post(url, files=files, data=data, timeout=timeout)
+        sp.add(status=response.status_code, bytes_in=len(response.content))
+        response.raise_for_status()
+        return response.json()
+
+
+@traced()
+def transcribe_audio(audio_path: str, api_url: str, params: dict = TRANSCRIBE_PARAMS) -> dict:
+    """调用 speaches OpenAI 兼容 API 进行语音识别。"""
+    url = f"{api_url}/v1/audio/transcriptions"
+    print(f"正在调用语音识别 API: {url}")
+    print("这可能需要几分钟，取决于视频长度...")
+
+    try:
+        return _post_transcription(audio_path, api_url, params)
+    except requests.ConnectionError:
+        print(f"错误: 无法连接到 speaches 服务 ({api_url})")
+        print("请确保 Docker 服务已启动: docker compose up -d")
+        sys.exit(1)
+    except requests.HTTPError as e:
+        print(f"错误: API 返回错误: {e.response.status_code} - {e.response.text}")
+        sys.exit(1)
+
+
+def _frame_energies(wav: wave.Wave_read, start_frame: int, n_frames: int, window: int) -> list[float]:
+    """计算 [start_frame, start_frame + n_frames) 内每个窗口的平均能量（16-bit PCM）。"""
+    wav.setpos(start_frame)
+    samples = array("h", wav.readframes(n_frames))
+    if sys.byteorder == "big":
+        samples.byteswap()
+    energies = []
+    for i in range(0, len(samples), window):
+        block = samples[i : i + window]
+        energies.append(sum(x * x for x in block) / max(len(block), 1))
+    return energies
+
+
+def plan_chunks(wav_path: str, chunk_seconds: float, snap_seconds: float = 5.0) -> list[tuple[float, float]]:
+    """将音频划分为约 chunk_seconds 长的区间，边界吸附到附近能量最低（最安静）的位置。
+
+    返回不含重叠的 (start, end) 列表，首尾相接覆盖整段音频。
+    """
+    with wave.open(wav_path, "rb") as wav:
+        rate = wav.getframerate()
+        total = wav.getnframes()
+        duration = total / rate
+        if wav.getsampwidth() != 2 or wav.getnchannels() != 1 or duration <= chunk_seconds:
+            return [(0.0, duration)]
+
+        window = max(int(rate * 0.05), 1)  # 50ms 窗口
+        bounds = [0.0]
+        target = chunk_seconds
+        while target < duration - snap_seconds:
+            lo = max(target - snap_seconds, bounds[-1] + snap_seconds)
+            hi = min(target + snap_seconds, duration)
+            lo_frame = int(lo * rate)
+            energies = _frame_energies(wav, lo_frame, int(hi * rate) - lo_frame, window)
+            quietest = min(range(len(energies)), key=energies.__getitem__) if energies else 0
+            cut = (lo_frame + quietest * window + window // 2) / rate
+            bounds.append(cut)
+            target = cut + chunk_seconds
+
+    bounds.append(duration)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def write_chunk(wav_path: str, out_path: str, start: float, end: float) -> None:
+    """从 16kHz 单声道 WAV 中截取 [start, end) 写入新的 WAV 文件。"""
+    with wave.open(wav_path, "rb") as src:
+        rate = src.getframerate()
+        first = int(start * rate)
+        last = min(int(end * rate), src.getnframes())
+        src.setpos(first)
+        frames = src.readframes(max(last - first, 0))
+        with wave.open(out_path, "wb") as dst:
+            dst.setparams(src.getparams())
+            dst.writeframes(frames)
+
+
+@traced()
+def transcribe_audio_chunked(
+    audio_path: str,
+    api_url: str,
+    chunk_seconds: float = 300.0,
+    overlap: float = 2.0,
+    workers: int = 4,
+    retries: int = 2,
+    params: dict = TRANSCRIBE_PARAMS,
+) -> dict:
+    """分块并行转录：按静音点切块、块间重叠 overlap 秒，使用有界线程池并发上传。
+
+    返回值中的 chunks 字段交由 format_transcript() 拼接为统一时间轴。
+    """
+    bounds = plan_chunks(audio_path, chunk_seconds)
+    with wave.open(audio_path, "rb") as wav:
+        duration = wav.getnframes() / wav.getframerate()
+
+    tmp_dir = tempfile.mkdtemp(prefix="transcribe_chunks_")
+    jobs = []
+    for i, (keep_start, keep_end) in enumerate(bounds):
+        offset = max(keep_start - overlap, 0.0)
+        chunk_end = min(keep_end + overlap, duration)
+        chunk_path = f"{tmp_dir}/chunk_{i:04d}.wav"
+        write_chunk(audio_path, chunk_path, offset, chunk_end)
+        jobs.append({"index": i, "path": chunk_path, "offset": offset,
+                     "keep_start": keep_start, "keep_end": keep_end})
+
+    url = f"{api_url}/v1/audio/transcriptions"
+    print(f"正在调用语音识别 API: {url}")
+    print(f"分块转录: {len(jobs)} 块，每块约 {chunk_seconds:.0f} 秒，重叠 {overlap:.1f} 秒，并发 {workers}")
+
+    def run(job: dict) -> dict:
+        for attempt in range(retries + 1):
+            try:
+                result = _post_transcription(job["path"], api_url, params)
+                print(f"  块 {job['index'] + 1}/{len(jobs)} 完成 "
+                      f"[{job['keep_start']:.1f}s - {job['keep_end']:.1f}s]")
+                return result
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                if attempt == retries:
+                    raise
+                print(f"  警告: 块 {job['index'] + 1} 失败，重试 ({attempt + 1}/{retries}): {e}")
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+            results = list(pool.map(run, jobs))
+    except requests.ConnectionError:
+        print(f"错误: 无法连接到 speaches 服务 ({api_url})")
+        print("请确保 Docker 服务已启动: docker compose up -d")
+        sys.exit(1)
+    except requests.HTTPError as e:
+        print(f"错误: API 返回错误: {e.response.status_code} - {e.response.text}")
+        sys.exit(1)
+    except requests.Timeout:
+        print("错误: 语音识别请求超时")
+        sys.exit(1)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return {
+        "language": next((r.get("language") for r in results if r.get("language")), "zh"),
+        "duration": duration,
+        "chunks": [
+            {"offset": job["offset"], "keep_start": job["keep_start"],
+             "keep_end": job["keep_end"], "result": result}
+            for job, result in zip(jobs, results)
+        ],
+    }
+
+
+def stitch_chunks(chunks: list[dict]) -> list[dict]:
+    """将各块的 segments 平移到原始时间轴，并去掉重叠区内的重复段落。
+
+    每块只接收起点落在本块归属区间（keep_end 之前）的段落；
+    结尾越过 keep_end 超过 STITCH_TOLERANCE、而下一块的音频完整覆盖其起点的段落交给下一块，
+    避免本块在边缘被截断的版本与下一块重新完整识别的版本同时输出；
+    中点早于已输出段落结尾的段落视为上一块已识别过的重复内容而丢弃。
+    """
+    segments = []
+    emitted_end = 0.0
+    for n, chunk in enumerate(chunks):
+        offset = chunk["offset"]
+        next_offset = chunks[n + 1]["offset"] if n + 1 < len(chunks) else None
+        for seg in attach_words(chunk["result"]):
+            start = seg.get("start", 0) + offset
+            end = seg.get("end", 0) + offset
+            if start >= chunk["keep_end"] or (start + end) / 2 < emitted_end:
+                continue
+            if next_offset is not None and end > chunk["keep_end"] + STITCH_TOLERANCE and start >= next_offset:
+                continue
+            if segments and start < emitted_end:
+                # 与上一块末尾的微小时间交叠，收紧上一段的结束时间
+                segments[-1]["end"] = start
+            shifted = {**seg, "start": start, "end": end}
+            if "words" in seg:
+                shifted["words"] = [{**w, "start": w.get("start", 0) + offset, "end": w.get("end", 0) + offset}
+                                    for w in seg["words"]]
+            segments.append(shifted)
+            emitted_end = end
+    return segments
+
+
+def attach_words(raw_result: dict) -> list[dict]:
+    """返回带 words 的 segments。
+
+    OpenAI 兼容接口通常把词级时间戳放在顶层 words 中，这里按时间顺序线性归并到各段落；
+    段落自身已带 words 时直接使用。
+    """
+    segments = raw_result.get("segments", [])
+    words = raw_result.get("words")
+    if not words or any("words" in seg for seg in segments):
+        return segments
+
+    result = []
+    i = 0
+    for n, seg in enumerate(segments):
+        is_last = n == len(segments) - 1
+        seg_words = []
+        while i < len(words):
+            w = words[i]
+            mid = (w.get("start", 0) + w.get("end", 0)) / 2
+            if not is_last and mid >= seg.get("end", 0):
+                break
+            seg_words.append(w)
+            i += 1
+        result.append({**seg, "words": seg_words})
+    return result
 
 
 def format_transcript(raw_result: dict) -> dict:
-    """格式化转录结果为统一的 JSON 结构。"""
+    """格式化转录结果为统一的 JSON 结构。
+
+    分块转录的结果（含 chunks 字段）会先拼接成一条时间轴。
+    请求了词级时间戳时，每个段落额外带 words: [{start, end, word}]。
+    """
+    if "chunks" in raw_result:
+        raw_segments = stitch_chunks(raw_result["chunks"])
+    else:
+        raw_segments = attach_words(raw_result)
+
     segments = []
-    for seg in raw_result.get("segments", []):
-        segments.append({
+    for seg in raw_segments:
+        item = {
             "start": round(seg.get("start", 0), 2),
             "end": round(seg.get("end", 0), 2),
             "text": seg.get("text", "").strip(),
-        })
+        }
+        if "words" in seg:
+            # 保留词间空格（英文），供字幕按真实词边界断行
+            item["words"] = [
+                {"start": round(w.get("start", 0), 2), "end": round(w.get("end", 0), 2), "word": w.get("word", "")}
+                for w in seg["words"]
+            ]
+        segments.append(item)
 
     return {
         "language": raw_result.get("language", "zh"),
         "duration": raw_result.get("duration", 0),
-        "text": raw_result.get("text", ""),
+        "text": raw_result.get("text", "") or "".join(s["text"] for s in segments),
         "segments": segments,
     }
 
 
+def save_transcript(transcript: dict, output_path: Path, cached: bool = False) -> None:
+    """保存转录结果并打印摘要。"""
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(transcript, f, ensure_ascii=False, indent=2)
+
+    print(f"\n✅ 转录完成{'（命中缓存）' if cached else ''}: {output_path}")
+    print(f"   语言: {transcript['language']}")
+    print(f"   时长: {transcript['duration']:.1f} 秒")
+    print(f"   段落数: {len(transcript['segments'])}")
+
+
 def main():
     parser = argparse.ArgumentParser(description="视频/音频语音识别（调用 speaches API）")
     parser.add_argument("--input", "-i", required=True, help="输入视频/音频文件路径")
     parser.add_argument("--output", "-o", required=True, help="输出 JSON 文件路径")
     parser.add_argument("--api-url", default="http://localhost:8000", help="speaches API 地址 (默认: http://localhost:8000)")
+    parser.add_argument("--chunk-seconds", type=float, default=0,
+                        help="分块转录时每块的目标时长（秒），0 表示整段上传 (默认: 0)")
+    parser.add_argument("--overlap", type=float, default=2.0, help="分块之间的重叠时长（秒）(默认: 2.0)")
+    parser.add_argument("--workers", type=int, default=4, help="分块转录的并发请求数 (默认: 4)")
+    parser.add_argument("--stream", action="store_true",
+                        help="流式模式：ffmpeg 输出经管道直接上传，不生成临时音频文件")
+    parser.add_argument("--stream-format", choices=sorted(STREAM_FORMATS), default="wav",
+                        help="流式上传的音频格式，flac/opus 可显著减小上传体积 (默认: wav)")
+    parser.add_argument("--word-timestamps", action="store_true",
+                        help="同时请求词级时间戳，字幕可按真实词边界断行和定时")
+    parser.add_argument("--vad", action="store_true",
+                        help="本地语音活动检测，只上传有声部分（需要 numpy，不能与 --stream 同时使用）")
+    parser.add_argument("--no-cache", action="store_true", help="不读写转录缓存")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR), help=f"转录缓存目录 (默认: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_MAX_MB,
+                        help=f"转录缓存大小上限 MB，超出后淘汰最久未使用的条目 (默认: {DEFAULT_MAX_MB})")
+    add_trace_argument(parser)
     args = parser.parse_args()
+    setup_tracing(args.trace)
+
+    if args.stream and args.chunk_seconds > 0:
+        parser.error("--stream 与 --chunk-seconds 不能同时使用")
+    if args.stream and args.vad:
+        parser.error("--stream 与 --vad 不能同时使用")
+    if args.vad:
+        # numpy 是可选依赖，只在启用 VAD 时导入
+        from vad import VAD_PARAMS, detect_speech, pack_voiced, unpack_transcript
 
     input_path = Path(args.input)
     if not input_path.exists():
         print(f"错误: 输入文件不存在: {input_path}")
         sys.exit(1)
 
+    cache = None if args.no_cache else TranscriptCache(Path(args.cache_dir), args.cache_max_mb)
+
+    # 源文件未变化且已有缓存：无需提取音频，直接复用
+    params = transcribe_params(args.word_timestamps)
+    cache_params = {**params, "stream_format": args.stream_format} if args.stream else params
+    if args.vad:
+        cache_params = {**cache_params, "vad": VAD_PARAMS}
+    if cache:
+        pcm_hash = cache.lookup_source(str(input_path))
+        transcript = cache.get(make_key(pcm_hash, cache_params)) if pcm_hash else None
+        if transcript is not None:
+            save_transcript(transcript, Path(args.output), cached=True)
+            return
+
+    if args.stream:
+        raw_result, stream_hash = transcribe_stream(str(input_path), args.api_url, args.stream_format, params)
+        transcript = format_transcript(raw_result)
+        if cache:
+            cache.put(make_key(stream_hash, cache_params), transcript)
+            cache.remember_source(str(input_path), stream_hash)
+        save_transcript(transcript, Path(args.output))
+        return
+
     # 判断是否需要提取音频
     audio_exts = {".wav", ".mp3", ".flac", ".ogg", ".m4a"}
-    if input_path.suffix.lower() in audio_exts:
+    # 分块模式、VAD 需要 16kHz 单声道 WAV，音频文件也统一经 ffmpeg 转换
+    need_extract = args.chunk_seconds > 0 or args.vad or input_path.suffix.lower() not in audio_exts
+    if not need_extract:
         audio_path = str(input_path)
     else:
-        # 视频文件，先提取音频
-        print(f"从视频中提取音频: {input_path}")
+        # 视频文件（或分块模式），先提取音频
+        print(f"从输入中提取音频: {input_path}")
         tmp_audio = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
         tmp_audio.close()
         audio_path = tmp_audio.name
@@ -120,24 +533,56 @@ def main():
         if not extract_audio(str(input_path), audio_path):
             sys.exit(1)
 
-    # 进行转录
-    raw_result = transcribe_audio(audio_path, args.api_url)
-    transcript = format_transcript(raw_result)
+    try:
+        transcript = None
+        if cache:
+            with tracer.span("hash_pcm", bytes_in=os.path.getsize(audio_path)):
+                pcm_hash = hash_pcm(audio_path)
+            cache_key = make_key(pcm_hash, cache_params)
+            cache.remember_source(str(input_path), pcm_hash)
+            transcript = cache.get(cache_key)
 
-    # 保存结果
-    output_path = Path(args.output)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(transcript, f, ensure_ascii=False, indent=2)
+        if transcript is not None:
+            save_transcript(transcript, Path(args.output), cached=True)
+            return
 
-    print(f"\n✅ 转录完成: {output_path}")
-    print(f"   语言: {transcript['language']}")
-    print(f"   时长: {transcript['duration']:.1f} 秒")
-    print(f"   段落数: {len(transcript['segments'])}")
+        # 语音活动检测：静音部分不上传
+        timeline = None
+        if args.vad:
+            with tracer.span("vad", bytes_in=os.path.getsize(audio_path)):
+                speech, duration = detect_speech(audio_path)
+            voiced = sum(seg["end"] - seg["start"] for seg in speech)
+            if speech and voiced < duration:
+                print(f"语音检测: {duration:.1f} 秒中有声 {voiced:.1f} 秒，跳过 {duration - voiced:.1f} 秒静音")
+                packed_path = f"{audio_path}.voiced.wav"
+                timeline = pack_voiced(audio_path, packed_path, speech)
+            else:
+                print("语音检测: 未发现可跳过的静音，上传完整音频")
+        transcribe_path = packed_path if timeline else audio_path
+
+        # 进行转录
+        if args.chunk_seconds > 0:
+            raw_result = transcribe_audio_chunked(
+                transcribe_path, args.api_url,
+                chunk_seconds=args.chunk_seconds,
+                overlap=args.overlap,
+                workers=args.workers,
+                params=params,
+            )
+        else:
+            raw_result = transcribe_audio(transcribe_path, args.api_url, params)
+        transcript = format_transcript(raw_result)
+        if timeline:
+            transcript = unpack_transcript(transcript, timeline, round(duration, 3))
 
-    # 清理临时音频文件
-    if input_path.suffix.lower() not in audio_exts:
-        Path(audio_path).unlink(missing_ok=True)
+        if cache:
+            cache.put(cache_key, transcript)
+        save_transcript(transcript, Path(args.output))
+    finally:
+        # 清理临时音频文件
+        if need_extract:
+            Path(audio_path).unlink(missing_ok=True)
+            Path(f"{audio_path}.voiced.wav").unlink(missing_ok=True)
 
 
 if __name__ == "__main__":
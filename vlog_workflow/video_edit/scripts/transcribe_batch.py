@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+批量转录：多个录制文件排队，通过一个或多个 speaches 服务并发转录。
+
+    - 每个 --api-url 维护一个带 keep-alive 连接池的 HTTP 会话，并发请求数不超过 --per-server
+    - 任务分派给当前最空闲的服务；5xx / 429 / 连接错误 / 超时按指数退避（带随机抖动）重试，
+      重试时优先换到另一个服务；4xx 等不可恢复的错误直接记为失败，不影响其它任务
+    - 音频提取（ffmpeg）与上传流水线并行，提取并发数由 --extract-jobs 限制
+    - 与 transcribe.py 共用转录缓存，已转录过的文件直接复用
+
+输入可以是视频/音频文件，或项目目录（读取其中的 raw.mp4，输出到同目录 transcript.json）。
+未指定 --output-dir 时，raw.mp4 输出到同目录 transcript.json，其它文件输出为 {文件名}.transcript.json。
+
+用法:
+    python3 transcribe_batch.py ~/vlog_projects/*/ --api-url http://localhost:8000 --api-url http://gpu-box:8000
+    python3 transcribe_batch.py a.mp4 b.mp4 c.mp4 --output-dir transcripts/ --per-server 2 --retries 4
+
+    # 无需真实模型即可验证队列行为：先启动替身服务
+    python3 mock_speaches.py --port 8001 --fail-rate 0.2 --max-concurrent 2 &
+    python3 transcribe_batch.py a.wav b.wav --api-url http://localhost:8001 --no-cache
+
+    # 自检：自动启动两个注入故障、限制并发的替身服务，跑一批合成 WAV，检查全部完成、发生过重试且未超并发上限
+    python3 transcribe_batch.py --self-test
+
+依赖:
+    pip install requests
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from transcribe import (
+    _post_transcription,
+    extract_audio,
+    format_transcript,
+    requests,
+    save_transcript,
+    transcribe_params,
+)
+from transcript_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_MB, TranscriptCache, hash_pcm, make_key
+from instrument import add_trace_argument, setup_tracing
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+AUDIO_EXTS = {".wav", ".mp3", ".flac", ".ogg", ".m4a"}
+MAX_BACKOFF = 30.0
+
+
+class ServerPool:
+    """多个 speaches 端点：各自的连接池会话 + 并发上限，按当前负载分派请求。"""
+
+    def __init__(self, urls: list[str], per_server: int):
+        self.per_server = per_server
+        self.servers = []
+        for url in urls:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=per_server)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self.servers.append({"url": url.rstrip("/"), "session": session,
+                                 "active": 0, "ok": 0, "errors": 0, "down_until": 0.0})
+        self._cond = asyncio.Condition()
+
+    async def acquire(self, avoid: dict | None = None) -> dict:
+        """等待并占用一个有空闲并发额度的服务；优先避开 avoid（上次失败的服务）和退避中的服务。"""
+        async with self._cond:
+            while True:
+                now = time.monotonic()
+                # 退避中的服务只在所有服务都退避时才使用
+                up = [s for s in self.servers if s["down_until"] <= now] or self.servers
+                free = [s for s in up if s["active"] < self.per_server]
+                preferred = [s for s in free if s is not avoid] or free
+                if preferred:
+                    server = min(preferred, key=lambda s: (s["active"], s["errors"]))
+                    server["active"] += 1
+                    return server
+                # 等待其它任务释放额度，或最早的退避期结束
+                recovering = [s["down_until"] - now for s in self.servers if s["down_until"] > now]
+                try:
+                    await asyncio.wait_for(self._cond.wait(), min(recovering) if recovering else None)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(self, server: dict) -> None:
+        async with self._cond:
+            server["active"] -= 1
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        for server in self.servers:
+            server["session"].close()
+
+
+def _is_transient(error: Exception) -> bool:
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code in RETRY_STATUS
+    return False
+
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return f"HTTP {error.response.status_code}"
+    return type(error).__name__
+
+
+def output_for(input_path: Path, output_dir: Path | None) -> Path:
+    if output_dir is not None:
+        return output_dir / f"{input_path.stem if input_path.name != 'raw.mp4' else input_path.parent.name}.json"
+    if input_path.name == "raw.mp4":
+        return input_path.with_name("transcript.json")
+    return input_path.with_name(f"{input_path.name}.transcript.json")
+
+
+async def transcribe_job(
+    job: dict,
+    pool: ServerPool,
+    executor: ThreadPoolExecutor,
+    extract_sem: asyncio.Semaphore,
+    cache: TranscriptCache | None,
+    params: dict,
+    retries: int,
+    backoff: float,
+    timeout: float,
+) -> None:
+    """转录单个文件，结果（状态、服务、尝试次数、耗时）写回 job。"""
+    loop = asyncio.get_running_loop()
+    input_path = job["input"]
+    t0 = time.monotonic()
+
+    # 源文件未变化且已有缓存：直接复用
+    if cache:
+        pcm_hash = cache.lookup_source(str(input_path))
+        transcript = cache.get(make_key(pcm_hash, params)) if pcm_hash else None
+        if transcript is not None:
+            save_transcript(transcript, job["output"], cached=True)
+            job.update(status="cached", elapsed=time.monotonic() - t0)
+            return
+
+    need_extract = input_path.suffix.lower() not in AUDIO_EXTS
+    if need_extract:
+        tmp_audio = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
+        tmp_audio.close()
+        audio_path = tmp_audio.name
+    else:
+        audio_path = str(input_path)
+    try:
+        if need_extract:
+            async with extract_sem:
+                ok = await loop.run_in_executor(executor, extract_audio, str(input_path), audio_path)
+            if not ok:
+                job.update(status="failed", error="音频提取失败", elapsed=time.monotonic() - t0)
+                return
+
+        cache_key = None
+        if cache:
+            pcm_hash = await loop.run_in_executor(executor, hash_pcm, audio_path)
+            cache_key = make_key(pcm_hash, params)
+            cache.remember_source(str(input_path), pcm_hash)
+            transcript = cache.get(cache_key)
+            if transcript is not None:
+                save_transcript(transcript, job["output"], cached=True)
+                job.update(status="cached", elapsed=time.monotonic() - t0)
+                return
+
+        avoid = None
+        for attempt in range(retries + 1):
+            server = await pool.acquire(avoid)
+            job["attempts"] = attempt + 1
+            try:
+                raw_result = await loop.run_in_executor(
+                    executor, _post_transcription, audio_path, server["url"], params, server["session"], timeout)
+                server["ok"] += 1
+                server["down_until"] = 0.0
+                job["server"] = server["url"]
+                break
+            except (requests.RequestException, ValueError) as e:
+                server["errors"] += 1
+                if not _is_transient(e) or attempt == retries:
+                    job.update(status="failed", error=f"{server['url']}: {_describe(e)}",
+                               elapsed=time.monotonic() - t0)
+                    return
+                delay = min(MAX_BACKOFF, backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+                print(f"  警告: {input_path.name} 在 {server['url']} 失败 ({_describe(e)})，"
+                      f"{delay:.1f}s 后重试 ({attempt + 1}/{retries})")
+                # 该服务在退避期内不再优先分派，其它任务会先去别的服务
+                server["down_until"] = time.monotonic() + delay
+                avoid = server
+            finally:
+                await pool.release(server)
+            await asyncio.sleep(delay)
+
+        transcript = format_transcript(raw_result)
+        if cache:
+            cache.put(cache_key, transcript)
+        save_transcript(transcript, job["output"])
+        job.update(status="ok", elapsed=time.monotonic() - t0)
+    finally:
+        if need_extract:
+            Path(audio_path).unlink(missing_ok=True)
+
+
+async def run_batch(
+    jobs: list[dict],
+    api_urls: list[str],
+    per_server: int = 2,
+    extract_jobs: int = 2,
+    retries: int = 4,
+    backoff: float = 1.0,
+    timeout: float = 3600,
+    cache: TranscriptCache | None = None,
+    params: dict | None = None,
+) -> list[dict]:
+    """并发执行全部转录任务，返回带结果的 jobs。"""
+    pool = ServerPool(api_urls, per_server)
+    extract_sem = asyncio.Semaphore(max(extract_jobs, 1))
+    # 上传请求与 ffmpeg 提取都在线程中阻塞执行，线程数覆盖两者的并发上限
+    executor = ThreadPoolExecutor(max_workers=len(pool.servers) * per_server + max(extract_jobs, 1))
+    params = params or transcribe_params()
+    try:
+        await asyncio.gather(*(
+            transcribe_job(job, pool, executor, extract_sem, cache, params, retries, backoff, timeout)
+            for job in jobs
+        ))
+    finally:
+        executor.shutdown(wait=True)
+        pool.close()
+    for server in pool.servers:
+        print(f"   {server['url']}: 成功 {server['ok']} 次，错误 {server['errors']} 次")
+    return jobs
+
+
+def collect_inputs(paths: list[str]) -> list[Path]:
+    inputs = []
+    for p in map(Path, paths):
+        if p.is_dir():
+            p = p / "raw.mp4"
+        inputs.append(p)
+    return inputs
+
+
+def self_test(n_files: int = 8, per_server: int = 2) -> bool:
+    """用两个替身服务（各自注入 30% 的 503，并发上限等于 --per-server）跑一批合成 WAV：
+    全部任务都应成功、至少发生一次重试，且任何服务都没有收到超出并发上限的请求。"""
+    from mock_speaches import start_server
+
+    # 故障注入的随机序列由种子决定：这两个种子的第一次抽样都会失败，保证重试路径一定被走到
+    servers = [start_server(0, latency=0.05, fail_rate=0.3, max_concurrent=per_server, seed=seed)
+               for seed in (1, 3)]
+    urls = [f"http://127.0.0.1:{server.server_address[1]}" for server in servers]
+    try:
+        with tempfile.TemporaryDirectory(prefix="batch_selftest_") as tmp:
+            jobs = []
+            for i in range(n_files):
+                path = Path(tmp) / f"clip_{i}.wav"
+                with wave.open(str(path), "wb") as wav:
+                    wav.setnchannels(1)
+                    wav.setsampwidth(2)
+                    wav.setframerate(16000)
+                    wav.writeframes(b"\0\0" * 16000 * (1 + i % 3))
+                jobs.append({"input": path, "output": output_for(path, None), "status": "pending", "attempts": 0})
+            asyncio.run(run_batch(jobs, urls, per_server=per_server, retries=6, backoff=0.05))
+            written = sum(job["output"].exists() for job in jobs)
+    finally:
+        for server in servers:
+            server.shutdown()
+    stats = [server.mock_state.stats() for server in servers]
+
+    ok = True
+    failed = [job for job in jobs if job["status"] != "ok"]
+    if failed or written != n_files:
+        print(f"错误: {len(failed)} 个任务未完成，写出 {written}/{n_files} 个结果: "
+              f"{[job.get('error') for job in failed]}")
+        ok = False
+    retries = sum(job["attempts"] - 1 for job in jobs)
+    if retries == 0 or sum(s["rejected"] for s in stats) == 0:
+        print("错误: 注入了 503 但没有发生重试")
+        ok = False
+    for url, s in zip(urls, stats):
+        print(f"   {url}: 请求 {s['requests']} 个，拒绝 {s['rejected']} 个，超出并发上限 {s['busy']} 个，"
+              f"峰值并发 {s['peak_concurrency']}")
+        if s["busy"] or s["peak_concurrency"] > per_server:
+            print(f"错误: {url} 收到超出并发上限 {per_server} 的请求")
+            ok = False
+    if ok:
+        print(f"✅ 自检通过: {n_files} 个任务全部完成，重试 {retries} 次，各服务峰值并发不超过 {per_server}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量转录：多个文件通过一个或多个 speaches 服务并发转录")
+    parser.add_argument("inputs", nargs="*", help="视频/音频文件或项目目录（读取其中的 raw.mp4）")
+    parser.add_argument("--api-url", action="append",
+                        help="speaches API 地址，可重复指定多个 (默认: http://localhost:8000)")
+    parser.add_argument("--output-dir", "-o", help="输出目录 (默认: 与输入同目录)")
+    parser.add_argument("--per-server", type=int, default=2, help="每个服务的并发请求上限 (默认: 2)")
+    parser.add_argument("--extract-jobs", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="同时运行的 ffmpeg 音频提取数 (默认: CPU 核数的一半)")
+    parser.add_argument("--retries", type=int, default=4, help="5xx/连接错误的最大重试次数 (默认: 4)")
+    parser.add_argument("--backoff", type=float, default=1.0, help="重试退避的初始秒数，每次翻倍 (默认: 1.0)")
+    parser.add_argument("--timeout", type=float, default=3600, help="单个请求的超时秒数 (默认: 3600)")
+    parser.add_argument("--word-timestamps", action="store_true", help="同时请求词级时间戳")
+    parser.add_argument("--no-cache", action="store_true", help="不读写转录缓存")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR), help=f"转录缓存目录 (默认: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_MAX_MB,
+                        help=f"转录缓存大小上限 MB (默认: {DEFAULT_MAX_MB})")
+    parser.add_argument("--self-test", action="store_true",
+                        help="启动注入故障的本地替身服务，检查重试、并发上限和全部任务完成")
+    add_trace_argument(parser)
+    args = parser.parse_args()
+    setup_tracing(args.trace)
+
+    if args.self_test:
+        sys.exit(0 if self_test() else 1)
+    if not args.inputs:
+        parser.error("请指定输入文件或项目目录")
+
+    inputs = collect_inputs(args.inputs)
+    missing = [p for p in inputs if not p.exists()]
+    if missing:
+        for p in missing:
+            print(f"错误: 输入文件不存在: {p}")
+        sys.exit(1)
+
+    output_dir = Path(args.output_dir) if args.output_dir else None
+    if output_dir:
+        output_dir.mkdir(parents=True, exist_ok=True)
+    jobs = [{"input": p, "output": output_for(p, output_dir), "status": "pending", "attempts": 0}
+            for p in inputs]
+    outputs = [str(job["output"]) for job in jobs]
+    if len(set(outputs)) != len(outputs):
+        print("错误: 多个输入对应同一个输出文件，请检查输入或去掉 --output-dir")
+        sys.exit(1)
+
+    api_urls = args.api_url or ["http://localhost:8000"]
+    cache = None if args.no_cache else TranscriptCache(Path(args.cache_dir), args.cache_max_mb)
+    print(f"批量转录: {len(jobs)} 个文件，{len(api_urls)} 个服务，每个服务并发 {args.per_server}")
+
+    t0 = time.monotonic()
+    asyncio.run(run_batch(
+        jobs, api_urls,
+        per_server=max(args.per_server, 1),
+        extract_jobs=args.extract_jobs,
+        retries=args.retries,
+        backoff=args.backoff,
+        timeout=args.timeout,
+        cache=cache,
+        params=transcribe_params(args.word_timestamps),
+    ))
+    elapsed = time.monotonic() - t0
+
+    failed = [job for job in jobs if job["status"] == "failed"]
+    print(f"\n{'✅' if not failed else '⚠️'} 批量转录结束: {len(jobs) - len(failed)}/{len(jobs)} 成功，"
+          f"总耗时 {elapsed:.1f}s")
+    for job in jobs:
+        detail = job.get("server") or job.get("error") or ""
+        print(f"   [{job['status']:>6}] {job['input']}  尝试 {job['attempts']} 次  "
+              f"{job.get('elapsed', 0):.1f}s  {detail}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+转录结果缓存：以解码后 PCM 音频的哈希 + 模型参数为键，持久化保存格式化后的转录 JSON。
+
+缓存目录结构（默认 ~/.cache/vlog_workflow/transcripts）:
+    entries/{key}.json   格式化后的转录结果（format_transcript 的输出）
+    sources.json         源文件 (路径, 大小, mtime) → PCM 哈希，命中时可跳过 ffmpeg 提取
+
+淘汰策略：总大小超过上限时，按最近使用时间（文件 mtime，命中时刷新）从旧到新删除。
+
+用法（通常由 transcribe.py 调用，也可单独查看/清理）:
+    python3 transcript_cache.py --stats
+    python3 transcript_cache.py --prune --max-mb 200
+    python3 transcript_cache.py --clear
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+import wave
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "vlog_workflow" / "transcripts"
+DEFAULT_MAX_MB = 500
+
+
+def hash_pcm(audio_path: str) -> str:
+    """计算音频内容哈希。WAV 只对 PCM 帧计算（忽略文件头），其它格式对整个文件计算。"""
+    h = hashlib.sha256()
+    try:
+        with wave.open(audio_path, "rb") as wav:
+            h.update(f"{wav.getnchannels()}:{wav.getsampwidth()}:{wav.getframerate()}".encode())
+            while True:
+                frames = wav.readframes(1 << 18)
+                if not frames:
+                    break
+                h.update(frames)
+        return h.hexdigest()
+    except (wave.Error, EOFError):
+        h = hashlib.sha256()
+        with open(audio_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        return h.hexdigest()
+
+
+def make_key(pcm_hash: str, params: dict) -> str:
+    """由 PCM 哈希和请求参数（模型、语言、时间戳粒度等）生成缓存键。"""
+    payload = json.dumps({"pcm": pcm_hash, "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+class TranscriptCache:
+    """基于文件系统的转录结果缓存。"""
+
+    def __init__(self, cache_dir: Path = DEFAULT_CACHE_DIR, max_mb: float = DEFAULT_MAX_MB):
+        self.cache_dir = Path(cache_dir)
+        self.entries_dir = self.cache_dir / "entries"
+        self.sources_path = self.cache_dir / "sources.json"
+        self.max_bytes = int(max_mb * 1024 * 1024)
+
+    # ── 源文件 → PCM 哈希索引 ────────────────────────────────────────────────
+
+    @staticmethod
+    def _source_id(source_path: str) -> str:
+        st = os.stat(source_path)
+        return f"{Path(source_path).resolve()}|{st.st_size}|{st.st_mtime_ns}"
+
+    def _load_sources(self) -> dict:
+        try:
+            with open(self.sources_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def lookup_source(self, source_path: str) -> str | None:
+        """返回源文件上次提取出的 PCM 哈希（文件未变化时），否则 None。"""
+        return self._load_sources().get(self._source_id(source_path))
+
+    def remember_source(self, source_path: str, pcm_hash: str) -> None:
+        sources = self._load_sources()
+        # 同一路径只保留最新版本的记录
+        prefix = f"{Path(source_path).resolve()}|"
+        sources = {k: v for k, v in sources.items() if not k.startswith(prefix)}
+        sources[self._source_id(source_path)] = pcm_hash
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.sources_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(sources, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.sources_path)
+
+    # ── 缓存条目 ─────────────────────────────────────────────────────────────
+
+    def get(self, key: str) -> dict | None:
+        path = self.entries_dir / f"{key}.json"
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                transcript = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        os.utime(path)  # 刷新最近使用时间
+        return transcript
+
+    def put(self, key: str, transcript: dict) -> None:
+        self.entries_dir.mkdir(parents=True, exist_ok=True)
+        path = self.entries_dir / f"{key}.json"
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(transcript, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        self.prune()
+
+    def _entries(self) -> list[tuple[Path, os.stat_result]]:
+        if not self.entries_dir.exists():
+            return []
+        return [(p, p.stat()) for p in self.entries_dir.glob("*.json")]
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        total = sum(st.st_size for _, st in entries)
+        oldest = min((st.st_mtime for _, st in entries), default=None)
+        return {
+            "cache_dir": str(self.cache_dir),
+            "entries": len(entries),
+            "total_bytes": total,
+            "max_bytes": self.max_bytes,
+            "oldest_used": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(oldest)) if oldest else None,
+        }
+
+    def prune(self, max_bytes: int | None = None) -> int:
+        """按最近使用时间淘汰条目直到总大小不超过上限，返回删除的条目数。"""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self._entries(), key=lambda e: e[1].st_mtime)
+        total = sum(st.st_size for _, st in entries)
+        removed = 0
+        for path, st in entries:
+            if total <= limit:
+                break
+            path.unlink(missing_ok=True)
+            total -= st.st_size
+            removed += 1
+        return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查看或清理转录结果缓存")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR), help=f"缓存目录 (默认: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--max-mb", type=float, default=DEFAULT_MAX_MB, help=f"缓存大小上限 MB (默认: {DEFAULT_MAX_MB})")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--stats", action="store_true", help="显示缓存统计")
+    group.add_argument("--prune", action="store_true", help="按 --max-mb 淘汰最久未使用的条目")
+    group.add_argument("--clear", action="store_true", help="清空所有缓存条目")
+    args = parser.parse_args()
+
+    cache = TranscriptCache(Path(args.cache_dir), args.max_mb)
+    if args.stats:
+        print(json.dumps(cache.stats(), ensure_ascii=False, indent=2))
+    elif args.prune:
+        removed = cache.prune()
+        print(f"✅ 已淘汰 {removed} 个缓存条目")
+    elif args.clear:
+        removed = cache.prune(max_bytes=0)
+        cache.sources_path.unlink(missing_ok=True)
+        print(f"✅ 已清空 {removed} 个缓存条目")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+语音活动检测（VAD）：基于帧能量的本地静音检测，几秒内处理完一小时的 16kHz 音频。
+
+    - 按 30ms 帧计算 RMS 能量（dBFS，NumPy 向量化），阈值默认取 底噪（10% 分位）+ 12dB
+    - 短于 --min-silence 的静音并入语音，短于 --min-speech 的孤立噪声丢弃，语音区间前后各留 --pad 秒
+    - 输出语音区间，供 transcribe.py --vad 只上传有声部分（时间戳自动映射回原始时间轴）
+    - 同时可生成剪辑方案草稿：超过 --max-pause 秒的停顿被剪掉，其余原样保留
+
+用法:
+    python3 vad.py --input raw.mp4 --speech speech_intervals.json
+    python3 vad.py --input raw.mp4 --plan cut_plan.draft.json --max-pause 1.0
+
+依赖:
+    pip install numpy
+    ffmpeg (输入为视频时提取音频)
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import wave
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    print("错误: 请先安装 numpy: pip install numpy")
+    sys.exit(1)
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "common"))
+from timeline import CutTimeline
+
+# 检测参数（同时作为转录缓存键的一部分）
+VAD_PARAMS = {
+    "frame_ms": 30,
+    "threshold_db": None,  # None 表示按底噪自适应
+    "min_speech": 0.25,
+    "min_silence": 0.3,
+    "pad": 0.15,
+}
+
+_BLOCK_SECONDS = 60
+
+
+def frame_energy_db(wav_path: str, frame_ms: int = 30) -> tuple[np.ndarray, float]:
+    """逐块读取 16-bit 单声道 WAV，返回 (每帧 RMS 能量 dBFS, 帧长秒数)。"""
+    with wave.open(wav_path, "rb") as wav:
+        if wav.getsampwidth() != 2 or wav.getnchannels() != 1:
+            raise ValueError("VAD 需要 16-bit 单声道 WAV（extract_audio 的输出）")
+        rate = wav.getframerate()
+        frame_len = max(int(rate * frame_ms / 1000), 1)
+        block = frame_len * max(int(_BLOCK_SECONDS * rate / frame_len), 1)
+        energies = []
+        while True:
+            samples = np.frombuffer(wav.readframes(block), dtype="<i2")
+            if samples.size == 0:
+                break
+            n = samples.size // frame_len
+            if n == 0:
+                break
+            frames = samples[: n * frame_len].astype(np.float32).reshape(n, frame_len) / 32768.0
+            energies.append(np.mean(frames * frames, axis=1))
+    if not energies:
+        return np.zeros(0, dtype=np.float32), frame_len / rate
+    power = np.concatenate(energies)
+    return 10 * np.log10(np.maximum(power, 1e-10)), frame_len / rate
+
+
+def _runs(mask: np.ndarray) -> list[tuple[int, int]]:
+    """布尔序列中连续 True 的区间 [start, end)（帧下标）。"""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(edges == 1).tolist(), np.flatnonzero(edges == -1).tolist()))
+
+
+def detect_speech(
+    wav_path: str,
+    frame_ms: int = 30,
+    threshold_db: float | None = None,
+    min_speech: float = 0.25,
+    min_silence: float = 0.3,
+    pad: float = 0.15,
+) -> tuple[list[dict], float]:
+    """检测语音区间，返回 ([{start, end}], 音频总时长)。"""
+    db, hop = frame_energy_db(wav_path, frame_ms)
+    duration = len(db) * hop
+    if len(db) == 0:
+        return [], duration
+
+    if threshold_db is None:
+        noise_floor = float(np.percentile(db, 10))
+        threshold_db = max(noise_floor + 12.0, -60.0)
+    voiced = db > threshold_db
+
+    # 填平短静音
+    max_gap = int(round(min_silence / hop))
+    for start, end in _runs(~voiced):
+        if start > 0 and end < len(voiced) and end - start <= max_gap:
+            voiced[start:end] = True
+
+    intervals = []
+    min_frames = int(round(min_speech / hop))
+    for start, end in _runs(voiced):
+        if end - start < min_frames:
+            continue
+        s = max(start * hop - pad, 0.0)
+        e = min(end * hop + pad, duration)
+        if intervals and s <= intervals[-1]["end"]:
+            intervals[-1]["end"] = round(e, 3)
+        else:
+            intervals.append({"start": round(s, 3), "end": round(e, 3)})
+    return intervals, duration
+
+
+def draft_keep_segments(speech: list[dict], duration: float, max_pause: float = 1.0) -> dict:
+    """由语音区间生成剪辑方案草稿：剪掉超过 max_pause 秒的停顿（含开头、结尾的空白）。"""
+    keeps: list[dict] = []
+    removed = []
+    cursor = 0.0
+    for seg in speech:
+        gap = seg["start"] - (keeps[-1]["end"] if keeps else 0.0)
+        if keeps and gap <= max_pause:
+            keeps[-1]["end"] = seg["end"]
+        else:
+            keeps.append({"start": seg["start"], "end": seg["end"]})
+    for k in keeps:
+        if k["start"] - cursor > 1e-3:
+            label = "开头静音" if cursor == 0.0 else "静音停顿"
+            removed.append({"start": round(cursor, 3), "end": k["start"],
+                            "reason": f"{label} {k['start'] - cursor:.1f} 秒"})
+        cursor = k["end"]
+    if duration - cursor > 1e-3:
+        removed.append({"start": round(cursor, 3), "end": round(duration, 3),
+                        "reason": f"结尾静音 {duration - cursor:.1f} 秒"})
+    return {
+        "keep_segments": [{**k, "note": "语音（VAD 草稿）"} for k in keeps],
+        "removed_segments": removed,
+    }
+
+
+def pack_voiced(wav_path: str, out_path: str, speech: list[dict]) -> CutTimeline:
+    """把语音区间首尾相接写入新的 WAV，返回 原始 ↔ 压缩后 的时间轴映射。"""
+    with wave.open(wav_path, "rb") as src, wave.open(out_path, "wb") as dst:
+        rate = src.getframerate()
+        dst.setnchannels(src.getnchannels())
+        dst.setsampwidth(src.getsampwidth())
+        dst.setframerate(rate)
+        for seg in speech:
+            first = int(seg["start"] * rate)
+            src.setpos(first)
+            dst.writeframes(src.readframes(int(seg["end"] * rate) - first))
+    return CutTimeline(speech)
+
+
+def unpack_transcript(transcript: dict, timeline: CutTimeline, duration: float) -> dict:
+    """把压缩音频上得到的转录（format_transcript 的输出）映射回原始时间轴。"""
+    def back(t: float) -> float:
+        return round(timeline.to_source(t), 2)
+
+    segments = []
+    for seg in transcript.get("segments", []):
+        item = {**seg, "start": back(seg["start"]), "end": back(seg["end"])}
+        if "words" in seg:
+            item["words"] = [{**w, "start": back(w["start"]), "end": back(w["end"])} for w in seg["words"]]
+        segments.append(item)
+    return {**transcript, "duration": duration, "segments": segments}
+
+
+def _extract_wav(input_path: str, wav_path: str) -> None:
+    cmd = ["ffmpeg", "-i", input_path, "-vn", "-acodec", "pcm_s16le", "-ar", "16000", "-ac", "1", "-y", wav_path]
+    subprocess.run(cmd, capture_output=True, text=True, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地语音活动检测：输出语音区间和剪辑方案草稿")
+    parser.add_argument("--input", "-i", required=True, help="输入视频或 16kHz 单声道 WAV")
+    parser.add_argument("--speech", help="输出语音区间 JSON")
+    parser.add_argument("--plan", help="输出剪辑方案草稿 JSON（keep_segments）")
+    parser.add_argument("--max-pause", type=float, default=1.0,
+                        help="剪辑方案草稿中超过该秒数的停顿被剪掉 (默认: 1.0)")
+    parser.add_argument("--threshold-db", type=float, default=None,
+                        help="语音能量阈值 dBFS (默认: 底噪 + 12dB)")
+    parser.add_argument("--min-speech", type=float, default=VAD_PARAMS["min_speech"],
+                        help=f"最短语音时长（秒）(默认: {VAD_PARAMS['min_speech']})")
+    parser.add_argument("--min-silence", type=float, default=VAD_PARAMS["min_silence"],
+                        help=f"短于该秒数的静音并入语音 (默认: {VAD_PARAMS['min_silence']})")
+    parser.add_argument("--pad", type=float, default=VAD_PARAMS["pad"],
+                        help=f"语音区间前后保留的秒数 (默认: {VAD_PARAMS['pad']})")
+    args = parser.parse_args()
+
+    if not args.speech and not args.plan:
+        parser.error("请至少指定 --speech 或 --plan")
+    input_path = Path(args.input)
+    if not input_path.exists():
+        print(f"错误: 输入文件不存在: {input_path}")
+        sys.exit(1)
+
+    tmp_wav = None
+    wav_path = str(input_path)
+    if input_path.suffix.lower() != ".wav":
+        tmp_wav = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
+        tmp_wav.close()
+        wav_path = tmp_wav.name
+        try:
+            _extract_wav(str(input_path), wav_path)
+        except (subprocess.CalledProcessError, FileNotFoundError) as e:
+            Path(wav_path).unlink(missing_ok=True)
+            print(f"错误: ffmpeg 提取音频失败: {e}")
+            sys.exit(1)
+
+    try:
+        speech, duration = detect_speech(
+            wav_path, threshold_db=args.threshold_db, min_speech=args.min_speech,
+            min_silence=args.min_silence, pad=args.pad,
+        )
+    except (ValueError, wave.Error) as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+    finally:
+        if tmp_wav:
+            Path(wav_path).unlink(missing_ok=True)
+
+    voiced = sum(s["end"] - s["start"] for s in speech)
+    print(f"✅ 语音检测完成: {input_path}")
+    print(f"   总时长: {duration:.1f} 秒，语音: {voiced:.1f} 秒 ({voiced / max(duration, 1e-9) * 100:.0f}%)，"
+          f"区间 {len(speech)} 个")
+
+    if args.speech:
+        with open(args.speech, "w", encoding="utf-8") as f:
+            json.dump({"duration": round(duration, 3), "speech": speech}, f, ensure_ascii=False, indent=2)
+        print(f"   语音区间: {args.speech}")
+    if args.plan:
+        plan = draft_keep_segments(speech, duration, args.max_pause)
+        with open(args.plan, "w", encoding="utf-8") as f:
+            json.dump(plan, f, ensure_ascii=False, indent=2)
+        kept = sum(k["end"] - k["start"] for k in plan["keep_segments"])
+        print(f"   剪辑方案草稿: {args.plan}（保留 {len(plan['keep_segments'])} 段，{kept:.1f} 秒）")
+
+
+if __name__ == "__main__":
+    main()